@@ -0,0 +1,128 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of the data_utils functions that process the whole experiment
+data when generating a report, on synthetic data shaped like the data of many
+merged experiments. Run it before and after changing these functions to check
+for regressions:
+
+  PYTHONPATH=. python3 analysis/benchmark_data_utils.py --num-rows 10000000
+
+Pass --num-benchmarks to time reports on more benchmarks, e.g. the merged
+results of every experiment.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import data_utils
+
+NUM_EXPERIMENTS = 5
+NUM_BENCHMARKS = 20
+NUM_FUZZERS = 10
+# Fuzzers per experiment, so that experiments share some of their fuzzers.
+NUM_EXPERIMENT_FUZZERS = 6
+NUM_SNAPSHOTS = 96
+SNAPSHOT_PERIOD = 15 * 60
+# Fraction of snapshots with a crash.
+CRASH_FRACTION = 0.001
+NUM_CRASH_STATES = 50
+
+
+def create_experiment_data(num_rows, num_benchmarks=NUM_BENCHMARKS, seed=0):  # pylint: disable=too-many-locals
+    """Returns about |num_rows| rows of synthetic experiment data on
+    |num_benchmarks| benchmarks like queries.get_experiment_data returns for
+    merged experiments."""
+    rng = np.random.default_rng(seed)
+    num_trials = max(
+        num_rows // (NUM_EXPERIMENTS * num_benchmarks * NUM_EXPERIMENT_FUZZERS *
+                     NUM_SNAPSHOTS), 1)
+    experiments, benchmarks, fuzzers = [], [], []
+    for experiment in range(NUM_EXPERIMENTS):
+        for benchmark in range(num_benchmarks):
+            for fuzzer in range(NUM_EXPERIMENT_FUZZERS):
+                experiments.append(f'experiment-{experiment}')
+                benchmarks.append(f'benchmark-{benchmark}')
+                fuzzers.append(f'fuzzer-{(experiment + fuzzer) % NUM_FUZZERS}')
+    num_rows_per_pair = num_trials * NUM_SNAPSHOTS
+    num_rows = len(experiments) * num_rows_per_pair
+    experiment_df = pd.DataFrame({
+        'experiment':
+            np.repeat(np.array(experiments, dtype=object), num_rows_per_pair),
+        'benchmark':
+            np.repeat(np.array(benchmarks, dtype=object), num_rows_per_pair),
+        'fuzzer':
+            np.repeat(np.array(fuzzers, dtype=object), num_rows_per_pair),
+        'trial_id':
+            np.repeat(np.arange(num_rows // NUM_SNAPSHOTS), NUM_SNAPSHOTS),
+        'time':
+            np.tile(
+                np.arange(1, NUM_SNAPSHOTS + 1) * SNAPSHOT_PERIOD,
+                num_rows // NUM_SNAPSHOTS),
+    })
+    experiment_df['experiment_filestore'] = 'gs://fuzzbench-data'
+    experiment_df['edges_covered'] = (experiment_df.time // 60 +
+                                      rng.integers(1000, size=num_rows))
+    crash_states = np.array([
+        f'ASSERT:frame_{state}\nframe_{state % 7}\nmain\n'
+        for state in range(NUM_CRASH_STATES)
+    ],
+                            dtype=object)
+    crash_keys = np.full(num_rows, np.nan, dtype=object)
+    has_crash = rng.random(num_rows) < CRASH_FRACTION
+    crash_keys[has_crash] = crash_states[rng.integers(NUM_CRASH_STATES,
+                                                      size=has_crash.sum())]
+    experiment_df['crash_key'] = crash_keys
+    return experiment_df
+
+
+def _time(name, function, *args):
+    """Returns the result of |function|(*|args|) after printing how long it
+    took."""
+    start_time = time.time()
+    result = function(*args)
+    print(f'{name}: {time.time() - start_time:.2f}s')
+    return result
+
+
+def main():
+    """Times the data_utils functions of the report path."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-rows',
+                        type=int,
+                        default=10**7,
+                        help='Approximate number of rows of the data.')
+    parser.add_argument('--num-benchmarks',
+                        type=int,
+                        default=NUM_BENCHMARKS,
+                        help='Number of benchmarks in the data.')
+    args = parser.parse_args()
+
+    experiment_df = create_experiment_data(args.num_rows, args.num_benchmarks)
+    print(f'{len(experiment_df)} rows, {args.num_benchmarks} benchmarks.')
+    experiments = sorted(experiment_df.experiment.unique())
+    experiment_df = _time('clobber_experiments_data',
+                          data_utils.clobber_experiments_data, experiment_df,
+                          experiments)
+    experiment_df = _time('add_bugs_covered_column',
+                          data_utils.add_bugs_covered_column, experiment_df)
+    _time('get_experiment_snapshots', data_utils.get_experiment_snapshots,
+          experiment_df)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,6 +18,7 @@ import functools
 
 from analysis import data_utils
 from analysis import coverage_data_utils
+from analysis import report_artifact_cache
 from analysis import stat_tests
 from common import benchmark_utils
 from common import filestore_utils
@@ -33,16 +34,59 @@ class BenchmarkResults:
     Each results is a property, which is lazily evaluated and memoized if used
     by other properties. Therefore, when used as a context of a report
     template, properties are computed on demand and only once.
+
+    If |artifact_cache| is set, tables, test results and plots that don't
+    depend on coverage data are also cached there, so that they are reused
+    while the data of the benchmark doesn't change.
     """
 
-    def __init__(self, benchmark_name, experiment_df, coverage_dict,
-                 output_directory, plotter):
+    # Properties shown in the default report, which can be computed before it
+    # is rendered. Keep in sync with report_templates/default.html.
+    _CODE_REPORT_PROPERTIES = (
+        'ranking_plot',
+        'box_plot',
+        'coverage_growth_plot',
+        'coverage_growth_plot_logscale',
+        'fuzzers_with_not_enough_samples',
+        'summary_table',
+        'vargha_delaney_plot',
+        'mann_whitney_plot',
+    )
+    _BUG_REPORT_PROPERTIES = (
+        'bug_box_plot',
+        'box_plot',
+        'coverage_growth_plot',
+        'coverage_growth_plot_logscale',
+        'bug_coverage_growth_plot',
+        'bug_coverage_growth_plot_logscale',
+        'fuzzers_with_not_enough_samples',
+        'bug_summary_table',
+        'bug_vargha_delaney_plot',
+        'bug_mann_whitney_plot',
+        'summary_table',
+        'vargha_delaney_plot',
+        'mann_whitney_plot',
+    )
+
+    def __init__(self,
+                 benchmark_name,
+                 experiment_df,
+                 coverage_dict,
+                 output_directory,
+                 plotter,
+                 artifact_cache=None):
         self.name = benchmark_name
 
         self._experiment_df = experiment_df
         self._coverage_dict = coverage_dict
         self._output_directory = output_directory
         self._plotter = plotter
+        self.artifacts = report_artifact_cache.Artifacts(
+            artifact_cache, self._get_artifact_key_parts)
+
+    def _get_artifact_key_parts(self):
+        return (self.name, self.type, self._plotter.settings,
+                self._benchmark_df)
 
     def _prefix_with_benchmark(self, filename):
         return self.name + '_' + filename
@@ -50,6 +94,14 @@ class BenchmarkResults:
     def _get_full_path(self, filename):
         return os.path.join(self._output_directory, filename)
 
+    def _write_plot(self, plot_filename, write_plot):
+        """Writes the plot |plot_filename| with |write_plot|(path) unless it
+        is cached. Returns |plot_filename|."""
+        self.artifacts.write_file(plot_filename,
+                                  self._get_full_path(plot_filename),
+                                  write_plot)
+        return plot_filename
+
     def get_coverage_report_path(self, fuzzer_name, benchmark_name):
         """Returns the filestore name of the |fuzzer_name|."""
         filestore_path = coverage_data_utils.get_coverage_report_filestore_path(
@@ -67,6 +119,14 @@ class BenchmarkResults:
         """
         return benchmark_utils.get_type(self.name)
 
+    @property
+    def report_properties(self):
+        """Names of the properties shown in the default report, except for
+        the coverage report ones."""
+        if self.type == 'bug':
+            return self._BUG_REPORT_PROPERTIES
+        return self._CODE_REPORT_PROPERTIES
+
     @property
     def _relevant_column(self):
         """Returns the name of the column that will be used as the basis of
@@ -91,9 +151,9 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
-    def _benchmark_coverage_dict(self):
+    def _benchmark_coverage(self):
         """Covered branches of each fuzzer on this benchmark."""
-        return coverage_data_utils.get_benchmark_cov_dict(
+        return coverage_data_utils.get_benchmark_coverage(
             self._coverage_dict, self.name)
 
     @property
@@ -101,56 +161,56 @@ class BenchmarkResults:
     def _benchmark_aggregated_coverage_df(self):
         """Aggregated covered branches of each fuzzer on this benchmark."""
         return coverage_data_utils.get_benchmark_aggregated_cov_df(
-            self._coverage_dict, self.name)
-
-    @property
-    @functools.lru_cache()
-    def _unique_branch_dict(self):
-        """Unique branches with the fuzzers that cover it."""
-        return coverage_data_utils.get_unique_branch_dict(
-            self._benchmark_coverage_dict)
+            self._benchmark_coverage)
 
     @property
     @functools.lru_cache()
     def unique_branch_cov_df(self):
         """Fuzzers with the number of covered unique branches."""
         return coverage_data_utils.get_unique_branch_cov_df(
-            self._unique_branch_dict, self.fuzzer_names)
+            self._benchmark_coverage, self.fuzzer_names)
 
     @property
+    @report_artifact_cache.cached
     def fuzzers_with_not_enough_samples(self):
         """Fuzzers with not enough samples."""
         return data_utils.get_fuzzers_with_not_enough_samples(
             self._benchmark_snapshot_df)
 
     @property
+    @report_artifact_cache.cached
     def summary_table(self):
         """Statistical summary table."""
         return data_utils.benchmark_summary(self._benchmark_snapshot_df)
 
     @property
+    @report_artifact_cache.cached
     def bug_summary_table(self):
         """Statistical summary table."""
         return data_utils.benchmark_summary(self._benchmark_snapshot_df,
                                             key='bugs_covered')
 
     @property
+    @report_artifact_cache.cached
     def rank_by_mean(self):
         """Fuzzer ranking by mean coverage."""
         return data_utils.benchmark_rank_by_mean(self._benchmark_snapshot_df)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_median(self):
         """Fuzzer ranking by median coverage."""
         return data_utils.benchmark_rank_by_median(self._benchmark_snapshot_df)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_average_rank(self):
         """Fuzzer ranking by coverage rank average."""
         return data_utils.benchmark_rank_by_average_rank(
             self._benchmark_snapshot_df)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_stat_test_wins(self):
         """Fuzzer ranking by then number of pairwise statistical test wins."""
         return data_utils.benchmark_rank_by_stat_test_wins(
@@ -158,6 +218,7 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def mann_whitney_p_values(self):
         """Mann Whitney U test result."""
         return stat_tests.two_sided_u_test(self._benchmark_snapshot_df,
@@ -165,6 +226,7 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def bug_mann_whitney_p_values(self):
         """Mann Whitney U test result based on bugs covered."""
         return stat_tests.two_sided_u_test(self._benchmark_snapshot_df,
@@ -172,12 +234,14 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def vargha_delaney_a12_values(self):
         """Vargha Delaney A12 mesaure results (code coverage)."""
         return stat_tests.a12_measure_test(self._benchmark_snapshot_df)
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def bug_vargha_delaney_a12_values(self):
         """Vargha Delaney A12 mesaure results (bug coverage)."""
         return stat_tests.a12_measure_test(self._benchmark_snapshot_df,
@@ -186,9 +250,9 @@ class BenchmarkResults:
     def _mann_whitney_plot(self, filename, p_values):
         """Generic Mann Whitney U test plot."""
         plot_filename = self._prefix_with_benchmark(filename)
-        self._plotter.write_heatmap_plot(p_values,
-                                         self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename,
+            lambda path: self._plotter.write_heatmap_plot(p_values, path))
 
     @property
     def mann_whitney_plot(self):
@@ -205,9 +269,9 @@ class BenchmarkResults:
     def _vargha_delaney_plot(self, filename, a12_values):
         """Generic Vargha Delany A12 measure plot."""
         plot_filename = self._prefix_with_benchmark(filename)
-        self._plotter.write_a12_heatmap_plot(a12_values,
-                                             self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename,
+            lambda path: self._plotter.write_a12_heatmap_plot(a12_values, path))
 
     @property
     def vargha_delaney_plot(self):
@@ -222,6 +286,7 @@ class BenchmarkResults:
                                          self.bug_vargha_delaney_a12_values)
 
     @property
+    @report_artifact_cache.cached
     def anova_p_value(self):
         """ANOVA test result."""
         return stat_tests.anova_test(self._benchmark_snapshot_df,
@@ -229,6 +294,7 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def anova_posthoc_p_values(self):
         """ANOVA posthoc test results."""
         return stat_tests.anova_posthoc_tests(self._benchmark_snapshot_df,
@@ -238,19 +304,20 @@ class BenchmarkResults:
     def anova_student_plot(self):
         """ANOVA/Student T posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('anova_student_plot.svg')
-        self._plotter.write_heatmap_plot(self.anova_posthoc_p_values['student'],
-                                         self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.anova_posthoc_p_values['student'], path))
 
     @property
     def anova_turkey_plot(self):
         """ANOVA/Turkey posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('anova_turkey_plot.svg')
-        self._plotter.write_heatmap_plot(self.anova_posthoc_p_values['turkey'],
-                                         self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.anova_posthoc_p_values['turkey'], path))
 
     @property
+    @report_artifact_cache.cached
     def kruskal_p_value(self):
         """Kruskal test result."""
         return stat_tests.kruskal_test(self._benchmark_snapshot_df,
@@ -258,6 +325,7 @@ class BenchmarkResults:
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def kruskal_posthoc_p_values(self):
         """Kruskal posthoc test results."""
         return stat_tests.kruskal_posthoc_tests(self._benchmark_snapshot_df,
@@ -267,58 +335,73 @@ class BenchmarkResults:
     def kruskal_conover_plot(self):
         """Kruskal/Conover posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('kruskal_conover_plot.svg')
-        self._plotter.write_heatmap_plot(
-            self.kruskal_posthoc_p_values['conover'],
-            self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.kruskal_posthoc_p_values['conover'], path))
 
     @property
     def kruskal_mann_whitney_plot(self):
         """Kruskal/Mann-Whitney posthoc test plot."""
         plot_filename = self._prefix_with_benchmark(
             'kruskal_mann_whitney_plot.svg')
-        self._plotter.write_heatmap_plot(
-            self.kruskal_posthoc_p_values['mann_whitney'],
-            self._get_full_path(plot_filename),
-            symmetric=True)
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.kruskal_posthoc_p_values['mann_whitney'],
+                path,
+                symmetric=True))
 
     @property
     def kruskal_wilcoxon_plot(self):
         """Kruskal/Wilcoxon posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('kruskal_wilcoxon_plot.svg')
-        self._plotter.write_heatmap_plot(
-            self.kruskal_posthoc_p_values['wilcoxon'],
-            self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.kruskal_posthoc_p_values['wilcoxon'], path))
 
     @property
     def kruskal_dunn_plot(self):
         """Kruskal/Dunn posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('kruskal_dunn_plot.svg')
-        self._plotter.write_heatmap_plot(self.kruskal_posthoc_p_values['dunn'],
-                                         self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.kruskal_posthoc_p_values['dunn'], path))
 
     @property
     def kruskal_nemenyi_plot(self):
         """Kruskal/Nemenyi posthoc test plot."""
         plot_filename = self._prefix_with_benchmark('kruskal_nemenyi_plot.svg')
-        self._plotter.write_heatmap_plot(
-            self.kruskal_posthoc_p_values['nemenyi'],
-            self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.kruskal_posthoc_p_values['nemenyi'], path))
+
+    @property
+    @report_artifact_cache.cached
+    def _coverage_growth_bands(self):
+        """Median coverage over time with confidence bands, shared by the
+        linear and logscale coverage growth plots."""
+        return self._plotter.get_coverage_growth_bands(self._benchmark_df)
+
+    @property
+    @report_artifact_cache.cached
+    def _bug_coverage_growth_bands(self):
+        """Median bug coverage over time, shared by the linear and logscale
+        bug coverage growth plots."""
+        return self._plotter.get_coverage_growth_bands(self._benchmark_df,
+                                                       bugs=True)
 
     def _coverage_growth_plot(self, filename, bugs=False, logscale=False):
         """Coverage growth plot helper function"""
         plot_filename = self._prefix_with_benchmark(filename)
-        self._plotter.write_coverage_growth_plot(
-            self._benchmark_df,
-            self._get_full_path(plot_filename),
-            wide=True,
-            logscale=logscale,
-            bugs=bugs)
-        return plot_filename
+        return self._write_plot(
+            plot_filename,
+            lambda path: self._plotter.write_coverage_growth_plot(
+                self._benchmark_df,
+                path,
+                wide=True,
+                logscale=logscale,
+                bugs=bugs,
+                bands=self._bug_coverage_growth_bands
+                if bugs else self._coverage_growth_bands))
 
     @property
     def coverage_growth_plot(self):
@@ -334,10 +417,9 @@ class BenchmarkResults:
     def _generic_violin_plot(self, filename, bugs=False):
         """Violin plot."""
         plot_filename = self._prefix_with_benchmark(filename)
-        self._plotter.write_violin_plot(self._benchmark_snapshot_df,
-                                        self._get_full_path(plot_filename),
-                                        bugs=bugs)
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_violin_plot(
+                self._benchmark_snapshot_df, path, bugs=bugs))
 
     @property
     def violin_plot(self):
@@ -352,10 +434,9 @@ class BenchmarkResults:
     def _generic_box_plot(self, filename, bugs=False):
         """Generic internal boxplot."""
         plot_filename = self._prefix_with_benchmark(filename)
-        self._plotter.write_box_plot(self._benchmark_snapshot_df,
-                                     self._get_full_path(plot_filename),
-                                     bugs=bugs)
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_box_plot(
+                self._benchmark_snapshot_df, path, bugs=bugs))
 
     @property
     def box_plot(self):
@@ -371,27 +452,29 @@ class BenchmarkResults:
     def distribution_plot(self):
         """Distribution plot."""
         plot_filename = self._prefix_with_benchmark('distribution.svg')
-        self._plotter.write_distribution_plot(
-            self._benchmark_snapshot_df, self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_distribution_plot(
+                self._benchmark_snapshot_df, path))
 
     @property
     def ranking_plot(self):
         """Ranking plot."""
         plot_filename = self._prefix_with_benchmark('ranking.svg')
-        self._plotter.write_ranking_plot(self._benchmark_snapshot_df,
-                                         self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_ranking_plot(
+                self._benchmark_snapshot_df, path))
 
     @property
     def better_than_plot(self):
         """Better than matrix plot."""
-        better_than_table = data_utils.create_better_than_table(
-            self._benchmark_snapshot_df)
+
+        def write_plot(path):
+            better_than_table = data_utils.create_better_than_table(
+                self._benchmark_snapshot_df)
+            self._plotter.write_better_than_plot(better_than_table, path)
+
         plot_filename = self._prefix_with_benchmark('better_than.svg')
-        self._plotter.write_better_than_plot(better_than_table,
-                                             self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(plot_filename, write_plot)
 
     @property
     def unique_coverage_ranking_plot(self):
@@ -410,7 +493,7 @@ class BenchmarkResults:
         fuzzers = self.unique_branch_cov_df.sort_values(
             by='unique_branches_covered', ascending=False).fuzzer
         return coverage_data_utils.get_pairwise_unique_coverage_table(
-            self._benchmark_coverage_dict, fuzzers)
+            self._benchmark_coverage, fuzzers)
 
     @property
     def pairwise_unique_coverage_plot(self):
@@ -13,21 +13,28 @@
 # limitations under the License.
 """Utility functions for coverage data calculation."""
 
-import collections
 import itertools
 import json
+from multiprocessing import pool as mp_pool
+import os
 import posixpath
 from typing import Dict, List, Tuple
 import tempfile
 
+import numpy as np
 import pandas as pd
 
 from analysis import data_utils
+from common import experiment_utils
 from common import filestore_utils
 from common import logs
 
 logger = logs.Logger()
 
+# Number of covered branches files fetched from the filestore at once. Each
+# fetch can be a gsutil process.
+NUM_FETCH_THREADS = 8
+
 
 def fuzzer_and_benchmark_to_key(fuzzer: str, benchmark: str) -> str:
     """Returns the key representing |fuzzer| and |benchmark|."""
@@ -83,31 +90,60 @@ def get_covered_branches_dict(experiment_df: pd.DataFrame) -> Dict:
                   get_experiment_filestore_path_for_fuzzer_benchmark(
                       fuzzer, benchmark, experiment_df))
                  for fuzzer, benchmark in fuzzers_and_benchmarks]
-    result = itertools.starmap(get_fuzzer_benchmark_covered_branches_and_key,
-                               arguments)
+    if not arguments:
+        return {}
+    # Fetching is mostly waiting for the filestore, so it is done by threads.
+    with mp_pool.ThreadPool(min(NUM_FETCH_THREADS, len(arguments))) as pool:
+        result = pool.starmap(get_fuzzer_benchmark_covered_branches_and_key,
+                              arguments)
     return dict(result)
 
 
 def get_fuzzer_benchmark_covered_branches_filestore_path(
-        fuzzer: str, benchmark: str, exp_filestore_path: str) -> str:
-    """Returns the path to the covered branches json file in the |filestore| for
-    |fuzzer| and |benchmark|."""
+        fuzzer: str,
+        benchmark: str,
+        exp_filestore_path: str,
+        filename: str = experiment_utils.COVERED_BRANCHES_JSON_FILENAME) -> str:
+    """Returns the path to the covered branches file |filename| in the
+    |filestore| for |fuzzer| and |benchmark|."""
     return posixpath.join(exp_filestore_path, 'coverage', 'data', benchmark,
-                          fuzzer, 'covered_branches.json')
+                          fuzzer, filename)
+
+
+def read_covered_branches_npz(npz_file: str) -> np.ndarray:
+    """Returns the covered branches in |npz_file|, with a row for each
+    branch."""
+    with np.load(npz_file) as npz:
+        return npz['branches'].astype(np.int64)
 
 
 def get_fuzzer_covered_branches(fuzzer: str, benchmark: str, filestore: str):
-    """Returns the covered branches dict for |fuzzer| from the json file in the
-    filestore."""
-    src_file = get_fuzzer_benchmark_covered_branches_filestore_path(
-        fuzzer, benchmark, filestore)
-    with tempfile.NamedTemporaryFile() as dst_file:
-        if filestore_utils.cp(src_file, dst_file.name,
-                              expect_zero=False).retcode:
+    """Returns the branches covered by |fuzzer| on |benchmark| in the
+    filestore. They are read from the npz file, or from the json file of
+    experiments from before npz files were written."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        npz_src_file = get_fuzzer_benchmark_covered_branches_filestore_path(
+            fuzzer, benchmark, filestore,
+            experiment_utils.COVERED_BRANCHES_NPZ_FILENAME)
+        npz_dst_file = os.path.join(
+            temp_dir, experiment_utils.COVERED_BRANCHES_NPZ_FILENAME)
+        if not filestore_utils.cp(npz_src_file, npz_dst_file,
+                                  expect_zero=False).retcode:
+            try:
+                return read_covered_branches_npz(npz_dst_file)
+            except Exception:  # pylint: disable=broad-except
+                logger.error('Failed to read covered branches file: %s.',
+                             npz_src_file)
+
+        src_file = get_fuzzer_benchmark_covered_branches_filestore_path(
+            fuzzer, benchmark, filestore)
+        dst_file = os.path.join(temp_dir,
+                                experiment_utils.COVERED_BRANCHES_JSON_FILENAME)
+        if filestore_utils.cp(src_file, dst_file, expect_zero=False).retcode:
             logger.warning(
                 'covered_branches.json file: %s could not be copied.', src_file)
             return {}
-        with open(dst_file.name, encoding='utf-8') as json_file:
+        with open(dst_file, encoding='utf-8') as json_file:
             return json.load(json_file)
 
 
@@ -122,65 +158,123 @@ def get_fuzzer_benchmark_covered_branches_and_key(
     return key, fuzzer_benchmark_covered_branches
 
 
-def get_unique_branch_dict(benchmark_coverage_dict: Dict) -> Dict:
-    """Returns a dictionary containing the covering fuzzers for each unique
-    branch, where the |threshold| defines which branches are unique."""
-    branch_dict = collections.defaultdict(list)
-    unique_branch_dict = {}
-    threshold_count = 1
-    for fuzzer in benchmark_coverage_dict:
-        for branch in benchmark_coverage_dict[fuzzer]:
-            branch_dict[branch].append(fuzzer)
-    for branch, fuzzers in branch_dict.items():
-        if len(fuzzers) <= threshold_count:
-            unique_branch_dict[branch] = fuzzers
-    return unique_branch_dict
-
-
-def get_unique_branch_cov_df(unique_branch_dict: Dict,
+class BenchmarkCoverage:
+    """Branches covered by each fuzzer on a benchmark. Branches are interned
+    into dense integer ids: |branches|[i] is the branch with id i and
+    |covered|[j, i] is True if |fuzzers|[j] covers it. Set operations on the
+    coverage of fuzzers are vectorized operations on the rows of |covered|."""
+
+    def __init__(self, fuzzers: List[str], branches: np.ndarray,
+                 covered: np.ndarray):
+        self.fuzzers = fuzzers
+        self.branches = branches
+        self.covered = covered
+
+    def get_covered(self, fuzzers: List[str]) -> np.ndarray:
+        """Returns the rows of |covered| of |fuzzers|. Fuzzers without
+        coverage data cover no branches."""
+        fuzzer_indices = {
+            fuzzer: idx for idx, fuzzer in enumerate(self.fuzzers)
+        }
+        covered = np.zeros((len(fuzzers), len(self.branches)), dtype=bool)
+        for idx, fuzzer in enumerate(fuzzers):
+            if fuzzer in fuzzer_indices:
+                covered[idx] = self.covered[fuzzer_indices[fuzzer]]
+        return covered
+
+
+def _get_branches_array(covered_branches) -> np.ndarray:
+    """Returns |covered_branches|, an array or a list of branches that are
+    lists of integers, as a 2D array with a row for each branch."""
+    if isinstance(covered_branches, np.ndarray):
+        return covered_branches.astype(np.int64)
+    if not covered_branches:
+        return np.empty((0, 0), dtype=np.int64)
+    # Faster than converting the nested lists with np.array.
+    flat_branches = np.fromiter(itertools.chain.from_iterable(covered_branches),
+                                dtype=np.int64)
+    return flat_branches.reshape(len(covered_branches), -1)
+
+
+def _intern_branches(all_branches: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the distinct rows of |all_branches| and the index of each of its
+    rows in them."""
+    branches_df = pd.DataFrame(all_branches)
+    # Hashing rows is much faster than sorting them like np.unique does.
+    branch_ids = branches_df.groupby(list(branches_df.columns),
+                                     sort=False).ngroup().to_numpy()
+    _, first_indices = np.unique(branch_ids, return_index=True)
+    return all_branches[first_indices], branch_ids
+
+
+def get_benchmark_coverage(coverage_dict: Dict,
+                           benchmark: str) -> BenchmarkCoverage:
+    """Returns the BenchmarkCoverage of the fuzzers on |benchmark| in
+    |coverage_dict|."""
+    fuzzers = []
+    fuzzers_branches = []
+    for key, covered_branches in coverage_dict.items():
+        current_fuzzer, current_benchmark = key_to_fuzzer_and_benchmark(key)
+        if current_benchmark == benchmark:
+            fuzzers.append(current_fuzzer)
+            fuzzers_branches.append(_get_branches_array(covered_branches))
+
+    branch_width = max(
+        (fuzzer_branches.shape[1] for fuzzer_branches in fuzzers_branches),
+        default=0)
+    fuzzers_branches = [
+        fuzzer_branches.reshape(len(fuzzer_branches), branch_width)
+        for fuzzer_branches in fuzzers_branches
+    ]
+    all_branches = np.concatenate(fuzzers_branches +
+                                  [np.empty((0, branch_width), dtype=np.int64)])
+    if len(all_branches) == 0:
+        branches = all_branches
+        branch_ids = np.empty(0, dtype=np.int64)
+    else:
+        branches, branch_ids = _intern_branches(all_branches)
+
+    covered = np.zeros((len(fuzzers), len(branches)), dtype=bool)
+    fuzzer_ids = np.repeat(
+        np.arange(len(fuzzers)),
+        [len(fuzzer_branches) for fuzzer_branches in fuzzers_branches])
+    covered[fuzzer_ids, branch_ids] = True
+    return BenchmarkCoverage(fuzzers, branches, covered)
+
+
+def _get_unique_branches_mask(benchmark_coverage: BenchmarkCoverage):
+    """Returns a mask of the branches covered by only one fuzzer."""
+    return np.count_nonzero(benchmark_coverage.covered, axis=0) == 1
+
+
+def get_unique_branch_cov_df(benchmark_coverage: BenchmarkCoverage,
                              fuzzer_names: List[str]) -> pd.DataFrame:
     """Returns a DataFrame where the two columns are fuzzers and the number of
     unique branches covered."""
-    fuzzers = collections.defaultdict(int)
-    for branch in unique_branch_dict:
-        for fuzzer in unique_branch_dict[branch]:
-            fuzzers[fuzzer] += 1
-    dict_to_transform = {'fuzzer': [], 'unique_branches_covered': []}
-    for fuzzer in fuzzer_names:
-        covered_num = fuzzers[fuzzer]
-        dict_to_transform['fuzzer'].append(fuzzer)
-        dict_to_transform['unique_branches_covered'].append(covered_num)
-    return pd.DataFrame(dict_to_transform)
-
-
-def get_benchmark_cov_dict(coverage_dict, benchmark):
-    """Returns a dictionary to store the covered branches of each fuzzer. Uses a
-    set of tuples to store the covered branches."""
-    benchmark_cov_dict = {}
-    for key, covered_braches in coverage_dict.items():
-        current_fuzzer, current_benchmark = key_to_fuzzer_and_benchmark(key)
-        if current_benchmark == benchmark:
-            covered_braches_in_set = set()
-            for branch in covered_braches:
-                covered_braches_in_set.add(tuple(branch))
-            benchmark_cov_dict[current_fuzzer] = covered_braches_in_set
-    return benchmark_cov_dict
-
-
-def get_benchmark_aggregated_cov_df(coverage_dict, benchmark):
+    unique_branches_mask = _get_unique_branches_mask(benchmark_coverage)
+    covered = benchmark_coverage.get_covered(fuzzer_names)
+    return pd.DataFrame({
+        'fuzzer':
+            list(fuzzer_names),
+        'unique_branches_covered':
+            np.count_nonzero(covered & unique_branches_mask, axis=1),
+    })
+
+
+def get_benchmark_aggregated_cov_df(
+        benchmark_coverage: BenchmarkCoverage) -> pd.DataFrame:
     """Returns a dataframe where each row represents a fuzzer and its aggregated
     coverage number."""
-    dict_to_transform = {'fuzzer': [], 'aggregated_edges_covered': []}
-    for key, covered_branches in coverage_dict.items():
-        current_fuzzer, current_benchmark = key_to_fuzzer_and_benchmark(key)
-        if current_benchmark == benchmark:
-            dict_to_transform['fuzzer'].append(current_fuzzer)
-            dict_to_transform['aggregated_edges_covered'].append(
-                len(covered_branches))
-    return pd.DataFrame(dict_to_transform)
+    return pd.DataFrame({
+        'fuzzer':
+            benchmark_coverage.fuzzers,
+        'aggregated_edges_covered':
+            np.count_nonzero(benchmark_coverage.covered, axis=1),
+    })
 
 
-def get_pairwise_unique_coverage_table(benchmark_coverage_dict, fuzzers):
+def get_pairwise_unique_coverage_table(benchmark_coverage: BenchmarkCoverage,
+                                       fuzzers: List[str]) -> pd.DataFrame:
     """Returns a table that shows the unique coverage between each pair of
     fuzzers.
 
@@ -188,34 +282,16 @@ def get_pairwise_unique_coverage_table(benchmark_coverage_dict, fuzzers):
     row and column represents a fuzzer, and each cell contains a number
     showing the branches covered by the fuzzer of the column but not by
     the fuzzer of the row."""
-
-    pairwise_unique_coverage_values = []
-    for fuzzer_in_row in fuzzers:
-        row = []
-        for fuzzer_in_col in fuzzers:
-            pairwise_unique_coverage_value = get_unique_covered_percentage(
-                benchmark_coverage_dict[fuzzer_in_row],
-                benchmark_coverage_dict[fuzzer_in_col])
-            row.append(pairwise_unique_coverage_value)
-        pairwise_unique_coverage_values.append(row)
-
+    fuzzers = list(fuzzers)
+    covered = benchmark_coverage.get_covered(fuzzers)
+    pairwise_unique_coverage_values = np.array(
+        [np.count_nonzero(covered & ~row, axis=1) for row in covered],
+        dtype=np.int64).reshape(len(fuzzers), len(fuzzers))
     return pd.DataFrame(pairwise_unique_coverage_values,
                         index=fuzzers,
                         columns=fuzzers)
 
 
-def get_unique_covered_percentage(fuzzer_row_covered_branches,
-                                  fuzzer_col_covered_branches):
-    """Returns the number of branches covered by the fuzzer of the
-    column but not by the fuzzer of the row."""
-
-    unique_branch_count = 0
-    for branch in fuzzer_col_covered_branches:
-        if branch not in fuzzer_row_covered_branches:
-            unique_branch_count += 1
-    return unique_branch_count
-
-
 def rank_by_average_normalized_score(benchmarks_unique_coverage_list):
     """Returns the rank based on average normalized score on unique coverage."""
     df_list = [df.set_index('fuzzer') for df in benchmarks_unique_coverage_list]
@@ -0,0 +1,182 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bucketing of crashes into bugs. A crash is a new bug if ClusterFuzz's
+CrashComparer finds its crash state isn't similar to the state of any earlier
+crash, but the crash states are indexed so that most pairs never need to be
+compared."""
+import collections
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+from clusterfuzz.stacktraces.crash_comparer import CrashComparer
+
+
+def get_crash_states(crash_keys: pd.Series) -> pd.Series:
+    """Returns the crash states of |crash_keys|, which are a concatenation of
+    crash type and crash state: '{crash_type}:{crash_state}'."""
+    return crash_keys.astype(str).str.split(':', n=1).str[1].fillna('')
+
+
+def _levenshtein_distance(string_1: str, string_2: str) -> int:
+    """Returns the edit distance of |string_1| and |string_2|."""
+    if len(string_1) < len(string_2):
+        string_1, string_2 = string_2, string_1
+    previous_row = list(range(len(string_2) + 1))
+    for i, char_1 in enumerate(string_1):
+        row = [i + 1]
+        for j, char_2 in enumerate(string_2):
+            row.append(
+                min(row[j] + 1, previous_row[j + 1] + 1,
+                    previous_row[j] + (char_1 != char_2)))
+        previous_row = row
+    return previous_row[-1]
+
+
+def _has_common_frames(lines_1, lines_2, num_frames: int) -> bool:
+    """Returns True if the longest common subsequence of |lines_1| and
+    |lines_2| has at least |num_frames| lines."""
+    previous_row = [0] * (len(lines_2) + 1)
+    for line_1 in lines_1:
+        row = [0]
+        for j, line_2 in enumerate(lines_2):
+            if line_1 == line_2:
+                row.append(previous_row[j] + 1)
+            else:
+                row.append(max(previous_row[j + 1], row[j]))
+        previous_row = row
+    return previous_row[-1] >= num_frames
+
+
+class CrashBucketer:
+    """Finds the crash states that aren't similar to any crash state before
+    them, exactly like comparing each crash state with every earlier one using
+    CrashComparer(crash_state, earlier_crash_state).is_similar().
+
+    CrashComparer considers different crash states similar if they have at
+    least two frames in common or if their lines are similar on average. Equal
+    crash states are found by hashing and earlier crash states with a frame in
+    common through an index of their frames. Crash states are made of a small
+    number of distinct frames, so the similarity ratios of lines are cached
+    instead of being computed for every pair of crash states."""
+
+    def __init__(self):
+        self._line_similarity_ratios = {}
+
+    def _get_line_similarity_ratio(self, line_1: str, line_2: str) -> float:
+        """Returns the similarity ratio of |line_1| and |line_2| computed like
+        CrashComparer does."""
+        key = (line_1, line_2) if line_1 <= line_2 else (line_2, line_1)
+        ratio = self._line_similarity_ratios.get(key)
+        if ratio is None:
+            length_sum = len(line_1) + len(line_2)
+            if length_sum == 0:
+                ratio = 1.0
+            else:
+                ratio = (length_sum - _levenshtein_distance(line_1, line_2)) / (
+                    1.0 * length_sum)
+            self._line_similarity_ratios[key] = ratio
+        return ratio
+
+    def _has_similar_lines(self, lines_1, lines_2) -> bool:
+        """Returns True if the average similarity ratio of the lines of two
+        crash states is above CrashComparer's threshold."""
+        lines_compared = min(len(lines_1), len(lines_2))
+        # The edit distance of two lines is at least the difference of their
+        # lengths, which bounds their similarity ratio without computing it.
+        max_similarity_ratio_sum = 0.0
+        for line_1, line_2 in zip(lines_1, lines_2):
+            length_sum = len(line_1) + len(line_2)
+            if length_sum:
+                max_similarity_ratio_sum += (
+                    length_sum - abs(len(line_1) - len(line_2))) / (1.0 *
+                                                                    length_sum)
+            else:
+                max_similarity_ratio_sum += 1.0
+        if (max_similarity_ratio_sum / lines_compared <=
+                CrashComparer.COMPARE_THRESHOLD):
+            return False
+
+        similarity_ratio_sum = 0.0
+        for line_1, line_2 in zip(lines_1, lines_2):
+            similarity_ratio_sum += self._get_line_similarity_ratio(
+                line_1, line_2)
+        return (similarity_ratio_sum / lines_compared >
+                CrashComparer.COMPARE_THRESHOLD)
+
+    def get_firsts(self, crash_states: Iterable[str]) -> List[bool]:
+        """Returns whether each of |crash_states| is the first of its bug, i.e.
+        isn't similar to any crash state before it."""
+        # Maps earlier non-empty crash states to their lines.
+        earlier_crash_states = {}
+        # Maps frames to the earlier crash states containing them.
+        frame_index = collections.defaultdict(set)
+        firsts = []
+        for crash_state in crash_states:
+            if crash_state in earlier_crash_states:
+                firsts.append(False)
+                continue
+
+            # Empty crash states aren't similar to anything and crash states
+            # with a fuzzer hash are only similar to equal crash states.
+            if not crash_state:
+                firsts.append(True)
+                continue
+            lines = crash_state.splitlines()
+            firsts.append('FuzzerHash=' in crash_state or
+                          not self._is_similar_to_any(
+                              lines, earlier_crash_states, frame_index))
+
+            earlier_crash_states[crash_state] = lines
+            for line in lines:
+                frame_index[line].add(crash_state)
+        return firsts
+
+    def _is_similar_to_any(self, lines, earlier_crash_states,
+                           frame_index) -> bool:
+        """Returns True if the crash state with |lines| is similar to one of
+        the different |earlier_crash_states|."""
+        candidates = set()
+        for line in set(lines):
+            candidates.update(frame_index.get(line, ()))
+        for candidate in candidates:
+            candidate_lines = earlier_crash_states[candidate]
+            if (_has_common_frames(lines, candidate_lines,
+                                   CrashComparer.SAME_FRAMES_THRESHOLD) or
+                    self._has_similar_lines(lines, candidate_lines)):
+                return True
+
+        # Crash states without common frames can only be similar because of
+        # their lines.
+        for earlier_crash_state, earlier_lines in earlier_crash_states.items():
+            if (earlier_crash_state not in candidates and
+                    self._has_similar_lines(lines, earlier_lines)):
+                return True
+        return False
+
+
+def get_firsts(crash_keys: pd.Series, group_ids) -> np.ndarray:
+    """Returns a boolean array telling for every crash in |crash_keys| whether
+    it is the first crash of its bug among the earlier crashes with the same
+    group id in |group_ids|."""
+    crash_states = get_crash_states(crash_keys).to_numpy()
+    group_positions = collections.defaultdict(list)
+    for position, group_id in enumerate(np.asarray(group_ids)):
+        group_positions[group_id].append(position)
+
+    bucketer = CrashBucketer()
+    firsts = np.zeros(len(crash_states), dtype=bool)
+    for positions in group_positions.values():
+        firsts[positions] = bucketer.get_firsts(crash_states[positions])
+    return firsts
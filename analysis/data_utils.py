@@ -12,9 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Utility functions for data (frame) transformations."""
+import warnings
+
+import numpy as np
 import pandas as pd
-from clusterfuzz.stacktraces.crash_comparer import CrashComparer
+import scipy.stats as ss
 
+from analysis import crash_buckets
 from analysis import stat_tests
 from common import benchmark_utils
 from common import environment
@@ -78,22 +82,18 @@ def clobber_experiments_data(df, experiments):
     # We don't call |df| "experiment_df" because it is a misnomer and leads to
     # confusion in this case where it contains data from multiple experiments.
 
-    # Include everything from the last experiment.
-    experiments = experiments.copy()  # Copy so we dont mutate experiments.
-    experiments.reverse()
-    highest_rank_experiment = experiments[0]
-    result = df[df.experiment == highest_rank_experiment]
-
-    for experiment in experiments[1:]:
-        # Include data for not yet covered benchmark/fuzzer pairs.
-        covered_pairs = result[['benchmark', 'fuzzer']].drop_duplicates()
-        covered_pairs = covered_pairs.apply(tuple, axis=1)
-        experiment_data = df[df.experiment == experiment]
-        experiment_pairs = experiment_data[['benchmark',
-                                            'fuzzer']].apply(tuple, axis=1)
-        to_include = experiment_data[~experiment_pairs.isin(covered_pairs)]
-        result = pd.concat([result, to_include])
-    return result
+    # Rank experiments from the highest priority one (0) down.
+    experiment_ranks = {}
+    for rank, experiment in enumerate(reversed(experiments)):
+        experiment_ranks.setdefault(experiment, rank)
+    ranks = df.experiment.map(experiment_ranks)
+    # Keep the data of the highest priority experiment of each benchmark/fuzzer
+    # pair, listing the data of higher priority experiments first.
+    best_ranks = ranks.groupby([df.benchmark, df.fuzzer],
+                               dropna=False).transform('min')
+    is_kept = (ranks == best_ranks).values
+    order = np.argsort(ranks.values[is_kept], kind='stable')
+    return df[is_kept].iloc[order]
 
 
 def filter_fuzzers(experiment_df, included_fuzzers):
@@ -129,27 +129,6 @@ def filter_max_time(experiment_df, max_time):
     return experiment_df[experiment_df['time'] <= max_time]
 
 
-def is_unique_crash(crash_group):
-    """Check if each crash in |crash_group| is unique with CF's crash comparer.
-    Return the |crash_group| with an extra columns representing if that crash
-    is the first occurrence."""
-    unique_crashes = set()
-    is_firsts = []
-    for crash in crash_group.crash_key:
-        # crash_key is an concatenation of crash type and crash state:
-        # '{crash_type}:{crash_state}'
-        crash_state = ':'.join(str(crash).split(':')[1:])
-        is_unique = True
-        for unique_crash in unique_crashes:
-            if CrashComparer(crash_state, unique_crash).is_similar():
-                is_unique = False
-                break
-        unique_crashes.add(crash_state)
-        is_firsts.append(is_unique)
-    crash_group['firsts'] = is_firsts
-    return crash_group.firsts
-
-
 def add_bugs_covered_column(experiment_df):
     """Return a modified experiment df in which adds a |bugs_covered| column,
     a cumulative count of bugs covered over time."""
@@ -159,14 +138,45 @@ def add_bugs_covered_column(experiment_df):
     grouping2 = ['fuzzer', 'benchmark', 'trial_id']
     grouping3 = ['fuzzer', 'benchmark', 'trial_id', 'time']
     df = experiment_df.sort_values(grouping3)
-    df['firsts'] = (
-        df.groupby(grouping2, group_keys=False).apply(is_unique_crash) &
-        ~df.crash_key.isna())
-    df['bugs_cumsum'] = df.groupby(grouping2)['firsts'].transform('cumsum')
-    df['bugs_covered'] = (
-        df.groupby(grouping3)['bugs_cumsum'].transform('max').astype(int))
-    new_df = df.drop(columns=['bugs_cumsum', 'firsts'])
-    return new_df
+    if df.empty:
+        df['bugs_covered'] = 0
+        return df
+
+    # The rows of each trial, and of each of its snapshots, are contiguous once
+    # sorted, so groups are found by comparing rows with the previous one.
+    trial_starts = _get_changes(df, grouping2)
+    snapshot_starts = trial_starts | _get_changes(df, ['time'])
+    trial_ids = np.cumsum(trial_starts) - 1
+    snapshot_ids = np.cumsum(snapshot_starts) - 1
+
+    # Only rows with a crash can be the first of a bug.
+    crash_positions = np.flatnonzero(df.crash_key.notna().values)
+    firsts = np.zeros(len(df), dtype=int)
+    firsts[crash_positions] = crash_buckets.get_firsts(
+        df.crash_key.iloc[crash_positions], trial_ids[crash_positions])
+
+    # Count bugs cumulatively within each trial.
+    bugs_cumsum = np.cumsum(firsts)
+    bugs_before_trial = (bugs_cumsum - firsts)[trial_starts]
+    bugs_cumsum -= bugs_before_trial[trial_ids]
+    # Bugs only add up over time, so the number of bugs covered at a snapshot
+    # is the count at its last row.
+    snapshot_ends = np.append(
+        np.flatnonzero(snapshot_starts)[1:] - 1,
+        len(df) - 1)
+    df['bugs_covered'] = bugs_cumsum[snapshot_ends][snapshot_ids]
+    return df
+
+
+def _get_changes(df, columns):
+    """Returns a boolean array telling for every row of |df| whether it is the
+    first row or if its values of |columns| differ from the previous row."""
+    changes = np.zeros(len(df), dtype=bool)
+    changes[0] = True
+    for column in columns:
+        values = df[column].values
+        changes[1:] |= values[1:] != values[:-1]
+    return changes
 
 
 # Creating "snapshots" (see README.md for definition).
@@ -222,13 +232,107 @@ def get_experiment_snapshots(experiment_df):
     Returns the data frame that only contains the measurements made at these
     snapshot times.
     """
-    benchmark_groups = experiment_df.groupby('benchmark')
-    experiment_snapshots = benchmark_groups.apply(get_benchmark_snapshot)
-    # We don't need the extra index added by the groupby('benchmark').
+    if experiment_df.empty:
+        return experiment_df.reset_index(drop=True)
+
+    # Find the snapshot time of every benchmark at once, like
+    # get_benchmark_snapshot does for each of them.
+    threshold = environment.get('BENCHMARK_SAMPLE_NUM_THRESHOLD',
+                                _MIN_FRACTION_OF_ALIVE_TRIALS_AT_SNAPSHOT)
+    benchmark_codes, _ = pd.factorize(experiment_df.benchmark, sort=True)
+    times = experiment_df.time.values
+    num_trials = experiment_df.trial_id.groupby(benchmark_codes).nunique()
+    trials_running_at_time = pd.Series(times).groupby([benchmark_codes,
+                                                       times]).size()
+    codes = trials_running_at_time.index.get_level_values(0)
+    criteria = (trials_running_at_time.values >=
+                threshold * num_trials.loc[codes].values)
+    latest_ok_times = pd.Series(
+        trials_running_at_time.index.get_level_values(1)[criteria]).groupby(
+            codes[criteria]).max().reindex(range(benchmark_codes.max() + 1))
+
+    is_snapshot = times == latest_ok_times.values[benchmark_codes]
+    order = np.argsort(benchmark_codes[is_snapshot], kind='stable')
+    experiment_snapshots = experiment_df[is_snapshot].iloc[order]
+    # We don't need the original index.
     experiment_snapshots.reset_index(drop=True, inplace=True)
     return experiment_snapshots
 
 
+# Median coverage over time with confidence bands, for coverage growth plots.
+
+_NUM_BOOTSTRAPS = 1000
+
+
+def _get_bootstrap_median_interval(matrix, confidence, seed):
+    """Returns the bounds of the bootstrap |confidence| interval of the median
+    of each column of the [trial x time] |matrix|. Trials are resampled with
+    replacement _NUM_BOOTSTRAPS times, all times at once."""
+    rng = np.random.default_rng(seed)
+    num_trials = matrix.shape[0]
+    resamples = matrix[rng.integers(num_trials,
+                                    size=(_NUM_BOOTSTRAPS, num_trials))]
+    with warnings.catch_warnings():
+        # Resamples of sparse columns can have no values.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medians = np.nanmedian(resamples, axis=1)
+    alpha = (1 - confidence) / 2
+    return np.nanquantile(medians, [alpha, 1 - alpha], axis=0)
+
+
+def _get_quantile_median_interval(matrix, confidence):
+    """Returns the bounds of the distribution-free |confidence| interval of the
+    median of each column of the [trial x time] |matrix|, which are the order
+    statistics around the median given by the binomial distribution."""
+    num_values = np.count_nonzero(~np.isnan(matrix), axis=0)
+    # NaNs are sorted last.
+    sorted_matrix = np.sort(matrix, axis=0)
+    alpha = (1 - confidence) / 2
+    lower_ranks = np.maximum(ss.binom.ppf(alpha, num_values, 0.5), 1)
+    lower_indexes = (lower_ranks - 1).astype(int)
+    upper_indexes = np.maximum(num_values - lower_ranks, 0).astype(int)
+    return (np.take_along_axis(sorted_matrix, lower_indexes[None, :], 0)[0],
+            np.take_along_axis(sorted_matrix, upper_indexes[None, :], 0)[0])
+
+
+def get_coverage_growth_bands(benchmark_df,
+                              key='edges_covered',
+                              interval='bootstrap',
+                              confidence=0.95,
+                              seed=0):
+    """Returns the median |key| of each fuzzer at each time in |benchmark_df|,
+    with the bounds of a |confidence| interval of the median in the |lower| and
+    |upper| columns.
+
+    The interval is computed by bootstrapping the trials if |interval| is
+    'bootstrap', or from the order statistics of the trials, which is much
+    faster, if it is 'quantile'. If |interval| is None, the bounds are NaN.
+    """
+    trials_df = benchmark_df.groupby(['fuzzer', 'trial_id',
+                                      'time'])[key].max().unstack('time')
+    bands_dfs = []
+    for fuzzer, fuzzer_trials_df in trials_df.groupby(level='fuzzer'):
+        matrix = fuzzer_trials_df.values.astype(float)
+        has_values = ~np.isnan(matrix).all(axis=0)
+        matrix = matrix[:, has_values]
+        if interval == 'bootstrap':
+            lower, upper = _get_bootstrap_median_interval(
+                matrix, confidence, seed)
+        elif interval == 'quantile':
+            lower, upper = _get_quantile_median_interval(matrix, confidence)
+        else:
+            lower = upper = np.full(matrix.shape[1], np.nan)
+        bands_dfs.append(
+            pd.DataFrame({
+                'fuzzer': fuzzer,
+                'time': trials_df.columns[has_values],
+                'median': np.nanmedian(matrix, axis=0),
+                'lower': lower,
+                'upper': upper,
+            }))
+    return pd.concat(bands_dfs, ignore_index=True)
+
+
 # Summary tables containing statistics on the samples.
 
 
@@ -0,0 +1,184 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for a local cache of the experiment data read from the database.
+Reports are regenerated throughout an experiment, so instead of reading every
+snapshot again each time, the cache only reads the snapshots taken since it was
+last updated. The measurer writes the snapshots of a trial in the order they
+were taken, so the latest cached snapshot of each trial is a high-water mark
+after which snapshots are new.
+
+Data is stored in pandas' binary format, with the columns that repeat a few
+values as categoricals, so that it is loaded much faster than CSV."""
+
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+from analysis import queries
+from common import filesystem
+from common import logs
+
+logger = logs.Logger()
+
+CACHE_VERSION = 1
+
+# Columns of queries.get_experiment_data in the order it returns them.
+EXPERIMENT_DATA_COLUMNS = [
+    'git_hash', 'experiment_filestore', 'experiment', 'fuzzer', 'benchmark',
+    'time_started', 'time_ended', 'trial_id', 'time', 'edges_covered',
+    'fuzzer_stats', 'crash_key'
+]
+CATEGORICAL_COLUMNS = ['experiment', 'fuzzer', 'benchmark']
+
+
+def _get_new_snapshots(experiment_name, benchmarks, trials_df,
+                       cached_snapshots_df):
+    """Returns the snapshots of the trials in |trials_df| taken after the latest
+    snapshot of their trial in |cached_snapshots_df|."""
+    latest_times = cached_snapshots_df.groupby('trial_id')['time'].max()
+    latest_times = latest_times[latest_times.index.isin(trials_df.trial_id)]
+    if latest_times.empty:
+        return queries.get_snapshots_data(experiment_name, benchmarks)
+
+    is_cached = trials_df.trial_id.isin(latest_times.index)
+    uncached_trial_ids = trials_df.trial_id[~is_cached].tolist()
+    snapshots_df = queries.get_snapshots_data(experiment_name,
+                                              benchmarks,
+                                              min_time=int(latest_times.min()),
+                                              trial_ids=uncached_trial_ids)
+    # Trials without cached snapshots have no high-water mark.
+    high_water_marks = snapshots_df.trial_id.map(latest_times).fillna(-1)
+    return snapshots_df[snapshots_df.time > high_water_marks]
+
+
+class ExperimentDataCache:
+    """Cache of the experiment data of each experiment in |cache_dir|."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _get_path(self, experiment_name: str) -> str:
+        return os.path.join(self.cache_dir, experiment_name + '.pkl')
+
+    def _read(self, experiment_name: str,
+              benchmarks: Optional[List[str]]) -> Optional[dict]:
+        """Returns the cache entry of |experiment_name| if it has the data of
+        |benchmarks|, or of every benchmark if |benchmarks| is empty."""
+        path = self._get_path(experiment_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            entry = pd.read_pickle(path)
+        except Exception:  # pylint: disable=broad-except
+            logger.error('Failed to read experiment data cache %s.', path)
+            return None
+        if entry['version'] != CACHE_VERSION:
+            return None
+        if entry['benchmarks'] is None:
+            return entry
+        if benchmarks and set(benchmarks).issubset(entry['benchmarks']):
+            return entry
+        return None
+
+    def _write(self, experiment_name: str, entry: dict):
+        """Replaces the cache entry of |experiment_name| with |entry| at
+        once."""
+        filesystem.create_directory(self.cache_dir)
+        path = self._get_path(experiment_name)
+        temp_path = path + '.tmp'
+        pd.to_pickle(entry, temp_path)
+        os.replace(temp_path, path)
+
+    def _update_experiment(self, experiment_name: str,
+                           benchmarks: Optional[List[str]]) -> dict:
+        """Reads the trials and the new snapshots of |experiment_name| from the
+        database into its cache entry and returns the entry."""
+        entry = self._read(experiment_name, benchmarks)
+        if entry is not None:
+            # Keep caching the benchmarks that were cached before.
+            benchmarks = entry['benchmarks']
+
+        # Trials are few but change while they run, so they are always read
+        # again.
+        trials_df = queries.get_trials_data(experiment_name, benchmarks)
+        for column in CATEGORICAL_COLUMNS:
+            trials_df[column] = trials_df[column].astype('category')
+        if entry is None:
+            snapshots_df = queries.get_snapshots_data(experiment_name,
+                                                      benchmarks)
+        else:
+            cached_snapshots_df = entry['snapshots']
+            new_snapshots_df = _get_new_snapshots(experiment_name, benchmarks,
+                                                  trials_df,
+                                                  cached_snapshots_df)
+            logger.info('Read %d new snapshot rows of %s.',
+                        len(new_snapshots_df), experiment_name)
+            snapshots_df = pd.concat([cached_snapshots_df, new_snapshots_df],
+                                     ignore_index=True)
+        # Drop the snapshots of trials that were preempted since.
+        snapshots_df = snapshots_df[snapshots_df.trial_id.isin(
+            trials_df.trial_id)].reset_index(drop=True)
+
+        entry = {
+            'version': CACHE_VERSION,
+            'benchmarks': sorted(benchmarks) if benchmarks else None,
+            'trials': trials_df,
+            'snapshots': snapshots_df,
+        }
+        self._write(experiment_name, entry)
+        return entry
+
+    @staticmethod
+    def _get_experiment_df(entry: dict,
+                           benchmarks: Optional[List[str]]) -> pd.DataFrame:
+        """Returns the data of |benchmarks| in |entry| like
+        queries.get_experiment_data does."""
+        trials_df = entry['trials']
+        if benchmarks:
+            trials_df = trials_df[trials_df.benchmark.isin(benchmarks)]
+        experiment_df = trials_df.merge(entry['snapshots'], on='trial_id')
+        # Report code handles these columns as strings.
+        for column in CATEGORICAL_COLUMNS:
+            experiment_df[column] = experiment_df[column].astype(object)
+        return experiment_df[EXPERIMENT_DATA_COLUMNS]
+
+    def _concat(self, entries, benchmarks):
+        return pd.concat(
+            [self._get_experiment_df(entry, benchmarks) for entry in entries],
+            ignore_index=True)
+
+    def update(self,
+               experiment_names: List[str],
+               benchmarks: Optional[List[str]] = None) -> pd.DataFrame:
+        """Brings the cache up to date with the database and returns the data
+        of |experiment_names| that queries.get_experiment_data would."""
+        entries = [
+            self._update_experiment(experiment_name, benchmarks)
+            for experiment_name in experiment_names
+        ]
+        return self._concat(entries, benchmarks)
+
+    def load(self,
+             experiment_names: List[str],
+             benchmarks: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Returns the cached data of |experiment_names| without reading the
+        database, or None if some of it isn't cached."""
+        entries = []
+        for experiment_name in experiment_names:
+            entry = self._read(experiment_name, benchmarks)
+            if entry is None:
+                return None
+            entries.append(entry)
+        return self._concat(entries, benchmarks)
@@ -21,6 +21,7 @@ import seaborn as sns
 from analysis import benchmark_results
 from analysis import coverage_data_utils
 from analysis import data_utils
+from analysis import report_artifact_cache
 from analysis import stat_tests
 from common import experiment_utils
 
@@ -41,6 +42,9 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
     result is a property, which is lazily computed and memorized when
     needed multiple times. Therefore, when used as a context of a report
     template, only the properties needed for the given report will be computed.
+
+    If |artifact_cache| is set, tables, test results and plots are also cached
+    there, so that they are reused while the experiment data doesn't change.
     """
 
     # Summary table style
@@ -59,7 +63,8 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
             coverage_dict,
             output_directory,
             plotter,
-            experiment_name=None):
+            experiment_name=None,
+            artifact_cache=None):
         if experiment_name:
             self.name = experiment_name
         else:
@@ -95,12 +100,30 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
         # Dictionary to store the full coverage data.
         self._coverage_dict = coverage_dict
 
+        self._artifact_cache = artifact_cache
+        self.artifacts = report_artifact_cache.Artifacts(
+            artifact_cache, self._get_artifact_key_parts)
+
         self.experiment_filestore = strip_gs_protocol(
             experiment_df.experiment_filestore.iloc[0])
 
+    def _get_artifact_key_parts(self):
+        benchmark_types = [
+            (benchmark.name, benchmark.type) for benchmark in self.benchmarks
+        ]
+        return (benchmark_types, self._plotter.settings, self._experiment_df)
+
     def _get_full_path(self, filename):
         return os.path.join(self._output_directory, filename)
 
+    def _write_plot(self, plot_filename, write_plot):
+        """Writes the plot |plot_filename| with |write_plot|(path) unless it
+        is cached. Returns |plot_filename|."""
+        self.artifacts.write_file(plot_filename,
+                                  self._get_full_path(plot_filename),
+                                  write_plot)
+        return plot_filename
+
     def linkify_names(self, df):
         """For any DataFrame which is indexed by fuzzer names, turns the fuzzer
         names into links to their directory with a description on GitHub."""
@@ -135,7 +158,8 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
             benchmark_results.BenchmarkResults(name, self._experiment_df,
                                                self._coverage_dict,
                                                self._output_directory,
-                                               self._plotter)
+                                               self._plotter,
+                                               self._artifact_cache)
             for name in sorted(benchmark_names)
         ]
 
@@ -159,6 +183,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def summary_table(self):
         """A pivot table of medians for each fuzzer on each benchmark."""
         return data_utils.experiment_pivot_table(
@@ -273,6 +298,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
             experiment_level_ranking_function)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_average_rank_and_average_rank(self):
         """Rank fuzzers using average rank per benchmark and average rank
         across benchmarks."""
@@ -280,6 +306,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
                              data_utils.experiment_rank_by_average_rank)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_mean_and_average_rank(self):
         """Rank fuzzers using mean coverage per benchmark and average rank
         across benchmarks."""
@@ -287,6 +314,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
                              data_utils.experiment_rank_by_average_rank)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_median_and_average_rank(self):
         """Rank fuzzers using median coverage per benchmark and average rank
         across benchmarks."""
@@ -294,6 +322,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
                              data_utils.experiment_rank_by_average_rank)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_median_and_average_normalized_score(self):
         """Rank fuzzers using median coverage per benchmark and average
         normalized score across benchmarks."""
@@ -302,6 +331,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
             data_utils.experiment_rank_by_average_normalized_score)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_median_and_number_of_firsts(self):
         """Rank fuzzers using median coverage per benchmark and number of first
         places across benchmarks."""
@@ -309,6 +339,7 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
                              data_utils.experiment_rank_by_num_firsts)
 
     @property
+    @report_artifact_cache.cached
     def rank_by_stat_test_wins_and_average_rank(self):
         """Rank fuzzers using statistical test wins per benchmark and average
         rank across benchmarks."""
@@ -316,12 +347,14 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
                              data_utils.experiment_rank_by_num_firsts)
 
     @property
+    @report_artifact_cache.cached
     def friedman_p_value(self):
         """Friedman test result."""
         return stat_tests.friedman_test(self.summary_table)
 
     @property
     @functools.lru_cache()
+    @report_artifact_cache.cached
     def friedman_posthoc_p_values(self):
         """Friedman posthoc test results."""
         return stat_tests.friedman_posthoc_tests(self.summary_table)
@@ -330,21 +363,19 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
     def friedman_conover_plot(self):
         """Friedman/Conover posthoc test result plot."""
         plot_filename = 'experiment_friedman_conover_plot.svg'
-        self._plotter.write_heatmap_plot(
-            self.friedman_posthoc_p_values['conover'],
-            self._get_full_path(plot_filename),
-            symmetric=True)
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.friedman_posthoc_p_values['conover'], path, symmetric=True)
+        )
 
     @property
     def friedman_nemenyi_plot(self):
         """Friedman/Nemenyi posthoc test result plot."""
         plot_filename = 'experiment_friedman_nemenyi_plot.svg'
-        self._plotter.write_heatmap_plot(
-            self.friedman_posthoc_p_values['nemenyi'],
-            self._get_full_path(plot_filename),
-            symmetric=True)
-        return plot_filename
+        return self._write_plot(
+            plot_filename, lambda path: self._plotter.write_heatmap_plot(
+                self.friedman_posthoc_p_values['nemenyi'], path, symmetric=True)
+        )
 
     @property
     def critical_difference_plot(self):
@@ -353,11 +384,12 @@ class ExperimentResults:  # pylint: disable=too-many-instance-attributes
         Represents average ranks of fuzzers across all benchmarks,
         considering medians on final coverage.
         """
-        average_ranks = self.rank_by_median_and_average_rank
-        num_of_benchmarks = self.summary_table.shape[0]
+
+        def write_plot(path):
+            average_ranks = self.rank_by_median_and_average_rank
+            num_of_benchmarks = self.summary_table.shape[0]
+            self._plotter.write_critical_difference_plot(
+                average_ranks, num_of_benchmarks, path)
 
         plot_filename = 'experiment_critical_difference_plot.svg'
-        self._plotter.write_critical_difference_plot(
-            average_ranks, num_of_benchmarks,
-            self._get_full_path(plot_filename))
-        return plot_filename
+        return self._write_plot(plot_filename, write_plot)
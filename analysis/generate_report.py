@@ -14,23 +14,36 @@
 """Report generator tool."""
 
 import argparse
+import multiprocessing
 import os
 import sys
+import tempfile
 
+import matplotlib
 import pandas as pd
 
 from analysis import data_utils
 from analysis import coverage_data_utils
+from analysis import experiment_data_cache
 from analysis import experiment_results
 from analysis import plotting
 from analysis import queries
 from analysis import rendering
+from analysis import report_artifact_cache
 from common import filesystem
 from common import logs
 
 logger = logs.Logger()
 
 DATA_FILENAME = 'data.csv.gz'
+DATA_CACHE_DIRNAME = 'data-cache'
+
+# Maximum number of processes computing benchmark artifacts by default. Each
+# one holds a copy of the data of the benchmarks it computes.
+MAX_DEFAULT_NUM_PROCESSES = 4
+
+# Benchmarks whose artifacts are computed by a worker process.
+_prefetched_benchmarks = []  # pylint: disable=invalid-name
 
 
 def get_arg_parser():
@@ -123,25 +136,44 @@ def get_arg_parser():
         default=False,
         help=('If set, and the experiment data is already cached, '
               'don\'t query the database again to get the data.'))
+    parser.add_argument(
+        '--num-processes',
+        default=None,
+        type=int,
+        help=('Number of processes computing the plots and tables of '
+              'benchmarks. Default: number of CPUs, up to '
+              f'{MAX_DEFAULT_NUM_PROCESSES}.'))
 
     return parser
 
 
-def get_experiment_data(experiment_names,
-                        main_experiment_name,
-                        from_cached_data,
-                        data_path,
-                        main_experiment_benchmarks=None):
+def get_experiment_data(  # pylint: disable=too-many-arguments
+        experiment_names,
+        main_experiment_name,
+        from_cached_data,
+        data_path,
+        main_experiment_benchmarks=None,
+        data_cache_dir=None):
     """Helper function that reads data from disk or from the database. Returns a
-    dataframe and the experiment description."""
+    dataframe and the experiment description. Data read from the database is
+    cached in |data_cache_dir| so that only new data is read next time."""
+    data_cache = experiment_data_cache.ExperimentDataCache(
+        data_cache_dir or
+        os.path.join(os.path.dirname(data_path), DATA_CACHE_DIRNAME))
+    if from_cached_data:
+        experiment_df = data_cache.load(experiment_names,
+                                        main_experiment_benchmarks)
+        if experiment_df is not None:
+            logger.info('Read experiment data from %s.', data_cache.cache_dir)
+            return experiment_df, 'from cached data'
     if from_cached_data and os.path.exists(data_path):
         logger.info('Reading experiment data from %s.', data_path)
         experiment_df = pd.read_csv(data_path)
         logger.info('Done reading data from %s.', data_path)
         return experiment_df, 'from cached data'
     logger.info('Reading experiment data from db.')
-    experiment_df = queries.get_experiment_data(experiment_names,
-                                                main_experiment_benchmarks)
+    experiment_df = data_cache.update(experiment_names,
+                                      main_experiment_benchmarks)
     logger.info('Done reading experiment data from db.')
     description = queries.get_experiment_description(main_experiment_name)
     return experiment_df, description
@@ -186,6 +218,45 @@ def modify_experiment_data_if_requested(  # pylint: disable=too-many-arguments
     return experiment_df
 
 
+def _initialize_prefetch_worker(benchmarks):
+    """Sets up a worker process prefetching the artifacts of |benchmarks|."""
+    global _prefetched_benchmarks  # pylint: disable=global-statement
+    _prefetched_benchmarks = benchmarks
+    # Plots are only written to files.
+    matplotlib.use('Agg')
+
+
+def _prefetch_benchmark_artifacts(benchmark_index):
+    """Computes the report properties of the benchmark at |benchmark_index|,
+    which caches their artifacts."""
+    benchmark = _prefetched_benchmarks[benchmark_index]
+    try:
+        for name in benchmark.report_properties:
+            getattr(benchmark, name)
+    except Exception:  # pylint: disable=broad-except
+        # Rendering the report computes the artifacts that are missing again.
+        logger.error('Failed to prefetch artifacts of %s.', benchmark.name)
+
+
+def prefetch_benchmark_artifacts(benchmarks, num_processes=None):
+    """Computes the artifacts shown in the report for each of |benchmarks| in
+    |num_processes| processes, so that rendering the report gets them from
+    the artifact cache of |benchmarks| instead of computing them one after
+    another. Plots are written to where rendering writes them. |num_processes|
+    defaults to the number of CPUs, up to MAX_DEFAULT_NUM_PROCESSES."""
+    if not num_processes:
+        num_processes = min(os.cpu_count(), MAX_DEFAULT_NUM_PROCESSES)
+    num_processes = min(num_processes, len(benchmarks))
+    if num_processes < 2:
+        return
+    # Forked workers use |benchmarks| without pickling their data.
+    context = multiprocessing.get_context('fork')
+    with context.Pool(num_processes,
+                      initializer=_initialize_prefetch_worker,
+                      initargs=(benchmarks,)) as pool:
+        pool.map(_prefetch_benchmark_artifacts, range(len(benchmarks)))
+
+
 # pylint: disable=too-many-arguments,too-many-locals
 def generate_report(experiment_names,
                     report_directory,
@@ -202,8 +273,16 @@ def generate_report(experiment_names,
                     merge_with_clobber=False,
                     merge_with_clobber_nonprivate=False,
                     coverage_report=False,
-                    experiment_benchmarks=None):
-    """Generate report helper."""
+                    experiment_benchmarks=None,
+                    data_cache_dir=None,
+                    artifact_cache_dir=None,
+                    num_processes=None):
+    """Generate report helper. Experiment data is cached in |data_cache_dir|,
+    which defaults to a directory in |report_directory|. If
+    |artifact_cache_dir| is set, the tables and plots of the report are cached
+    there and reused by the next report for the data that didn't change.
+    Benchmark artifacts are computed in |num_processes| processes, which
+    defaults to the number of CPUs, up to MAX_DEFAULT_NUM_PROCESSES."""
     if merge_with_clobber_nonprivate:
         experiment_names = (
             queries.add_nonprivate_experiments_for_merge_with_clobber(
@@ -221,7 +300,8 @@ def generate_report(experiment_names,
         main_experiment_name,
         from_cached_data,
         data_path,
-        main_experiment_benchmarks=experiment_benchmarks)
+        main_experiment_benchmarks=experiment_benchmarks,
+        data_cache_dir=data_cache_dir)
 
     # TODO(metzman): Ensure that each experiment is in the df. Otherwise there
     # is a good chance user misspelled something.
@@ -249,19 +329,33 @@ def generate_report(experiment_names,
 
     fuzzer_names = experiment_df.fuzzer.unique()
     plotter = plotting.Plotter(fuzzer_names, quick, log_scale)
-    experiment_ctx = experiment_results.ExperimentResults(
-        experiment_df,
-        coverage_dict,
-        report_directory,
-        plotter,
-        experiment_name=report_name)
-
-    template = report_type + '.html'
-    logger.info('Rendering HTML report.')
-    detailed_report = rendering.render_report(experiment_ctx, template,
-                                              in_progress, coverage_report,
-                                              experiment_description)
-    logger.info('Done rendering HTML report.')
+    # Prefetched artifacts are passed to rendering through the artifact cache,
+    # which is temporary if |artifact_cache_dir| isn't set.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact_cache = report_artifact_cache.ReportArtifactCache(
+            artifact_cache_dir or temp_dir)
+        experiment_ctx = experiment_results.ExperimentResults(
+            experiment_df,
+            coverage_dict,
+            report_directory,
+            plotter,
+            experiment_name=report_name,
+            artifact_cache=artifact_cache)
+
+        if report_type == 'default':
+            logger.info('Computing benchmark plots and tables.')
+            prefetch_benchmark_artifacts(experiment_ctx.benchmarks,
+                                         num_processes)
+
+        template = report_type + '.html'
+        logger.info('Rendering HTML report.')
+        detailed_report = rendering.render_report(experiment_ctx, template,
+                                                  in_progress, coverage_report,
+                                                  experiment_description)
+        logger.info('Done rendering HTML report.')
+
+        # Remove the artifacts of data that changed since the last report.
+        artifact_cache.prune()
 
     filesystem.write(os.path.join(report_directory, 'index.html'),
                      detailed_report)
@@ -286,7 +380,8 @@ def main():
                     from_cached_data=args.from_cached_data,
                     end_time=args.end_time,
                     merge_with_clobber=args.merge_with_clobber,
-                    coverage_report=args.coverage_report)
+                    coverage_report=args.coverage_report,
+                    num_processes=args.num_processes)
 
 
 if __name__ == '__main__':
@@ -110,6 +110,13 @@ class Plotter:
         self._quick = quick
         self._logscale = logscale
 
+    @property
+    def settings(self):
+        """Settings that the plots depend on, other than their data."""
+        return (sorted(self._fuzzer_colors.items()),
+                sorted(self._fuzzer_markers.items()), self._quick,
+                self._logscale)
+
     def _write_plot_to_image(self,
                              plot_function,
                              data,
@@ -137,12 +144,35 @@ class Plotter:
         if snapshot:
             assert benchmark_df.time.nunique() == 1, 'Not a snapshot!'
 
-    def coverage_growth_plot(self,
-                             benchmark_df,
-                             axes=None,
-                             logscale=False,
-                             bugs=False):
-        """Draws edge (or bug) coverage growth plot on given |axes|.
+    def get_coverage_growth_bands(self, benchmark_df, bugs=False):
+        """Returns the median edge (or bug) coverage of each fuzzer over time
+        up to the snapshot time, with the confidence band drawn around it.
+        Bands are bootstrapped, or computed from quantiles if |quick|. Bug
+        coverage has no band."""
+        column_of_interest = 'bugs_covered' if bugs else 'edges_covered'
+        benchmark_snapshot_df = data_utils.get_benchmark_snapshot(benchmark_df)
+        snapshot_time = benchmark_snapshot_df.time.unique()[0]
+        if bugs:
+            interval = None
+        elif self._quick:
+            interval = 'quantile'
+        else:
+            interval = 'bootstrap'
+        return data_utils.get_coverage_growth_bands(
+            benchmark_df[benchmark_df.time <= snapshot_time],
+            key=column_of_interest,
+            interval=interval)
+
+    def coverage_growth_plot(  # pylint: disable=too-many-arguments
+            self,
+            benchmark_df,
+            axes=None,
+            logscale=False,
+            bugs=False,
+            bands=None):
+        """Draws edge (or bug) coverage growth plot on given |axes|. |bands|
+        are the result of get_coverage_growth_bands, which is called if they
+        aren't given.
 
         The fuzzer labels will be in the order of their mean coverage at the
         snapshot time (typically, the end of experiment).
@@ -156,19 +186,25 @@ class Plotter:
         fuzzer_order = data_utils.benchmark_rank_by_mean(
             benchmark_snapshot_df, key=column_of_interest).index
 
-        axes = sns.lineplot(
-            y=column_of_interest,
-            x='time',
-            hue='fuzzer',
-            hue_order=fuzzer_order,
-            data=benchmark_df[benchmark_df.time <= snapshot_time],
-            ci=None if bugs or self._quick else 95,
-            estimator=np.median,
-            palette=self._fuzzer_colors,
-            style='fuzzer',
-            dashes=False,
-            markers=self._fuzzer_markers,
-            ax=axes)
+        if bands is None:
+            bands = self.get_coverage_growth_bands(benchmark_df, bugs=bugs)
+        if axes is None:
+            axes = plt.gca()
+        fuzzer_bands = dict(tuple(bands.groupby('fuzzer')))
+        for fuzzer in fuzzer_order:
+            fuzzer_band = fuzzer_bands[fuzzer]
+            axes.plot(fuzzer_band.time,
+                      fuzzer_band['median'],
+                      color=self._fuzzer_colors[fuzzer],
+                      marker=self._fuzzer_markers[fuzzer],
+                      label=fuzzer)
+            if fuzzer_band.lower.notna().any():
+                axes.fill_between(fuzzer_band.time,
+                                  fuzzer_band.lower,
+                                  fuzzer_band.upper,
+                                  color=self._fuzzer_colors[fuzzer],
+                                  alpha=0.2,
+                                  linewidth=0)
 
         axes.set_title(_formatted_title(benchmark_snapshot_df))
 
@@ -211,14 +247,16 @@ class Plotter:
             image_path,
             wide=False,
             logscale=False,
-            bugs=False):
+            bugs=False,
+            bands=None):
         """Writes coverage growth plot."""
         self._write_plot_to_image(self.coverage_growth_plot,
                                   benchmark_df,
                                   image_path,
                                   wide=wide,
                                   logscale=logscale,
-                                  bugs=bugs)
+                                  bugs=bugs,
+                                  bands=bands)
 
     def box_or_violin_plot(self,
                            benchmark_snapshot_df,
@@ -16,6 +16,7 @@
 import pandas as pd
 
 from sqlalchemy import and_
+from sqlalchemy import or_
 
 from database.models import Experiment, Trial, Snapshot, Crash
 from database import utils as db_utils
@@ -45,6 +46,55 @@ def get_experiment_data(experiment_names, main_experiment_benchmarks=None):
     return pd.read_sql_query(snapshots_query.statement, db_utils.engine)
 
 
+def get_trials_data(experiment_name, benchmarks=None):
+    """Get the columns of get_experiment_data that describe |experiment_name|
+    and its trials that weren't preempted."""
+    with db_utils.session_scope() as session:
+        trials_query = session.query(
+            Experiment.git_hash, Experiment.experiment_filestore,
+            Trial.experiment, Trial.fuzzer, Trial.benchmark,
+            Trial.time_started, Trial.time_ended,
+            Trial.id.label('trial_id'))\
+            .select_from(Experiment)\
+            .join(Trial)\
+            .filter(Experiment.name == experiment_name)\
+            .filter(Trial.preempted.is_(False))
+        if benchmarks:
+            trials_query = trials_query.filter(Trial.benchmark.in_(benchmarks))
+
+    return pd.read_sql_query(trials_query.statement, db_utils.engine)
+
+
+def get_snapshots_data(experiment_name,
+                       benchmarks=None,
+                       min_time=None,
+                       trial_ids=None):
+    """Get the columns of get_experiment_data that describe snapshots, for the
+    trials of |experiment_name| that weren't preempted. If |min_time| is set,
+    only gets the snapshots taken after it and the snapshots of the trials in
+    |trial_ids|."""
+    with db_utils.session_scope() as session:
+        snapshots_query = session.query(
+            Snapshot.trial_id, Snapshot.time, Snapshot.edges_covered,
+            Snapshot.fuzzer_stats, Crash.crash_key)\
+            .select_from(Trial)\
+            .join(Snapshot)\
+            .join(Crash,
+                  and_(Snapshot.time == Crash.time,
+                       Snapshot.trial_id == Crash.trial_id), isouter=True)\
+            .filter(Trial.experiment == experiment_name)\
+            .filter(Trial.preempted.is_(False))
+        if benchmarks:
+            snapshots_query = snapshots_query.filter(
+                Trial.benchmark.in_(benchmarks))
+        if min_time is not None:
+            snapshots_query = snapshots_query.filter(
+                or_(Snapshot.time > min_time,
+                    Snapshot.trial_id.in_(trial_ids or [])))
+
+    return pd.read_sql_query(snapshots_query.statement, db_utils.engine)
+
+
 def get_experiment_description(experiment_name):
     """Get the description of the experiment named by |experiment_name|."""
     # Do another query for the description so we don't explode the size of the
@@ -0,0 +1,168 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for a local cache of the tables, test results and plots of reports.
+Reports are regenerated throughout an experiment, but most benchmarks don't get
+new snapshots between two reports. Artifacts are cached under a key that is a
+hash of the data they are computed from, so the artifacts of benchmarks whose
+data didn't change are reused instead of being computed again."""
+
+import functools
+import hashlib
+import os
+import shutil
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from common import filesystem
+from common import logs
+
+logger = logs.Logger()
+
+# Change this when artifacts are computed differently, so that the artifacts
+# cached before aren't used.
+CACHE_VERSION = 2
+
+
+def _hash_column(column: pd.Series) -> bytes:
+    """Returns the hashes of the values of |column|. Columns of values pandas
+    can't hash, such as the dicts of fuzzer_stats, are hashed as strings."""
+    try:
+        hashes = pd.util.hash_pandas_object(column, index=False)
+    except TypeError:
+        hashes = pd.util.hash_pandas_object(column.astype(str), index=False)
+    return hashes.values.tobytes()
+
+
+def _hash_part(hasher, part):
+    """Adds |part| to |hasher|. Data frames are hashed by content, other parts
+    by their repr."""
+    if isinstance(part, pd.DataFrame):
+        hasher.update(repr(list(part.columns)).encode())
+        for _, column in part.items():
+            hasher.update(_hash_column(column))
+    else:
+        hasher.update(repr(part).encode())
+    hasher.update(b'\0')
+
+
+class ReportArtifactCache:
+    """Cache of report artifacts in |cache_dir|. The artifacts of a key are in
+    a subdirectory named after it."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._used_keys = set()
+
+    @staticmethod
+    def get_key(*parts) -> str:
+        """Returns the key of the artifacts computed from |parts|, which are
+        data frames or values with a repr that identifies them."""
+        hasher = hashlib.sha256()
+        for part in (CACHE_VERSION,) + parts:
+            _hash_part(hasher, part)
+        return hasher.hexdigest()
+
+    def _get_path(self, key: str, name: str) -> str:
+        return os.path.join(self.cache_dir, key, name)
+
+    def _write(self, path: str, write: Callable[[str], Any]):
+        """Writes |path| at once with |write|(temp_path). Failing to cache an
+        artifact doesn't fail the report."""
+        temp_path = path + '.tmp'
+        try:
+            filesystem.create_directory(os.path.dirname(path))
+            write(temp_path)
+            os.replace(temp_path, path)
+        except Exception:  # pylint: disable=broad-except
+            logger.error('Failed to cache report artifact %s.', path)
+
+    def get_value(self, key: str, name: str, compute: Callable[[], Any]) -> Any:
+        """Returns the value |name| cached under |key|. If it isn't cached, it
+        is computed with |compute|() and cached."""
+        self._used_keys.add(key)
+        path = self._get_path(key, name + '.pkl')
+        if os.path.exists(path):
+            try:
+                return pd.read_pickle(path)
+            except Exception:  # pylint: disable=broad-except
+                logger.error('Failed to read report artifact %s.', path)
+        value = compute()
+        self._write(path, functools.partial(pd.to_pickle, value))
+        return value
+
+    def write_file(self, key: str, filename: str, path: str,
+                   write: Callable[[str], Any]):
+        """Copies the file |filename| cached under |key| to |path|. If it isn't
+        cached, it is written with |write|(|path|) and cached."""
+        self._used_keys.add(key)
+        cached_path = self._get_path(key, filename)
+        if os.path.exists(cached_path):
+            shutil.copyfile(cached_path, path)
+            return
+        write(path)
+        self._write(cached_path, functools.partial(shutil.copyfile, path))
+
+    def prune(self):
+        """Removes the artifacts of the keys that weren't used since this
+        object was created. Used after generating a report, the artifacts of
+        data that changed since the previous report are removed."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for key in os.listdir(self.cache_dir):
+            if key not in self._used_keys:
+                shutil.rmtree(self._get_path(key, ''), ignore_errors=True)
+
+
+class Artifacts:
+    """Artifacts of one results object in |cache|, or uncached artifacts if
+    |cache| is None. |get_key_parts| returns what the artifacts are computed
+    from. It is only called if they are cached, since hashing takes time."""
+
+    def __init__(self, cache: Optional[ReportArtifactCache],
+                 get_key_parts: Callable[[], tuple]):
+        self._cache = cache
+        self._get_key_parts = get_key_parts
+
+    @functools.cached_property
+    def key(self) -> str:
+        """Key of the artifacts in the cache."""
+        return self._cache.get_key(*self._get_key_parts())
+
+    def get_value(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Returns the value |name|, computing it with |compute| unless it is
+        cached."""
+        if self._cache is None:
+            return compute()
+        return self._cache.get_value(self.key, name, compute)
+
+    def write_file(self, filename: str, path: str, write: Callable[[str], Any]):
+        """Writes the file |filename| to |path| with |write|(|path|) unless it
+        is cached."""
+        if self._cache is None:
+            write(path)
+            return
+        self._cache.write_file(self.key, filename, path, write)
+
+
+def cached(function):
+    """Decorator for properties of results objects with an |artifacts|
+    attribute, which caches the value of the property there."""
+
+    @functools.wraps(function)
+    def wrapper(results):
+        return results.artifacts.get_value(function.__name__,
+                                           lambda: function(results))
+
+    return wrapper
@@ -13,9 +13,12 @@
 # limitations under the License.
 """Statistical tests."""
 
+import functools
+
 import numpy as np
 import pandas as pd
 import scikit_posthocs as sp
+from scipy import special
 import scipy.stats as ss
 
 SIGNIFICANCE_THRESHOLD = 0.05
@@ -49,18 +52,126 @@ def _create_pairwise_table(benchmark_snapshot_df, key, statistical_test):
     return pd.DataFrame(data, index=fuzzers, columns=fuzzers)
 
 
+class _PairwiseRanks:
+    """Ranks of the |key| values of the fuzzers in a benchmark snapshot data
+    frame, computed once for every pair of fuzzers.
+
+    Values are counted per fuzzer, so that the Mann-Whitney U statistic of all
+    pairs is a single matrix product instead of ranking each pair separately.
+    """
+
+    def __init__(self, benchmark_snapshot_df, key):
+        fuzzer_codes, fuzzers = pd.factorize(benchmark_snapshot_df['fuzzer'],
+                                             sort=True)
+        self.fuzzers = pd.Index(fuzzers, name='fuzzer')
+        self.values, value_codes = np.unique(benchmark_snapshot_df[key].values,
+                                             return_inverse=True)
+        # Number of times each fuzzer (row) got each value (column).
+        self.counts = np.zeros((len(self.fuzzers), len(self.values)))
+        np.add.at(self.counts, (fuzzer_codes, value_codes), 1)
+        self.sizes = self.counts.sum(axis=1)
+
+    @functools.cached_property
+    def u_statistics(self):
+        """Returns the matrix of the U statistic of the fuzzer in the row
+        against the fuzzer in the column, which counts the pairs of their
+        values where the first is greater, ties counting as half."""
+        less = np.cumsum(self.counts, axis=1) - self.counts
+        return self.counts @ (less + self.counts / 2).T
+
+    @functools.cached_property
+    def tie_terms(self):
+        """Returns the matrix of the sum of t^3 - t over the sizes t of the
+        groups of tied values of each pair of fuzzers."""
+        cubes = (self.counts**3).sum(axis=1)
+        squares_by_counts = self.counts**2 @ self.counts.T
+        return (cubes[:, None] + cubes[None, :] + 3 * squares_by_counts +
+                3 * squares_by_counts.T - self.sizes[:, None] -
+                self.sizes[None, :])
+
+    def get_size_products(self):
+        """Returns the matrix of the products of the sample sizes of each pair
+        of fuzzers."""
+        return np.outer(self.sizes, self.sizes)
+
+    def get_untested_mask(self):
+        """Returns the mask of the pairs that aren't tested, like in
+        _create_pairwise_table: a fuzzer against itself and fuzzers with the
+        same set of values."""
+        present = (self.counts > 0).astype(float)
+        num_values = present.sum(axis=1)
+        num_common_values = present @ present.T
+        return ((num_common_values == num_values[:, None]) &
+                (num_common_values == num_values[None, :]))
+
+    def get_sample(self, fuzzer_index):
+        """Returns the values of the fuzzer at |fuzzer_index|."""
+        return np.repeat(self.values, self.counts[fuzzer_index].astype(int))
+
+    def to_table(self, data):
+        """Returns the table of the pairwise |data| matrix with untested pairs
+        set to NaN."""
+        data = np.where(self.get_untested_mask(), np.nan, data)
+        return pd.DataFrame(data, index=self.fuzzers, columns=self.fuzzers)
+
+
+def _get_asymptotic_u_test_p_values(ranks, alternative):
+    """Returns the matrix of the p-values of the U test of each pair in
+    |ranks| computed like ss.mannwhitneyu does with the normal
+    approximation."""
+    size_products = ranks.get_size_products()
+    u_statistics = ranks.u_statistics
+    if alternative == 'greater':
+        statistics, factor = u_statistics, 1
+    else:
+        statistics = np.maximum(u_statistics, size_products - u_statistics)
+        factor = 2
+
+    sizes_sums = ranks.sizes[:, None] + ranks.sizes[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviations = np.sqrt(size_products / 12 *
+                             ((sizes_sums + 1) - ranks.tie_terms /
+                              (sizes_sums * (sizes_sums - 1))))
+        z_scores = (statistics - size_products / 2 - 0.5) / deviations
+    p_values = special.ndtr(-z_scores)  # pylint: disable=no-member
+    return np.clip(p_values * factor, 0., 1.)
+
+
+def _create_pairwise_u_test_table(benchmark_snapshot_df, key, alternative):
+    """Returns the same p-value table as _create_pairwise_table with
+    ss.mannwhitneyu, computing all pairs at once.
+
+    Like scipy's default method, p-values come from the normal approximation
+    with tie and continuity corrections unless one of the samples has at most
+    8 values and there are no ties. The exact p-values of those pairs are left
+    to scipy.
+    """
+    if benchmark_snapshot_df[key].isna().any():
+        return _create_pairwise_table(
+            benchmark_snapshot_df, key, lambda xs, ys: ss.mannwhitneyu(
+                xs, ys, alternative=alternative).pvalue)
+
+    ranks = _PairwiseRanks(benchmark_snapshot_df, key)
+    p_values = _get_asymptotic_u_test_p_values(ranks, alternative)
+    small_sizes = np.minimum.outer(ranks.sizes, ranks.sizes) <= 8
+    exact_pairs = np.argwhere(small_sizes & (ranks.tie_terms == 0) &
+                              ~ranks.get_untested_mask())
+    for f_i, f_j in exact_pairs:
+        p_values[f_i, f_j] = ss.mannwhitneyu(ranks.get_sample(f_i),
+                                             ranks.get_sample(f_j),
+                                             alternative=alternative).pvalue
+    return ranks.to_table(p_values)
+
+
 def one_sided_u_test(benchmark_snapshot_df, key):
     """Returns p-value table for one-tailed Mann-Whitney U test."""
-    return _create_pairwise_table(
-        benchmark_snapshot_df, key,
-        lambda xs, ys: ss.mannwhitneyu(xs, ys, alternative='greater').pvalue)
+    return _create_pairwise_u_test_table(benchmark_snapshot_df, key, 'greater')
 
 
 def two_sided_u_test(benchmark_snapshot_df, key):
     """Returns p-value table for two-tailed Mann-Whitney U test."""
-    return _create_pairwise_table(
-        benchmark_snapshot_df, key,
-        lambda xs, ys: ss.mannwhitneyu(xs, ys, alternative='two-sided').pvalue)
+    return _create_pairwise_u_test_table(benchmark_snapshot_df, key,
+                                         'two-sided')
 
 
 def one_sided_wilcoxon_test(benchmark_snapshot_df, key):
@@ -79,7 +190,11 @@ def two_sided_wilcoxon_test(benchmark_snapshot_df, key):
 
 def a12_measure_test(benchmark_snapshot_df, key='edges_covered'):
     """Returns a Vargha-Delaney A12 measure table."""
-    return _create_pairwise_table(benchmark_snapshot_df, key, a12)
+    if benchmark_snapshot_df[key].isna().any():
+        return _create_pairwise_table(benchmark_snapshot_df, key, a12)
+    # A12 is the U statistic divided by the number of pairs of values.
+    ranks = _PairwiseRanks(benchmark_snapshot_df, key)
+    return ranks.to_table(ranks.u_statistics / ranks.get_size_products())
 
 
 def anova_test(benchmark_snapshot_df, key):
@@ -12,12 +12,17 @@
 # See the License for the specific language governing permissions andsss
 # limitations under the License.
 """Tests for coverage_data_utils.py"""
+import json
+import os
+import shutil
 from unittest import mock
 
+import numpy as np
 import pandas as pd
 import pandas.testing as pd_test
 
 from analysis import coverage_data_utils
+from common import new_process
 
 FUZZER = 'afl'
 BENCHMARK = 'libpng-1.6.38'
@@ -44,31 +49,14 @@ def create_coverage_data():
     }
 
 
-def test_get_unique_branch_dict():
-    """Tests get_unique_branch_dict() function."""
-    coverage_dict = create_coverage_data()
-    benchmark_coverage_dict = coverage_data_utils.get_benchmark_cov_dict(
-        coverage_dict, 'libpng-1.6.38')
-    unique_branch_dict = coverage_data_utils.get_unique_branch_dict(
-        benchmark_coverage_dict)
-    expected_dict = {
-        (0, 0, 2, 2): ['afl'],
-        (0, 0, 2, 3): ['libfuzzer'],
-        (0, 0, 4, 4): ['libfuzzer']
-    }
-    assert expected_dict == unique_branch_dict
-
-
 def test_get_unique_branch_cov_df():
     """Tests get_unique_branch_cov_df() function."""
     coverage_dict = create_coverage_data()
-    benchmark_coverage_dict = coverage_data_utils.get_benchmark_cov_dict(
+    benchmark_coverage = coverage_data_utils.get_benchmark_coverage(
         coverage_dict, 'libpng-1.6.38')
-    unique_branch_dict = coverage_data_utils.get_unique_branch_dict(
-        benchmark_coverage_dict)
     fuzzer_names = ['afl', 'libfuzzer']
     unique_branch_df = coverage_data_utils.get_unique_branch_cov_df(
-        unique_branch_dict, fuzzer_names)
+        benchmark_coverage, fuzzer_names)
     unique_branch_df = unique_branch_df.sort_values(by=['fuzzer']).reset_index(
         drop=True)
     expected_df = pd.DataFrame([{
@@ -81,28 +69,55 @@ def test_get_unique_branch_cov_df():
     assert unique_branch_df.equals(expected_df)
 
 
-def test_get_benchmark_cov_dict():
-    """Tests that get_benchmark_cov_dict() returns correct dictionary."""
+def test_get_benchmark_coverage():
+    """Tests that get_benchmark_coverage() returns the covered branches of
+    each fuzzer."""
     coverage_dict = create_coverage_data()
+    coverage_dict['honggfuzz libpng-1.6.38'] = []
+    coverage_dict['afl zlib'] = [[0, 0, 5, 5]]
     benchmark = 'libpng-1.6.38'
-    benchmark_cov_dict = coverage_data_utils.get_benchmark_cov_dict(
+    benchmark_coverage = coverage_data_utils.get_benchmark_coverage(
         coverage_dict, benchmark)
     expected_cov_dict = {
         'afl': {(0, 0, 3, 3), (0, 0, 2, 2), (0, 0, 1, 1)},
-        'libfuzzer': {(0, 0, 4, 4), (0, 0, 3, 3), (0, 0, 2, 3), (0, 0, 1, 1)}
+        'libfuzzer': {(0, 0, 4, 4), (0, 0, 3, 3), (0, 0, 2, 3), (0, 0, 1, 1)},
+        'honggfuzz': set(),
     }
-    assert expected_cov_dict == benchmark_cov_dict
+    assert benchmark_coverage.fuzzers == ['afl', 'libfuzzer', 'honggfuzz']
+    # Each branch is interned once.
+    assert len(benchmark_coverage.branches) == 5
+    assert expected_cov_dict == {
+        fuzzer: set(map(tuple, benchmark_coverage.branches[covered].tolist()))
+        for fuzzer, covered in zip(benchmark_coverage.fuzzers,
+                                   benchmark_coverage.covered)
+    }
+
+
+def test_get_benchmark_aggregated_cov_df():
+    """Tests that get_benchmark_aggregated_cov_df() counts the branches
+    covered by each fuzzer."""
+    benchmark_coverage = coverage_data_utils.get_benchmark_coverage(
+        create_coverage_data(), 'libpng-1.6.38')
+    aggregated_cov_df = coverage_data_utils.get_benchmark_aggregated_cov_df(
+        benchmark_coverage)
+    expected_df = pd.DataFrame({
+        'fuzzer': ['afl', 'libfuzzer'],
+        'aggregated_edges_covered': [3, 4]
+    })
+    pd_test.assert_frame_equal(aggregated_cov_df,
+                               expected_df,
+                               check_dtype=False)
 
 
 def test_get_pairwise_unique_coverage_table():
     """Tests that get_pairwise_unique_coverage_table() gives the
     correct dataframe."""
     coverage_dict = create_coverage_data()
-    benchmark_coverage_dict = coverage_data_utils.get_benchmark_cov_dict(
+    benchmark_coverage = coverage_data_utils.get_benchmark_coverage(
         coverage_dict, 'libpng-1.6.38')
     fuzzers = ['libfuzzer', 'afl']
     table = coverage_data_utils.get_pairwise_unique_coverage_table(
-        benchmark_coverage_dict, fuzzers)
+        benchmark_coverage, fuzzers)
     expected_table = pd.DataFrame([[0, 1], [2, 0]],
                                   index=fuzzers,
                                   columns=fuzzers)
@@ -196,3 +211,31 @@ def test_coverage_report_filestore_path():
                                'libpng-1.6.38/afl/index.html')
     assert coverage_data_utils.get_coverage_report_filestore_path(
         FUZZER, BENCHMARK, SAMPLE_DF) == expected_cov_report_url
+
+
+def test_get_fuzzer_covered_branches(tmp_path):
+    """Tests that get_fuzzer_covered_branches reads the npz file, or the json
+    file if there is no npz file."""
+    coverage_data_dir = tmp_path / 'coverage' / 'data' / BENCHMARK / FUZZER
+    coverage_data_dir.mkdir(parents=True)
+    covered_branches = [[1, 2, 1, 3, 0, 0, 4], [1, 2, 1, 4, 0, 0, 4]]
+    (coverage_data_dir / 'covered_branches.json').write_text(
+        json.dumps(covered_branches))
+
+    def cp(src, dst, expect_zero=True):  # pylint: disable=unused-argument
+        if not os.path.exists(src):
+            return new_process.ProcessResult(1, '', False)
+        shutil.copyfile(src, dst)
+        return new_process.ProcessResult(0, '', False)
+
+    with mock.patch('common.filestore_utils.cp', side_effect=cp):
+        assert coverage_data_utils.get_fuzzer_covered_branches(
+            FUZZER, BENCHMARK, str(tmp_path)) == covered_branches
+
+        np.savez_compressed(coverage_data_dir / 'covered_branches.npz',
+                            branches=np.array(covered_branches[:1],
+                                              dtype=np.uint8))
+        branches = coverage_data_utils.get_fuzzer_covered_branches(
+            FUZZER, BENCHMARK, str(tmp_path))
+    assert branches.dtype == np.int64
+    assert branches.tolist() == covered_branches[:1]
@@ -0,0 +1,81 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for crash_buckets.py."""
+import random
+
+import numpy as np
+import pandas as pd
+from clusterfuzz.stacktraces.crash_comparer import CrashComparer
+
+from analysis import crash_buckets
+
+FRAMES = [
+    'png_read_row', 'png_read_rows', 'png_do_read_transformations',
+    'png_handle_iCCP', 'png_handle_IHDR', 'xmlParseCharData', 'xmlParseContent',
+    'xmlParseElement', 'FuzzerHash=abcd', ''
+]
+
+
+def _get_firsts_pairwise(crash_states):
+    """Compares every crash state with all the earlier ones."""
+    earlier_crash_states = set()
+    firsts = []
+    for crash_state in crash_states:
+        firsts.append(not any(
+            CrashComparer(crash_state, earlier_crash_state).is_similar()
+            for earlier_crash_state in earlier_crash_states))
+        earlier_crash_states.add(crash_state)
+    return firsts
+
+
+def _get_random_crash_state(rng):
+    frames = []
+    for _ in range(rng.randint(0, 3)):
+        frame = rng.choice(FRAMES)
+        if rng.random() < 0.3:
+            # Change a character so that frames are similar but not equal.
+            position = rng.randrange(len(frame) + 1)
+            frame = frame[:position] + rng.choice('ab_') + frame[position + 1:]
+        frames.append(frame)
+    return ''.join(frame + '\n' for frame in frames)
+
+
+def test_get_firsts_matches_crash_comparer():
+    """Tests that CrashBucketer finds the same first crashes as comparing every
+    pair of crash states with CrashComparer."""
+    rng = random.Random(0)
+    bucketer = crash_buckets.CrashBucketer()
+    for _ in range(200):
+        crash_states = [
+            _get_random_crash_state(rng) for _ in range(rng.randint(1, 20))
+        ]
+        assert bucketer.get_firsts(crash_states) == _get_firsts_pairwise(
+            crash_states)
+
+
+def test_get_firsts_groups():
+    """Tests that get_firsts looks for earlier crashes of a bug in the same
+    group only and handles missing crash keys like empty crash states."""
+    crash_keys = pd.Series([
+        'Abrt:png_read_row\npng_read_rows\n',
+        'Abrt:png_read_row\npng_read_rows\n',
+        np.nan,
+        'Segv:png_read_row\npng_read_rows\npng_handle_iCCP\n',
+        np.nan,
+        'Abrt:xmlParseContent\n',
+    ])
+    group_ids = [0, 0, 0, 1, 1, 1]
+    assert crash_buckets.get_firsts(crash_keys, group_ids).tolist() == [
+        True, False, True, True, True, True
+    ]
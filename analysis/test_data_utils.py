@@ -15,10 +15,13 @@
 # pylint: disable=missing-function-docstring
 """Tests for data_utils.py"""
 
+import numpy as np
 import pandas as pd
 import pandas.testing as pd_test
 import pytest
 
+from analysis import benchmark_data_utils
+from analysis import crash_buckets
 from analysis import data_utils
 
 
@@ -114,6 +117,32 @@ def test_clobber_experiments_data():
         df[columns].drop_duplicates().values == expected_result.values).all()
 
 
+def _clobber_experiments_data_by_pairs(df, experiments):
+    """Clobbers experiment data by comparing benchmark/fuzzer pairs, like
+    clobber_experiments_data did before it was vectorized."""
+    experiments = list(reversed(experiments))
+    result = df[df.experiment == experiments[0]]
+    for experiment in experiments[1:]:
+        covered_pairs = result[['benchmark',
+                                'fuzzer']].drop_duplicates().apply(tuple,
+                                                                   axis=1)
+        experiment_data = df[df.experiment == experiment]
+        experiment_pairs = experiment_data[['benchmark',
+                                            'fuzzer']].apply(tuple, axis=1)
+        to_include = experiment_data[~experiment_pairs.isin(covered_pairs)]
+        result = pd.concat([result, to_include])
+    return result
+
+
+def test_clobber_experiments_data_same_as_by_pairs():
+    df = benchmark_data_utils.create_experiment_data(20000)
+    # Not every experiment is merged and they aren't in order.
+    experiments = ['experiment-3', 'experiment-0', 'experiment-4']
+    pd_test.assert_frame_equal(
+        data_utils.clobber_experiments_data(df, experiments),
+        _clobber_experiments_data_by_pairs(df, experiments))
+
+
 def test_filter_fuzzers():
     experiment_df = create_experiment_data()
     fuzzers_to_keep = ['afl']
@@ -166,6 +195,27 @@ def test_count_bugs_covered():
         assert (expected.bugs_covered == actual.bugs_covered).all()
 
 
+def test_add_bugs_covered_column_same_as_groupby():
+    """Tests that bugs covered are the same as when they were counted with
+    groupby transforms."""
+    experiment_df = benchmark_data_utils.create_experiment_data(50000)
+    actual = data_utils.add_bugs_covered_column(experiment_df.copy())
+
+    grouping2 = ['fuzzer', 'benchmark', 'trial_id']
+    grouping3 = ['fuzzer', 'benchmark', 'trial_id', 'time']
+    expected = experiment_df.sort_values(grouping3)
+    group_ids = expected.groupby(grouping2, sort=False).ngroup()
+    expected['firsts'] = (crash_buckets.get_firsts(
+        expected.crash_key, group_ids) & ~expected.crash_key.isna())
+    expected['bugs_cumsum'] = expected.groupby(grouping2)['firsts'].transform(
+        'cumsum')
+    expected['bugs_covered'] = (
+        expected.groupby(grouping3)['bugs_cumsum'].transform('max').astype(int))
+    expected = expected.drop(columns=['bugs_cumsum', 'firsts'])
+    assert expected.bugs_covered.any()
+    pd_test.assert_frame_equal(actual, expected)
+
+
 @pytest.mark.parametrize('threshold', [0.3, 0.8, 1.0])
 def test_benchmark_snapshot_complete(threshold):
     """Tests that the snapshot data contains only the latest timestamp for all
@@ -242,6 +292,73 @@ def test_get_experiment_snapshots():
     assert timestamps_per_trial.equals(expected_timestamps_per_trial)
 
 
+def _create_coverage_growth_data():
+    """Returns benchmark data of trials with random coverage over time, one of
+    which ends early."""
+    rng = np.random.default_rng(0)
+    trials_df = pd.concat([
+        create_trial_data(trial_id, 'libxml', fuzzer, 20, 0, 'experiment',
+                          'gs://fuzzbench-data')
+        for trial_id, fuzzer in enumerate(['afl'] * 15 + ['libfuzzer'] * 10)
+    ])
+    trials_df['edges_covered'] = rng.integers(100, size=len(trials_df))
+    return trials_df[(trials_df.trial_id != 0) | (trials_df.time < 10)]
+
+
+@pytest.mark.parametrize('interval', ['bootstrap', 'quantile', None])
+def test_get_coverage_growth_bands(interval):
+    benchmark_df = _create_coverage_growth_data()
+    bands = data_utils.get_coverage_growth_bands(benchmark_df,
+                                                 interval=interval)
+
+    expected_medians = benchmark_df.groupby(['fuzzer',
+                                             'time'])['edges_covered'].median()
+    pd_test.assert_series_equal(bands.set_index(['fuzzer', 'time'])['median'],
+                                expected_medians,
+                                check_names=False)
+    if interval is None:
+        assert bands.lower.isna().all() and bands.upper.isna().all()
+        return
+    assert (bands.lower <= bands['median']).all()
+    assert (bands['median'] <= bands.upper).all()
+    pd_test.assert_frame_equal(
+        bands,
+        data_utils.get_coverage_growth_bands(benchmark_df, interval=interval))
+
+
+def test_get_coverage_growth_bands_quantile():
+    """Tests that quantile bands are the order statistics around the median
+    given by the binomial distribution."""
+    benchmark_df = _create_coverage_growth_data()
+    bands = data_utils.get_coverage_growth_bands(benchmark_df,
+                                                 interval='quantile')
+
+    # For 10 trials, the interval is between the 2nd and 9th smallest values.
+    libfuzzer_df = benchmark_df[benchmark_df.fuzzer == 'libfuzzer']
+    sorted_values = libfuzzer_df.groupby('time')['edges_covered'].apply(sorted)
+    libfuzzer_bands = bands[bands.fuzzer == 'libfuzzer'].set_index('time')
+    assert libfuzzer_bands.lower.tolist() == [
+        values[1] for values in sorted_values
+    ]
+    assert libfuzzer_bands.upper.tolist() == [
+        values[8] for values in sorted_values
+    ]
+
+
+def test_get_experiment_snapshots_same_as_per_benchmark():
+    experiment_df = benchmark_data_utils.create_experiment_data(20000)
+    # Some trials of a benchmark end early.
+    experiment_df = experiment_df[(experiment_df.benchmark != 'benchmark-1') |
+                                  (experiment_df.trial_id % 3 == 0) |
+                                  (experiment_df.time < 10000)]
+    experiment_df = experiment_df.sample(frac=1, random_state=0)
+
+    expected = experiment_df.groupby('benchmark').apply(
+        data_utils.get_benchmark_snapshot).reset_index(drop=True)
+    pd_test.assert_frame_equal(
+        data_utils.get_experiment_snapshots(experiment_df), expected)
+
+
 def test_benchmark_summary():
     experiment_df = create_experiment_data()
     benchmark_df = experiment_df[experiment_df.benchmark == 'libxml']
@@ -0,0 +1,122 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for experiment_data_cache.py."""
+import datetime
+from unittest import mock
+
+import pandas as pd
+
+from analysis import experiment_data_cache
+from analysis import queries
+from database import models
+from database import utils as db_utils
+
+# pylint: disable=invalid-name,unused-argument
+
+ARBITRARY_DATETIME = datetime.datetime(2020, 1, 1)
+EXPERIMENT = 'experiment-1'
+
+
+def _add_snapshots(trials, times):
+    """Adds a snapshot of every trial in |trials| at every time in |times| and
+    a crash in the last of them."""
+    snapshots = [
+        models.Snapshot(time=time, trial_id=trial.id, edges_covered=time)
+        for trial in trials
+        for time in times
+    ]
+    db_utils.add_all(snapshots)
+    db_utils.add_all([
+        models.Crash(time=times[-1],
+                     trial_id=trial.id,
+                     crash_key=f'crash-{trial.id}-{times[-1]}',
+                     crash_type='',
+                     crash_address='',
+                     crash_state='',
+                     crash_stacktrace='',
+                     crash_testcase='') for trial in trials
+    ])
+
+
+def _sort(experiment_df):
+    return experiment_df.sort_values(['trial_id',
+                                      'time']).reset_index(drop=True)
+
+
+def _assert_same_as_query(experiment_df, benchmark=None):
+    expected_df = queries.get_experiment_data([EXPERIMENT])
+    if benchmark:
+        expected_df = expected_df[expected_df.benchmark == benchmark]
+    pd.testing.assert_frame_equal(_sort(experiment_df), _sort(expected_df))
+
+
+def test_update(db, tmp_path):
+    """Tests that the cache only reads new snapshots from the database and
+    returns the same data as queries.get_experiment_data."""
+    db_utils.add_all([
+        models.Experiment(name=EXPERIMENT,
+                          time_created=ARBITRARY_DATETIME,
+                          git_hash='hash')
+    ])
+    trials = [
+        models.Trial(fuzzer=fuzzer,
+                     experiment=EXPERIMENT,
+                     benchmark=benchmark,
+                     time_started=ARBITRARY_DATETIME)
+        for fuzzer in ['afl', 'libfuzzer']
+        for benchmark in ['libpng', 'zlib']
+    ]
+    db_utils.add_all(trials)
+    _add_snapshots(trials, [900, 1800])
+    cache = experiment_data_cache.ExperimentDataCache(str(tmp_path))
+    _assert_same_as_query(cache.update([EXPERIMENT]))
+
+    # Trials that started later and trials that ended or were preempted since
+    # the last update are taken into account.
+    late_trial = models.Trial(fuzzer='afl',
+                              experiment=EXPERIMENT,
+                              benchmark='libpng',
+                              time_started=ARBITRARY_DATETIME)
+    db_utils.add_all([late_trial])
+    with db_utils.session_scope() as session:
+        session.query(
+            models.Trial).filter(models.Trial.id == trials[0].id).update(
+                {'time_ended': ARBITRARY_DATETIME})
+        session.query(models.Trial).filter(
+            models.Trial.id == trials[1].id).update({'preempted': True})
+    _add_snapshots(trials[2:], [2700])
+    _add_snapshots([late_trial], [900])
+
+    snapshots_dfs = []
+    query_snapshots_data = queries.get_snapshots_data
+
+    def get_snapshots_data(*args, **kwargs):
+        snapshots_dfs.append(query_snapshots_data(*args, **kwargs))
+        return snapshots_dfs[-1]
+
+    with mock.patch('analysis.queries.get_snapshots_data', get_snapshots_data):
+        experiment_df = cache.update([EXPERIMENT])
+    # Only the new snapshots of trials[2:] and of the late trial are read.
+    assert len(snapshots_dfs[0]) == 3
+    _assert_same_as_query(experiment_df)
+    _assert_same_as_query(cache.load([EXPERIMENT], ['zlib']), 'zlib')
+
+
+def test_load_uncached(db, tmp_path):
+    """Tests that load doesn't read the database when the data isn't
+    cached."""
+    cache = experiment_data_cache.ExperimentDataCache(str(tmp_path))
+    with mock.patch('analysis.queries.get_snapshots_data') as mocked_query:
+        assert cache.load([EXPERIMENT]) is None
+    assert not mocked_query.called
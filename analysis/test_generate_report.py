@@ -0,0 +1,61 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for generate_report.py."""
+import os
+from unittest import mock
+
+from analysis import experiment_results
+from analysis import generate_report
+from analysis import report_artifact_cache
+from analysis import test_data_utils
+
+
+def _write_plot(data, path, **kwargs):  # pylint: disable=unused-argument
+    with open(path, 'w', encoding='utf-8') as plot_file:
+        plot_file.write('plot')
+
+
+@mock.patch('common.benchmark_config.get_config', return_value={})
+def test_prefetch_benchmark_artifacts(_, tmp_path):
+    """Tests that rendering gets the artifacts computed by worker processes
+    from the artifact cache."""
+    plotter = mock.Mock(settings=())
+    for method in [
+            'write_ranking_plot', 'write_box_plot',
+            'write_coverage_growth_plot', 'write_a12_heatmap_plot',
+            'write_heatmap_plot'
+    ]:
+        getattr(plotter, method).side_effect = _write_plot
+    output_dir = tmp_path / 'report'
+    output_dir.mkdir()
+    results = experiment_results.ExperimentResults(
+        test_data_utils.create_experiment_data(),
+        coverage_dict={},
+        output_directory=str(output_dir),
+        plotter=plotter,
+        artifact_cache=report_artifact_cache.ReportArtifactCache(
+            str(tmp_path / 'cache')))
+
+    generate_report.prefetch_benchmark_artifacts(results.benchmarks,
+                                                 num_processes=2)
+
+    # Plots were written by the workers, not by this process.
+    plot_filenames = sorted(os.listdir(output_dir))
+    assert len(plot_filenames) == 2 * 6
+    assert not plotter.mock_calls
+    for benchmark in results.benchmarks:
+        for name in benchmark.report_properties:
+            getattr(benchmark, name)
+    assert not plotter.mock_calls
+    assert sorted(os.listdir(output_dir)) == plot_filenames
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Plotting tests."""
 
+from unittest import mock
+
 import matplotlib.testing.compare as plt_cmp
 import pandas as pd
 
@@ -57,3 +59,25 @@ def test_unique_coverage_ranking_plot(tmp_path):
 
     golden_path = 'analysis/test_data/unique_coverage_ranking.png'
     plt_cmp.compare_images(image_path, golden_path, tol=0.01)
+
+
+def test_coverage_growth_plot_uses_bands(tmp_path):
+    """Tests that coverage growth plots draw the bands they are given instead
+    of computing them."""
+    benchmark_df = pd.DataFrame({
+        'benchmark': 'libxml',
+        'fuzzer': ['afl', 'afl', 'libfuzzer', 'libfuzzer'],
+        'trial_id': [0, 0, 1, 1],
+        'time': [0, 900, 0, 900],
+        'edges_covered': [0, 100, 0, 200],
+    })
+    plotter = plotting.Plotter(['afl', 'libfuzzer'], quick=True)
+    bands = plotter.get_coverage_growth_bands(benchmark_df)
+    image_path = tmp_path / 'out.svg'
+    with mock.patch('analysis.data_utils.get_coverage_growth_bands'
+                   ) as mocked_get_coverage_growth_bands:
+        plotter.write_coverage_growth_plot(benchmark_df,
+                                           image_path,
+                                           bands=bands)
+    assert not mocked_get_coverage_growth_bands.called
+    assert image_path.exists()
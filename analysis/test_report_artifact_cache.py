@@ -0,0 +1,145 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for report_artifact_cache.py."""
+import os
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from analysis import data_utils
+from analysis import experiment_results
+from analysis import report_artifact_cache
+from analysis import test_data_utils
+
+# pylint: disable=invalid-name,redefined-outer-name
+
+LIBPNG = 'libpng_libpng_read_fuzzer'
+
+
+@pytest.fixture(autouse=True)
+def benchmark_config():
+    """Makes every benchmark a code coverage benchmark."""
+    with mock.patch('common.benchmark_config.get_config', return_value={}):
+        yield
+
+
+def _write_plot(data, path, **kwargs):  # pylint: disable=unused-argument
+    with open(path, 'w', encoding='utf-8') as plot_file:
+        plot_file.write('plot')
+
+
+def _get_plotter():
+    plotter = mock.Mock(settings=('afl', 'libfuzzer'))
+    plotter.write_box_plot.side_effect = _write_plot
+    return plotter
+
+
+def _get_benchmarks(experiment_df, artifact_cache, output_dir, plotter):
+    """Returns the results of the benchmarks of |experiment_df| by name."""
+    results = experiment_results.ExperimentResults(
+        experiment_df,
+        coverage_dict={},
+        output_directory=output_dir,
+        plotter=plotter,
+        artifact_cache=artifact_cache)
+    return {benchmark.name: benchmark for benchmark in results.benchmarks}
+
+
+def test_unchanged_benchmarks_reuse_artifacts(tmp_path):
+    """Tests that the artifacts of a benchmark are reused as long as its data
+    doesn't change."""
+    cache_dir = str(tmp_path / 'cache')
+    experiment_df = test_data_utils.create_experiment_data()
+    benchmarks = _get_benchmarks(
+        experiment_df, report_artifact_cache.ReportArtifactCache(cache_dir),
+        str(tmp_path), _get_plotter())
+    rankings = {
+        name: benchmark.rank_by_median
+        for name, benchmark in benchmarks.items()
+    }
+    for benchmark in benchmarks.values():
+        assert benchmark.box_plot
+
+    # Only the data of libxml changes.
+    experiment_df.loc[experiment_df.benchmark == 'libxml', 'edges_covered'] += 1
+    output_dir = tmp_path / 'report'
+    output_dir.mkdir()
+    artifact_cache = report_artifact_cache.ReportArtifactCache(cache_dir)
+    plotter = _get_plotter()
+    benchmarks = _get_benchmarks(experiment_df, artifact_cache, str(output_dir),
+                                 plotter)
+    rank_by_median = data_utils.benchmark_rank_by_median
+    with mock.patch('analysis.data_utils.benchmark_rank_by_median',
+                    side_effect=rank_by_median) as mocked_rank_by_median:
+        pd.testing.assert_series_equal(benchmarks[LIBPNG].rank_by_median,
+                                       rankings[LIBPNG])
+        assert not mocked_rank_by_median.called
+        benchmarks['libxml'].rank_by_median  # pylint: disable=pointless-statement
+        assert mocked_rank_by_median.call_count == 1
+
+    assert benchmarks[LIBPNG].box_plot == f'{LIBPNG}_boxplot.svg'
+    assert benchmarks['libxml'].box_plot == 'libxml_boxplot.svg'
+    # The cached plot of libpng is copied to the report.
+    assert sorted(os.listdir(output_dir)) == [
+        f'{LIBPNG}_boxplot.svg', 'libxml_boxplot.svg'
+    ]
+    assert plotter.write_box_plot.call_count == 1
+
+    # Only the artifacts of the latest libxml data are kept.
+    assert len(os.listdir(cache_dir)) == 3
+    artifact_cache.prune()
+    assert set(os.listdir(cache_dir)) == {
+        benchmark.artifacts.key for benchmark in benchmarks.values()
+    }
+
+
+def test_uncached_results_compute_values(tmp_path):
+    """Tests that values are computed each time without a cache."""
+    artifacts = report_artifact_cache.Artifacts(None, lambda: ())
+    compute = mock.Mock(return_value=1)
+    assert artifacts.get_value('value', compute) == 1
+    assert artifacts.get_value('value', compute) == 1
+    assert compute.call_count == 2
+    assert not os.listdir(tmp_path)
+
+
+def test_get_key_depends_on_data():
+    """Tests that keys of different data are different."""
+    experiment_df = test_data_utils.create_experiment_data()
+    key = report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df)
+    assert key == report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df.copy())
+    assert key != report_artifact_cache.ReportArtifactCache.get_key(
+        'other settings', experiment_df)
+    experiment_df.iloc[0, experiment_df.columns.get_loc('edges_covered')] += 1
+    assert key != report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df)
+
+
+def test_get_key_unhashable_values():
+    """Tests that data with values pandas can't hash, such as the dicts of
+    fuzzer_stats, can be used as a key."""
+    experiment_df = test_data_utils.create_experiment_data()
+    experiment_df['fuzzer_stats'] = [{
+        'execs_per_sec': 100
+    }] * len(experiment_df)
+    key = report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df)
+    assert key == report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df.copy())
+    experiment_df.at[0, 'fuzzer_stats'] = {'execs_per_sec': 200}
+    assert key != report_artifact_cache.ReportArtifactCache.get_key(
+        'settings', experiment_df)
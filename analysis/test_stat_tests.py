@@ -15,7 +15,10 @@
 # pylint: disable=missing-function-docstring
 """Tests for stat_tests.py"""
 
+import numpy as np
+import pandas as pd
 import pytest
+import scipy.stats as ss
 
 from analysis import stat_tests
 
@@ -40,3 +43,57 @@ def test_a12_equal():
 
     result = stat_tests.a12(x_values, y_values)
     assert result == pytest.approx(0.5, 0.0001)
+
+
+def _get_snapshot_df(sample_sizes, num_values, seed=0):
+    """Returns a benchmark snapshot with random values of fuzzers with
+    |sample_sizes|. Few |num_values| make ties likely."""
+    rng = np.random.default_rng(seed)
+    fuzzers = [
+        f'fuzzer-{index}' for index, size in enumerate(sample_sizes)
+        for _ in range(size)
+    ]
+    # Fuzzers aren't sorted and one has the same values as another.
+    values = rng.integers(num_values, size=len(fuzzers))
+    fuzzers.append('fuzzer-copy')
+    values = np.append(values, values[0])
+    return pd.DataFrame({
+        'fuzzer': fuzzers[::-1],
+        'edges_covered': values[::-1],
+    })
+
+
+@pytest.mark.parametrize('sample_sizes,num_values', [
+    ([20, 20, 15, 20], 10),
+    ([20, 20, 15, 20], 1000),
+    ([5, 20, 8, 3], 1000),
+    ([5, 20, 8, 3], 5),
+])
+@pytest.mark.parametrize('alternative', ['greater', 'two-sided'])
+def test_u_test_same_as_scipy(sample_sizes, num_values, alternative):
+    """Tests that U test tables computed for all pairs at once are the same as
+    testing each pair with scipy."""
+    benchmark_snapshot_df = _get_snapshot_df(sample_sizes, num_values)
+    if alternative == 'greater':
+        table = stat_tests.one_sided_u_test(benchmark_snapshot_df,
+                                            'edges_covered')
+    else:
+        table = stat_tests.two_sided_u_test(benchmark_snapshot_df,
+                                            'edges_covered')
+
+    expected_table = stat_tests._create_pairwise_table(  # pylint: disable=protected-access
+        benchmark_snapshot_df, 'edges_covered',
+        lambda xs, ys: ss.mannwhitneyu(xs, ys, alternative=alternative).pvalue)
+    pd.testing.assert_frame_equal(table, expected_table)
+
+
+@pytest.mark.parametrize('num_values', [5, 1000])
+def test_a12_measure_test_same_as_a12(num_values):
+    """Tests that A12 tables computed for all pairs at once are the same as
+    computing a12 for each pair."""
+    benchmark_snapshot_df = _get_snapshot_df([20, 20, 5], num_values)
+    table = stat_tests.a12_measure_test(benchmark_snapshot_df)
+
+    expected_table = stat_tests._create_pairwise_table(  # pylint: disable=protected-access
+        benchmark_snapshot_df, 'edges_covered', stat_tests.a12)
+    pd.testing.assert_frame_equal(table, expected_table)
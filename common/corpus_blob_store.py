@@ -0,0 +1,187 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for storing corpus snapshots as blobs named after the SHA-1 of their
+contents instead of as per-cycle tarballs. Every cycle, the runner uploads the
+blobs of new units and a manifest listing the units of the cycle. Blobs are
+shared by the trials of a benchmark, so units found by many trials, like seeds,
+are only stored and fetched once."""
+
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+from typing import Iterable, List, Set
+
+from common import environment
+from common import experiment_path
+from common import experiment_utils
+from common import filestore_utils
+from common import filesystem
+from common import logs
+
+TARBALL_FORMAT = 'tarball'
+BLOBS_FORMAT = 'blobs'
+CORPUS_FORMATS = [TARBALL_FORMAT, BLOBS_FORMAT]
+
+
+def get_corpus_format() -> str:
+    """Returns the format used to save corpus snapshots in the runner."""
+    return environment.get('CORPUS_FORMAT', TARBALL_FORMAT)
+
+
+def get_blob_store_dir(benchmark: str) -> str:
+    """Returns the filestore directory containing the blobs of the units of
+    |benchmark|."""
+    return posixpath.join(experiment_utils.get_experiment_filestore_path(),
+                          'corpus-blobs', benchmark)
+
+
+def get_blob_cache_dir(benchmark: str) -> str:
+    """Returns the local directory caching the blobs of |benchmark| in the
+    measurer."""
+    return os.path.join(experiment_utils.get_work_dir(), 'corpus-blob-cache',
+                        benchmark)
+
+
+def get_manifest_name(cycle: int) -> str:
+    """Returns the name of the manifest of the corpus snapshot of |cycle|."""
+    return experiment_utils.get_cycle_filename('corpus-manifest',
+                                               cycle) + '.json'
+
+
+def get_blob_digest(contents: bytes) -> str:
+    """Returns the name of the blob containing |contents|."""
+    return hashlib.sha1(contents).hexdigest()
+
+
+def stage_blobs(file_paths: Iterable[str], blobs_dir: str,
+                staged_digests: Set[str]) -> List[str]:
+    """Writes the files in |file_paths| as blobs in |blobs_dir|, skipping the
+    blobs in |staged_digests|, which is updated. Returns the digests of the
+    files."""
+    filesystem.create_directory(blobs_dir)
+    digests = set()
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as file_handle:
+                contents = file_handle.read()
+        except OSError:
+            # The file was deleted by the fuzzer, like when archiving.
+            continue
+        digest = get_blob_digest(contents)
+        digests.add(digest)
+        if digest in staged_digests:
+            continue
+        filesystem.write(os.path.join(blobs_dir, digest), contents, 'wb')
+        staged_digests.add(digest)
+    return sorted(digests)
+
+
+def write_manifest(manifest_path: str, digests: List[str]):
+    """Writes a manifest listing the units in |digests| to
+    |manifest_path|."""
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump({'units': digests}, manifest_file)
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """Returns the digests of the units listed in the manifest at
+    |manifest_path|."""
+    with open(manifest_path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)['units']
+
+
+class BlobCache:
+    """Local cache of the blobs of a blob store. Blobs are immutable, so cached
+    blobs never need to be fetched again."""
+
+    def __init__(self, cache_dir: str, blob_store_dir: str):
+        self.cache_dir = cache_dir
+        self.blob_store_dir = blob_store_dir
+
+    def _get_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def fetch(self, digests: List[str]) -> List[str]:
+        """Fetches the blobs in |digests| that aren't cached yet. Returns the
+        digests of the blobs that couldn't be fetched."""
+        missing_digests = [
+            digest for digest in digests
+            if not os.path.exists(self._get_path(digest))
+        ]
+        if not missing_digests:
+            return []
+
+        filesystem.create_directory(self.cache_dir)
+        # Fetch to a temporary directory so that other processes using the
+        # cache never see partially written blobs.
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            filestore_utils.cp_files([
+                posixpath.join(self.blob_store_dir, digest)
+                for digest in missing_digests
+            ],
+                                     temp_dir,
+                                     expect_zero=False,
+                                     parallel=True)
+            for digest in os.listdir(temp_dir):
+                os.replace(os.path.join(temp_dir, digest),
+                           self._get_path(digest))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        unfetched_digests = [
+            digest for digest in missing_digests
+            if not os.path.exists(self._get_path(digest))
+        ]
+        if unfetched_digests:
+            logs.warning('Failed to fetch %d blobs from %s.',
+                         len(unfetched_digests), self.blob_store_dir)
+        return unfetched_digests
+
+    def link(self, digests: List[str], directory: str):
+        """Links the cached blobs in |digests| into |directory|, naming the
+        units after their digest."""
+        filesystem.create_directory(directory)
+        for digest in digests:
+            blob_path = self._get_path(digest)
+            if not os.path.exists(blob_path):
+                continue
+            try:
+                os.link(blob_path, os.path.join(directory, digest))
+            except OSError:
+                shutil.copy(blob_path, os.path.join(directory, digest))
+
+
+def fetch_units(benchmark: str, corpus_dir: str, cycle: int,
+                output_directory: str) -> bool:
+    """Fetches the manifest of |cycle| from the filestore version of the local
+    |corpus_dir| of a trial and the blobs it lists that weren't fetched before.
+    Links the units of the manifest into |output_directory|. Returns False if
+    there is no manifest for |cycle|."""
+    manifest_path = os.path.join(corpus_dir, get_manifest_name(cycle))
+    if filestore_utils.cp(experiment_path.filestore(manifest_path),
+                          manifest_path,
+                          expect_zero=False).retcode:
+        return False
+    digests = read_manifest(manifest_path)
+    os.remove(manifest_path)
+
+    blob_cache = BlobCache(get_blob_cache_dir(benchmark),
+                           get_blob_store_dir(benchmark))
+    blob_cache.fetch(digests)
+    blob_cache.link(digests, output_directory)
+    return True
@@ -0,0 +1,249 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for finding the files written to a corpus since they were last
+collected. On Linux, files are recorded with inotify as the fuzzer writes them,
+so the corpus doesn't need to be walked and stat'ed every cycle. The corpus is
+scanned instead when inotify isn't available or has lost track of changes."""
+
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from typing import List
+
+from common import logs
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+# Files are recorded when they are created, written or moved in. Files that
+# appear without being written, e.g. hard links, only have a creation event. The
+# events of a file are recorded once per collection, and a file that is still
+# being written when it is collected is recorded again once it is closed.
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event without its variable length name.
+EVENT_HEADER = struct.Struct('iIII')
+EVENTS_READ_SIZE = 64 * 1024
+
+# Seconds to wait for events before checking if the journal was stopped.
+SELECT_TIMEOUT = 1
+
+
+class Inotify:
+    """Minimal ctypes wrapper around the inotify API of Linux's libc."""
+
+    def __init__(self):
+        # The symbols of the process include libc's.
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed.')
+
+    def add_watch(self, path: str) -> int:
+        """Watches the directory |path| and returns its watch descriptor."""
+        watch_descriptor = self._libc.inotify_add_watch(self.fd,
+                                                        os.fsencode(path),
+                                                        WATCH_MASK)
+        if watch_descriptor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed.', path)
+        return watch_descriptor
+
+    def read_events(self):
+        """Returns a list of (watch descriptor, mask, name) tuples for the
+        events that are ready to be read."""
+        buffer = ctypes.create_string_buffer(EVENTS_READ_SIZE)
+        num_bytes = self._libc.read(self.fd, buffer, EVENTS_READ_SIZE)
+        if num_bytes < 0:
+            raise OSError(ctypes.get_errno(), 'Failed to read inotify events.')
+        data = buffer.raw[:num_bytes]
+        events = []
+        offset = 0
+        while offset < len(data):
+            watch_descriptor, mask, _, name_length = (EVENT_HEADER.unpack_from(
+                data, offset))
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            events.append((watch_descriptor, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        """Closes the inotify instance, which removes all of its watches."""
+        self._libc.close(self.fd)
+
+
+def scan(directory: str, min_mtime: float) -> List[str]:
+    """Returns the paths of the files in |directory| modified at or after
+    |min_mtime|."""
+    paths = []
+    directories = [directory]
+    while directories:
+        try:
+            entries = list(os.scandir(directories.pop()))
+        except OSError:
+            # The directory was deleted.
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.stat().st_mtime >= min_mtime:
+                    paths.append(entry.path)
+            except OSError:
+                # The file was deleted.
+                continue
+    return paths
+
+
+def _raise_error(error: OSError):
+    raise error
+
+
+class CorpusJournal:  # pylint: disable=too-many-instance-attributes
+    """Records the files written to a corpus directory. The first call to
+    get_new_files returns the entire corpus."""
+
+    def __init__(self, corpus_dir: str):
+        self.corpus_dir = os.path.abspath(corpus_dir)
+        self._lock = threading.Lock()
+        self._new_files = set()
+        # Set when changes may have been missed, for example because the
+        # kernel's event queue overflowed.
+        self._needs_scan = True
+        self._last_collect_time = -float('inf')
+        self._inotify = None
+        # Maps watch descriptors to the directories they watch.
+        self._watched_dirs = {}
+        # Unset while the corpus directory itself isn't watched, for example
+        # after it was deleted and before it is created again.
+        self._is_corpus_dir_watched = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """Starts recording the files written to the corpus. Returns False if
+        inotify can't be used, in which case the corpus is scanned every time
+        new files are requested."""
+        try:
+            self._inotify = Inotify()
+            self._watch_tree(self.corpus_dir)
+            self._is_corpus_dir_watched = True
+        except Exception:  # pylint: disable=broad-except
+            logs.warning('Failed to watch corpus, scanning it instead.')
+            self._close()
+            return False
+        self._thread = threading.Thread(target=self._record_files, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stops recording the files written to the corpus."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._close()
+
+    def _close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _watch_tree(self, directory: str):
+        """Watches |directory| and its subdirectories. Files already in them
+        may have been written before the watches were added, so they are
+        recorded as new. Raises OSError if a directory can't be listed."""
+        for root, _, filenames in os.walk(directory, onerror=_raise_error):
+            self._watched_dirs[self._inotify.add_watch(root)] = root
+            with self._lock:
+                self._new_files.update(
+                    os.path.join(root, filename) for filename in filenames)
+
+    def _record_files(self):
+        """Records the files in the events of the inotify instance until the
+        journal is stopped."""
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([self._inotify.fd], [], [],
+                                               SELECT_TIMEOUT)
+                if readable:
+                    self._handle_events(self._inotify.read_events())
+                if not self._is_corpus_dir_watched:
+                    self._watch_corpus_dir()
+        except Exception:  # pylint: disable=broad-except
+            # get_new_files scans the corpus once this thread is dead.
+            logs.error('Failed to record corpus changes.')
+
+    def _handle_events(self, events):
+        for watch_descriptor, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                logs.warning('Corpus journal overflowed, scanning corpus.')
+                with self._lock:
+                    self._needs_scan = True
+                continue
+            if mask & IN_IGNORED:
+                # The watched directory was deleted.
+                directory = self._watched_dirs.pop(watch_descriptor, None)
+                if directory == self.corpus_dir:
+                    self._is_corpus_dir_watched = False
+                    self._watch_corpus_dir()
+                continue
+            directory = self._watched_dirs.get(watch_descriptor)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if not mask & IN_ISDIR:
+                with self._lock:
+                    self._new_files.add(path)
+                continue
+            try:
+                self._watch_tree(path)
+            except OSError:
+                with self._lock:
+                    self._needs_scan = True
+
+    def _watch_corpus_dir(self):
+        """Watches the corpus directory again after it was deleted. Files
+        written to it in the meantime are found by scanning it."""
+        with self._lock:
+            self._needs_scan = True
+        try:
+            self._watch_tree(self.corpus_dir)
+        except OSError:
+            # It wasn't created again yet.
+            return
+        self._is_corpus_dir_watched = True
+
+    def get_new_files(self) -> List[str]:
+        """Returns the paths of the files written to the corpus since the last
+        call."""
+        collect_time = time.time()
+        with self._lock:
+            new_files = self._new_files
+            self._new_files = set()
+            needs_scan = (self._needs_scan or not self._is_corpus_dir_watched or
+                          self._thread is None or not self._thread.is_alive())
+            self._needs_scan = False
+        if needs_scan:
+            new_files.update(scan(self.corpus_dir, self._last_collect_time))
+        self._last_collect_time = collect_time
+        return sorted(new_files)
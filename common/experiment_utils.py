@@ -23,6 +23,11 @@ from common import experiment_path as exp_path
 DEFAULT_SNAPSHOT_SECONDS = 15 * 60  # Seconds.
 CONFIG_DIR = 'config'
 
+# Files with the branches covered by a fuzzer on a benchmark, written by the
+# measurer and read when generating reports.
+COVERED_BRANCHES_JSON_FILENAME = 'covered_branches.json'
+COVERED_BRANCHES_NPZ_FILENAME = 'covered_branches.npz'
+
 
 def get_internal_experiment_config_relative_path():
     """Returns the path of the internal config file relative to the data
@@ -41,6 +46,11 @@ def get_cycle_time(cycle):
     return cycle * get_snapshot_seconds()
 
 
+def time_to_cycle(time_in_seconds: float) -> int:
+    """Converts |time_in_seconds| to the corresponding cycle and returns it."""
+    return time_in_seconds // get_snapshot_seconds()
+
+
 def get_work_dir():
     """Returns work directory."""
     return os.environ['WORK']
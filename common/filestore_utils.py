@@ -16,10 +16,15 @@
 from common import experiment_utils
 from common import gsutil
 from common import local_filestore
+from common import object_store
+from common import object_store_filestore
 
 GCS_GSUTIL_PREFIX = 'gs://'
 GCS_HTTP_PREFIX = 'https://storage.googleapis.com/'
 
+# Number of files copied by a single command, to keep command lines short.
+CP_FILES_BATCH_SIZE = 500
+
 
 def _using_gsutil():
     """Returns True if using Google Cloud Storage for filestore."""
@@ -51,6 +56,9 @@ def get_user_facing_path(filestore_path):
 def get_impl():
     """Returns the implementation for filestore_utils."""
     if _using_gsutil():
+        # Use an object store client when one is set up since it is faster.
+        if object_store.get_object_store() is not None:
+            return object_store_filestore
         return gsutil
     # Use local_filestore when not using gsutil.
     return local_filestore
@@ -67,6 +75,23 @@ def cp(source, destination, recursive=False, expect_zero=True, parallel=False):
                          parallel=parallel)
 
 
+def cp_files(sources, destination_dir, expect_zero=True, parallel=False):
+    """Copies the files in |sources| to |destination_dir| with as few commands
+    as possible. If |expect_zero| is True then it can raise
+    subprocess.CalledProcessError. |parallel| is only used by the gsutil
+    implementation. Returns the result of the first command that failed or of
+    the last command."""
+    result = None
+    for idx in range(0, len(sources), CP_FILES_BATCH_SIZE):
+        result = get_impl().cp_files(sources[idx:idx + CP_FILES_BATCH_SIZE],
+                                     destination_dir,
+                                     expect_zero=expect_zero,
+                                     parallel=parallel)
+        if result.retcode:
+            break
+    return result
+
+
 def ls(path, must_exist=True):  # pylint: disable=invalid-name
     """Lists files or folders in |path| as one filename per line.
     If |must_exist| is True then it can raise subprocess.CalledProcessError."""
@@ -40,6 +40,14 @@ def cp(source, destination, recursive=False, expect_zero=True, parallel=False):
     return gsutil_command(command, expect_zero=expect_zero, parallel=parallel)
 
 
+def cp_files(sources, destination_dir, expect_zero=True, parallel=False):
+    """Executes gsutil's "cp" command to copy the files in |sources| to
+    |destination_dir|. If |expect_zero| is True and the command fails then this
+    function will raise a subprocess.CalledError."""
+    command = ['cp'] + list(sources) + [destination_dir.rstrip('/') + '/']
+    return gsutil_command(command, expect_zero=expect_zero, parallel=parallel)
+
+
 def ls(path, must_exist=True):  # pylint: disable=invalid-name
     """Executes gsutil's "ls" command on |path|. If |must_exist| is True and the
     command fails then this function will raise a subprocess.CalledError."""
@@ -11,12 +11,83 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Helper functions for using the local_filestore."""
+"""Helper functions for using the local_filestore. Operations are done in
+process instead of by executing commands like "cp" or "ls", since they are
+called often enough for forking processes to be costly. Their results mimic
+those of the commands they replace."""
 
+import errno
 import os
+import shutil
+import tempfile
 
-from common import new_process
 from common import filesystem
+from common import new_process
+
+# Errors raised by copy_file_range when it can't copy between two files.
+COPY_FILE_RANGE_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM
+}
+
+
+def _execute(command, operation, *args, expect_zero=True):
+    """Does |operation| with |args| in place of executing |command|. See
+    new_process.execute_in_process."""
+    return new_process.execute_in_process(command,
+                                          operation,
+                                          *args,
+                                          expect_zero=expect_zero)
+
+
+def _copy_file_range(source_fd, destination_fd, size):
+    """Copies |size| bytes from |source_fd| to |destination_fd| in the kernel.
+    On filesystems that support it, the files share their data until one of
+    them is modified."""
+    while size > 0:
+        copied = os.copy_file_range(source_fd, destination_fd, size)
+        if not copied:
+            break
+        size -= copied
+
+
+def _copy_file(source, destination):
+    """Copies the contents and permissions of the file |source| to
+    |destination| like "cp" does."""
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError(errno.EINVAL, 'Source is destination',
+                                   source)
+    with open(source, 'rb') as source_file, \
+            open(destination, 'wb') as destination_file:
+        try:
+            if not hasattr(os, 'copy_file_range'):
+                raise OSError(errno.ENOSYS, 'copy_file_range unavailable')
+            _copy_file_range(source_file.fileno(), destination_file.fileno(),
+                             os.fstat(source_file.fileno()).st_size)
+        except OSError as error:
+            if error.errno not in COPY_FILE_RANGE_UNSUPPORTED_ERRNOS:
+                raise
+            source_file.seek(0)
+            destination_file.seek(0)
+            destination_file.truncate()
+            shutil.copyfileobj(source_file, destination_file)
+    shutil.copymode(source, destination)
+
+
+def _cp(source, destination, recursive):
+    if os.path.isdir(destination):
+        destination = os.path.join(destination,
+                                   os.path.basename(source.rstrip('/')))
+    if not os.path.isdir(source):
+        _copy_file(source, destination)
+        return
+    if not recursive:
+        raise IsADirectoryError(errno.EISDIR,
+                                '-r not specified; omitting directory', source)
+    shutil.copytree(source,
+                    destination,
+                    symlinks=True,
+                    copy_function=_copy_file,
+                    dirs_exist_ok=True)
 
 
 def cp(  # pylint: disable=invalid-name
@@ -25,7 +96,7 @@ def cp(  # pylint: disable=invalid-name
         recursive=False,
         expect_zero=True,
         parallel=False):  # pylint: disable=unused-argument
-    """Executes "cp" command from |source| to |destination|."""
+    """Copies |source| to |destination| like the "cp" command."""
     # Create intermediate folders for `cp` command to behave like `gsutil.cp`.
     filesystem.create_directory(os.path.dirname(destination))
 
@@ -33,17 +104,73 @@ def cp(  # pylint: disable=invalid-name
     if recursive:
         command.append('-r')
     command.extend([source, destination])
-    return new_process.execute(command, expect_zero=expect_zero)
+    return _execute(command,
+                    _cp,
+                    source,
+                    destination,
+                    recursive,
+                    expect_zero=expect_zero)
+
+
+def _cp_files(sources, destination_dir):
+    """Copies every file in |sources| to |destination_dir|, even if some of
+    them can't be copied. Raises the first error afterwards."""
+    first_error = None
+    for source in sources:
+        try:
+            _copy_file(source,
+                       os.path.join(destination_dir, os.path.basename(source)))
+        except OSError as error:
+            first_error = first_error or error
+    if first_error is not None:
+        raise first_error
+
+
+def cp_files(  # pylint: disable=unused-argument
+        sources,
+        destination_dir,
+        expect_zero=True,
+        parallel=False):
+    """Copies the files in |sources| to |destination_dir| like the "cp"
+    command."""
+    filesystem.create_directory(destination_dir)
+    command = ['cp'] + list(sources) + [destination_dir]
+    return _execute(command,
+                    _cp_files,
+                    sources,
+                    destination_dir,
+                    expect_zero=expect_zero)
+
+
+def _ls(path):
+    if not os.path.isdir(path):
+        # Raises if |path| doesn't exist.
+        os.lstat(path)
+        return path + '\n'
+    filenames = sorted(filename for filename in os.listdir(path)
+                       if not filename.startswith('.'))
+    return ''.join(filename + '\n' for filename in filenames)
 
 
 def ls(path, must_exist=True):  # pylint: disable=invalid-name
-    """Executes "ls" command for |path|. If |must_exist| is True then it can
+    """Lists |path| like the "ls" command. If |must_exist| is True then it can
     raise subprocess.CalledProcessError."""
-    # Add '-1' (i.e., number one) to behave like `gsutil.ls` (i.e., one filename
-    # per line).
+    # List one filename per line to behave like `gsutil.ls`.
     command = ['ls', '-1', path]
-    process_result = new_process.execute(command, expect_zero=must_exist)
-    return process_result
+    return _execute(command, _ls, path, expect_zero=must_exist)
+
+
+def _rm(path, recursive, force):
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            if not recursive:
+                raise IsADirectoryError(errno.EISDIR, 'Is a directory', path)
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        if not force:
+            raise
 
 
 def rm(  # pylint: disable=invalid-name
@@ -51,15 +178,76 @@ def rm(  # pylint: disable=invalid-name
         recursive=True,
         force=False,
         parallel=False):  # pylint: disable=unused-argument
-    """Executes "rm" command for |path| and returns the result. Uses -r
-    if |recursive|. If |force|, then uses -f and will not except if return code
-    is nonzero."""
+    """Removes |path| like the "rm" command and returns the result. Removes
+    directories if |recursive|. If |force|, then |path| not existing isn't an
+    error."""
     command = ['rm', path]
     if recursive:
         command.insert(1, '-r')
     if force:
         command.insert(1, '-f')
-    return new_process.execute(command, expect_zero=True)
+    return _execute(command, _rm, path, recursive, force)
+
+
+def _is_up_to_date(source_stat, destination):
+    """Returns True if |destination| has the size and modification time of the
+    file |source_stat| is about, which is how rsync decides that a file
+    doesn't need to be copied."""
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+    return (destination_stat.st_size == source_stat.st_size and
+            destination_stat.st_mtime_ns == source_stat.st_mtime_ns)
+
+
+def _sync_file(source, destination):
+    """Replaces |destination| with a copy of |source| at once, so that readers
+    never see a partially copied file."""
+    if os.path.isdir(destination) and not os.path.islink(destination):
+        shutil.rmtree(destination)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(destination),
+                                     prefix='.' + os.path.basename(destination),
+                                     delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        _copy_file(source, temp_path)
+        shutil.copystat(source, temp_path)
+        os.replace(temp_path, destination)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def _sync_dir(source_dir, destination_dir, delete, recursive):
+    """Copies the files of |source_dir| that aren't up to date in
+    |destination_dir| to it. Also does so for subdirectories if |recursive|.
+    Like rsync, skips symlinks and other files that aren't regular files."""
+    if not os.path.isdir(destination_dir) or os.path.islink(destination_dir):
+        if os.path.lexists(destination_dir):
+            os.remove(destination_dir)
+        os.mkdir(destination_dir)
+
+    synced_filenames = set()
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            destination = os.path.join(destination_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    _sync_dir(entry.path, destination, delete, recursive)
+                    synced_filenames.add(entry.name)
+            elif entry.is_file(follow_symlinks=False):
+                if not _is_up_to_date(entry.stat(follow_symlinks=False),
+                                      destination):
+                    _sync_file(entry.path, destination)
+                synced_filenames.add(entry.name)
+
+    if not delete:
+        return
+    for filename in os.listdir(destination_dir):
+        if filename in synced_filenames:
+            continue
+        _rm(os.path.join(destination_dir, filename), recursive=True, force=True)
 
 
 def rsync(  # pylint: disable=too-many-arguments
@@ -71,7 +259,9 @@ def rsync(  # pylint: disable=too-many-arguments
         options=None,
         parallel=False):  # pylint: disable=unused-argument
     """Does local_filestore rsync from |source| to |destination| using useful
-    defaults that can be overriden."""
+    defaults that can be overriden. Files with the same size and modification
+    time in both are not copied again. |options| are rsync flags, so rsync is
+    only executed if they are passed."""
     # Add check to behave like `gsutil.rsync`.
     assert os.path.isdir(source), 'filestore_utils.rsync: source should be dir.'
 
@@ -90,10 +280,17 @@ def rsync(  # pylint: disable=too-many-arguments
     if source[-1] != '/':
         source = source + '/'
     command.extend([source, destination])
-    return new_process.execute(command, expect_zero=True)
+    if options is not None:
+        return new_process.execute(command, expect_zero=True)
+    return _execute(command, _sync_dir, source, destination, delete, recursive)
+
+
+def _cat(file_path):
+    with open(file_path, 'rb') as file_handle:
+        return file_handle.read().decode('utf-8', errors='ignore')
 
 
 def cat(file_path, expect_zero=True):
-    """Does cat on |file_path| and returns the result."""
+    """Returns the result of reading |file_path| like the "cat" command."""
     command = ['cat', file_path]
-    return new_process.execute(command, expect_zero=expect_zero)
+    return _execute(command, _cat, file_path, expect_zero=expect_zero)
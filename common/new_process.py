@@ -17,7 +17,7 @@ import os
 import signal
 import subprocess
 import threading
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple, Type
 
 from common import logs
 
@@ -90,7 +90,9 @@ def execute(  # pylint: disable=too-many-locals,too-many-branches
     kwargs['stdout'] = output_file
     kwargs['stderr'] = subprocess.STDOUT
     if kill_children:
-        kwargs['preexec_fn'] = os.setsid
+        # Unlike preexec_fn=os.setsid, this is safe when other threads are
+        # running.
+        kwargs['start_new_session'] = True
 
     # pylint: disable=consider-using-with
     process = subprocess.Popen(command, *args, **kwargs)
@@ -126,3 +128,32 @@ def execute(  # pylint: disable=too-many-locals,too-many-branches
 
     logs.debug(log_message, command_log_str, retcode, extras=log_extras)
     return ProcessResult(retcode, output, wrapped_process.timed_out)
+
+
+def execute_in_process(
+    command: List[str],
+    operation: Callable[..., Optional[str]],
+    *args,
+    expect_zero: bool = True,
+    errors: Tuple[Type[Exception], ...] = (OSError,)
+) -> ProcessResult:
+    """Does |operation| with |args| in place of executing |command| and returns
+    a ProcessResult like execute would. The result's output is the string
+    returned by |operation|. |errors| raised by |operation| make it fail and,
+    if |expect_zero|, raise subprocess.CalledProcessError."""
+    try:
+        output = operation(*args) or ''
+        retcode = 0
+    except errors as error:
+        output = f'{command[0]}: {error}\n'
+        retcode = 1
+
+    command_log_str = ' '.join(command)[:LOG_LIMIT_FIELD]
+    log_message = 'Executed command: "%s" returned: %d.'
+    log_extras = {'output': output[-LOG_LIMIT_FIELD:]}
+    if expect_zero and retcode != 0:
+        logs.error(log_message, command_log_str, retcode, extras=log_extras)
+        raise subprocess.CalledProcessError(retcode, command)
+
+    logs.debug(log_message, command_log_str, retcode, extras=log_extras)
+    return ProcessResult(retcode, output, False)
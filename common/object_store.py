@@ -0,0 +1,298 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for clients of object stores addressed with gs:// URLs. Unlike
+gsutil, clients live as long as the process that uses them, so they reuse
+their connections, and they do batches of operations concurrently.
+
+The client is chosen with the OBJECT_STORE environment variable:
+  gcs: Google Cloud Storage, through its JSON API.
+  fake: a directory (FAKE_OBJECT_STORE_DIR) that stands in for the store, for
+        testing and for running without network access.
+When it isn't set, filestore_utils uses gsutil."""
+
+import concurrent.futures
+import contextlib
+import os
+import shutil
+import threading
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+from common import environment
+from common import filesystem
+from common import logs
+
+GCS_PREFIX = 'gs://'
+
+GCS_BACKEND = 'gcs'
+FAKE_BACKEND = 'fake'
+
+# Number of operations of a batch done at once. Each can use a connection.
+DEFAULT_MAX_WORKERS = 16
+
+# Pairs of sources and destinations of copies.
+CopyPairs = Iterable[Tuple[str, str]]
+
+_object_store = None  # pylint: disable=invalid-name
+_object_store_pid = None  # pylint: disable=invalid-name
+_object_store_lock = threading.Lock()
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Returns the bucket and object name of |url|."""
+    assert url.startswith(GCS_PREFIX), f'Not an object store URL: {url}.'
+    bucket, _, name = url[len(GCS_PREFIX):].partition('/')
+    return bucket, name
+
+
+class ObjectStore:
+    """Interface of object store clients. Objects are addressed by URLs like
+    gs://bucket/name. Like in gsutil, a URL ending in a "/" is a directory
+    containing the objects whose name starts with it. Operations on missing
+    objects raise FileNotFoundError."""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+
+    def exists(self, url: str) -> bool:
+        """Returns True if the object at |url| exists, without fetching it."""
+        raise NotImplementedError
+
+    def list_dir(self, url: str) -> List[str]:
+        """Returns the URLs of the objects and directories directly in the
+        directory |url|."""
+        raise NotImplementedError
+
+    def list_tree(self, url: str) -> List[str]:
+        """Returns the URLs of the objects in the directory |url| and its
+        subdirectories."""
+        raise NotImplementedError
+
+    def read(self, url: str) -> bytes:
+        """Returns the contents of the object at |url|."""
+        raise NotImplementedError
+
+    def download(self, url: str, path: str):
+        """Writes the contents of the object at |url| to the file |path|."""
+        raise NotImplementedError
+
+    def upload(self, path: str, url: str):
+        """Writes the contents of the file |path| to the object at |url|."""
+        raise NotImplementedError
+
+    def delete(self, url: str):
+        """Deletes the object at |url|."""
+        raise NotImplementedError
+
+    def _map(self, function: Callable,
+             arguments: Iterable[Sequence]) -> List[Optional[Exception]]:
+        """Calls |function| with every sequence of |arguments| concurrently.
+        Returns the exception raised by each call or None if it succeeded."""
+        futures = [self._executor.submit(function, *args) for args in arguments]
+        return [future.exception() for future in futures]
+
+    def download_many(self,
+                      url_path_pairs: CopyPairs) -> List[Optional[Exception]]:
+        """Downloads the objects in |url_path_pairs| to their path
+        concurrently. Returns the exception raised by each download."""
+        return self._map(self.download, url_path_pairs)
+
+    def upload_many(self,
+                    path_url_pairs: CopyPairs) -> List[Optional[Exception]]:
+        """Uploads the files in |path_url_pairs| to their URL concurrently.
+        Returns the exception raised by each upload."""
+        return self._map(self.upload, path_url_pairs)
+
+    def delete_many(self, urls: Iterable[str]) -> List[Optional[Exception]]:
+        """Deletes the objects at |urls| concurrently. Returns the exception
+        raised by each deletion."""
+        return self._map(self.delete, ((url,) for url in urls))
+
+
+@contextlib.contextmanager
+def _raise_file_not_found(url: str):
+    """Raises FileNotFoundError instead of the errors of the Cloud Storage
+    client for missing objects."""
+    try:
+        yield
+    except google_exceptions.NotFound as error:
+        raise FileNotFoundError(f'No object at {url}.') from error
+
+
+class GcsObjectStore(ObjectStore):
+    """Client for Google Cloud Storage. Its connection pool is large enough
+    for every concurrent operation to keep its connection open."""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        super().__init__(max_workers)
+        # Optional dependencies that are only needed when using this client.
+        # pylint: disable=import-outside-toplevel
+        import google.auth
+        import google.auth.transport.requests
+        import requests.adapters
+        from google.cloud import storage
+
+        credentials, project = google.auth.default()
+        session = google.auth.transport.requests.AuthorizedSession(credentials)
+        session.mount(
+            'https://',
+            requests.adapters.HTTPAdapter(pool_connections=max_workers,
+                                          pool_maxsize=max_workers))
+        self._client = storage.Client(project=project,
+                                      credentials=credentials,
+                                      _http=session)
+
+    def _get_blob(self, url: str):
+        bucket, name = split_url(url)
+        return self._client.bucket(bucket).blob(name)
+
+    def exists(self, url: str) -> bool:
+        return self._get_blob(url).exists()
+
+    def _list(self, url: str, delimiter: Optional[str]) -> List[str]:
+        bucket, prefix = split_url(url)
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        blobs = self._client.list_blobs(bucket,
+                                        prefix=prefix,
+                                        delimiter=delimiter)
+        urls = [f'{GCS_PREFIX}{bucket}/{blob.name}' for blob in blobs]
+        # Directories are only known once the blobs were iterated over.
+        urls.extend(
+            f'{GCS_PREFIX}{bucket}/{directory}' for directory in blobs.prefixes)
+        return sorted(urls)
+
+    def list_dir(self, url: str) -> List[str]:
+        return self._list(url, delimiter='/')
+
+    def list_tree(self, url: str) -> List[str]:
+        return self._list(url, delimiter=None)
+
+    def read(self, url: str) -> bytes:
+        with _raise_file_not_found(url):
+            return self._get_blob(url).download_as_bytes()
+
+    def download(self, url: str, path: str):
+        with _raise_file_not_found(url):
+            self._get_blob(url).download_to_filename(path)
+
+    def upload(self, path: str, url: str):
+        self._get_blob(url).upload_from_filename(path)
+
+    def delete(self, url: str):
+        with _raise_file_not_found(url):
+            self._get_blob(url).delete()
+
+
+class FakeObjectStore(ObjectStore):
+    """Object store kept in the local directory |root_dir|. The object at
+    gs://bucket/name is the file |root_dir|/bucket/name."""
+
+    def __init__(self, root_dir: str, max_workers: int = DEFAULT_MAX_WORKERS):
+        super().__init__(max_workers)
+        self.root_dir = root_dir
+
+    def _get_path(self, url: str) -> str:
+        bucket, name = split_url(url)
+        return os.path.join(self.root_dir, bucket, name)
+
+    def _get_url(self, path: str) -> str:
+        return GCS_PREFIX + os.path.relpath(path, self.root_dir)
+
+    def exists(self, url: str) -> bool:
+        return os.path.isfile(self._get_path(url))
+
+    def list_dir(self, url: str) -> List[str]:
+        directory = self._get_path(url)
+        if not os.path.isdir(directory):
+            return []
+        urls = []
+        for entry in os.scandir(directory):
+            url = self._get_url(entry.path)
+            urls.append(url + '/' if entry.is_dir() else url)
+        return sorted(urls)
+
+    def list_tree(self, url: str) -> List[str]:
+        urls = []
+        for root, _, filenames in os.walk(self._get_path(url)):
+            urls.extend(
+                self._get_url(os.path.join(root, filename))
+                for filename in filenames)
+        return sorted(urls)
+
+    def read(self, url: str) -> bytes:
+        with open(self._get_path(url), 'rb') as object_file:
+            return object_file.read()
+
+    def download(self, url: str, path: str):
+        shutil.copyfile(self._get_path(url), path)
+
+    def upload(self, path: str, url: str):
+        object_path = self._get_path(url)
+        filesystem.create_directory(os.path.dirname(object_path))
+        # Objects appear at once, like in a real object store.
+        temp_path = f'{object_path}.tmp-{threading.get_ident()}'
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, object_path)
+
+    def delete(self, url: str):
+        object_path = self._get_path(url)
+        os.remove(object_path)
+        # Directories only exist as long as they contain objects.
+        bucket_dir = os.path.join(self.root_dir, split_url(url)[0])
+        directory = os.path.dirname(object_path)
+        while directory != bucket_dir and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+
+def _create_object_store(backend: str) -> ObjectStore:
+    """Returns a new client for the object store |backend|."""
+    if backend == GCS_BACKEND:
+        return GcsObjectStore()
+    if backend == FAKE_BACKEND:
+        return FakeObjectStore(os.environ['FAKE_OBJECT_STORE_DIR'])
+    raise ValueError(f'Unknown object store: {backend}.')
+
+
+def get_object_store() -> Optional[ObjectStore]:
+    """Returns the object store client of this process, or None if gsutil
+    should be used instead, either because no object store was set or because
+    its client can't be created."""
+    global _object_store, _object_store_pid  # pylint: disable=global-statement
+    backend = environment.get('OBJECT_STORE')
+    if not backend:
+        return None
+    with _object_store_lock:
+        # Connections can't be shared with forked processes.
+        if _object_store_pid != os.getpid():
+            _object_store_pid = os.getpid()
+            try:
+                _object_store = _create_object_store(backend)
+            except Exception:  # pylint: disable=broad-except
+                logs.error(
+                    'Failed to create %s object store client, using '
+                    'gsutil instead.', backend)
+                _object_store = None
+        return _object_store
+
+
+def reset_object_store():
+    """Makes the next call to get_object_store create a new client."""
+    global _object_store, _object_store_pid  # pylint: disable=global-statement
+    with _object_store_lock:
+        _object_store = None
+        _object_store_pid = None
@@ -0,0 +1,175 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helper functions for using an object store filestore through the client
+returned by object_store.get_object_store instead of gsutil. Results mimic
+those of the gsutil commands they replace. Operations the client doesn't do,
+like rsync, are done with gsutil."""
+
+import os
+
+from common import filesystem
+from common import gsutil
+from common import new_process
+from common import object_store
+
+
+def _is_url(path):
+    return path.startswith(object_store.GCS_PREFIX)
+
+
+def _execute(command, operation, *args, expect_zero=True):
+    """Does |operation| with |args| in place of executing gsutil |command|. Any
+    exception raised by |operation| makes it fail. See
+    new_process.execute_in_process."""
+    return new_process.execute_in_process(['gsutil'] + command,
+                                          operation,
+                                          *args,
+                                          expect_zero=expect_zero,
+                                          errors=(Exception,))
+
+
+def _raise_first_error(errors):
+    for error in errors:
+        if error is not None:
+            raise error
+
+
+def _get_destination(source, destination):
+    """Returns where copying |source| to |destination| puts it, which is in
+    |destination| if it is a directory."""
+    if destination.endswith('/') or (not _is_url(destination) and
+                                     os.path.isdir(destination)):
+        return os.path.join(destination, os.path.basename(source))
+    return destination
+
+
+def _cp(source, destination):
+    store = object_store.get_object_store()
+    destination = _get_destination(source, destination)
+    if _is_url(destination):
+        store.upload(source, destination)
+        return
+    filesystem.create_directory(os.path.dirname(destination))
+    store.download(source, destination)
+
+
+def cp(source, destination, recursive=False, expect_zero=True, parallel=False):  # pylint: disable=invalid-name
+    """Copies |source| to |destination| like gsutil's "cp" command. Copies of
+    directories and between two object store URLs are done with gsutil."""
+    if recursive or _is_url(source) == _is_url(destination):
+        return gsutil.cp(source,
+                         destination,
+                         recursive=recursive,
+                         expect_zero=expect_zero,
+                         parallel=parallel)
+    return _execute(['cp', source, destination],
+                    _cp,
+                    source,
+                    destination,
+                    expect_zero=expect_zero)
+
+
+def _cp_files(sources, destination_dir):
+    store = object_store.get_object_store()
+    destination_dir = destination_dir.rstrip('/') + '/'
+    pairs = [(source, _get_destination(source, destination_dir))
+             for source in sources]
+    if _is_url(destination_dir):
+        _raise_first_error(store.upload_many(pairs))
+        return
+    filesystem.create_directory(destination_dir)
+    _raise_first_error(store.download_many(pairs))
+
+
+def cp_files(sources, destination_dir, expect_zero=True, parallel=False):
+    """Copies the files in |sources| to |destination_dir| concurrently. Every
+    file that can be copied is, even if others fail."""
+    if any(_is_url(source) == _is_url(destination_dir) for source in sources):
+        return gsutil.cp_files(sources,
+                               destination_dir,
+                               expect_zero=expect_zero,
+                               parallel=parallel)
+    return _execute(['cp'] + list(sources) + [destination_dir],
+                    _cp_files,
+                    sources,
+                    destination_dir,
+                    expect_zero=expect_zero)
+
+
+def _ls(path):
+    store = object_store.get_object_store()
+    urls = [path] if store.exists(path) else store.list_dir(path)
+    if not urls:
+        raise FileNotFoundError('One or more URLs matched no objects.')
+    return ''.join(url + '\n' for url in urls)
+
+
+def ls(path, must_exist=True):  # pylint: disable=invalid-name
+    """Lists |path| like gsutil's "ls" command. Checks whether an object exists
+    without listing its directory. If |must_exist| is True and |path| doesn't
+    exist then this function will raise a subprocess.CalledError."""
+    return _execute(['ls', path], _ls, path, expect_zero=must_exist)
+
+
+def _rm(path, recursive):
+    store = object_store.get_object_store()
+    urls = [path]
+    if recursive:
+        urls = ([path] if store.exists(path) else []) + store.list_tree(path)
+        if not urls:
+            raise FileNotFoundError('One or more URLs matched no objects.')
+    _raise_first_error(store.delete_many(urls))
+
+
+def rm(path, recursive=True, force=False, parallel=False):  # pylint: disable=invalid-name,unused-argument
+    """Removes |path| like gsutil's "rm" command and returns the result.
+    Removes the objects in the directory |path| if |recursive|. If |force|,
+    then it will not except if the return code is nonzero."""
+    command = ['rm', path]
+    if recursive:
+        command.insert(1, '-r')
+    if force:
+        command.insert(1, '-f')
+    return _execute(command, _rm, path, recursive, expect_zero=not force)
+
+
+def rsync(  # pylint: disable=too-many-arguments
+        source,
+        destination,
+        delete=True,
+        recursive=True,
+        gsutil_options=None,
+        options=None,
+        parallel=False):
+    """Does gsutil rsync from |source| to |destination|."""
+    return gsutil.rsync(source,
+                        destination,
+                        delete=delete,
+                        recursive=recursive,
+                        gsutil_options=gsutil_options,
+                        options=options,
+                        parallel=parallel)
+
+
+def _cat(file_path):
+    store = object_store.get_object_store()
+    return store.read(file_path).decode('utf-8', errors='ignore')
+
+
+def cat(file_path, expect_zero=True):
+    """Returns the result of reading the object at |file_path|."""
+    return _execute(['cat', file_path],
+                    _cat,
+                    file_path,
+                    expect_zero=expect_zero)
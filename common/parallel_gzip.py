@@ -0,0 +1,82 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for gzip compression using multiple threads. Data is split in chunks
+that are compressed independently into gzip members. A concatenation of gzip
+members is a valid gzip file, so it can be read by any gzip reader."""
+
+import collections
+import concurrent.futures
+import gzip
+import os
+
+MAX_THREADS = 4
+CHUNK_SIZE = 1024 * 1024  # Bytes.
+DEFAULT_COMPRESSLEVEL = 6
+
+
+def get_num_threads() -> int:
+    """Returns the number of threads to compress with."""
+    return min(MAX_THREADS, os.cpu_count() or 1)
+
+
+class ParallelGzipWriter:
+    """Write-only file-like object that compresses what is written to it into
+    |fileobj|. zlib releases the GIL while compressing, so chunks are
+    compressed in parallel by a thread pool."""
+
+    def __init__(self,
+                 fileobj,
+                 num_threads=None,
+                 compresslevel=DEFAULT_COMPRESSLEVEL):
+        self.fileobj = fileobj
+        self.num_threads = num_threads or get_num_threads()
+        self.compresslevel = compresslevel
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.num_threads)
+        self._pending_members = collections.deque()
+        self._buffer = bytearray()
+        self._num_members = 0
+
+    def _compress(self, chunk: bytes):
+        self._pending_members.append(
+            self._executor.submit(gzip.compress,
+                                  chunk,
+                                  self.compresslevel,
+                                  mtime=0))
+        self._num_members += 1
+        # Don't keep more chunks in memory than the threads can compress.
+        while len(self._pending_members) > 2 * self.num_threads:
+            self.fileobj.write(self._pending_members.popleft().result())
+
+    def write(self, data) -> int:
+        """Compresses |data| and returns its length."""
+        self._buffer += data
+        while len(self._buffer) >= CHUNK_SIZE:
+            self._compress(bytes(self._buffer[:CHUNK_SIZE]))
+            del self._buffer[:CHUNK_SIZE]
+        return len(data)
+
+    def close(self):
+        """Writes the remaining data to |fileobj|. Doesn't close |fileobj|."""
+        if self._buffer or not self._num_members:
+            self._compress(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending_members:
+            self.fileobj.write(self._pending_members.popleft().result())
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
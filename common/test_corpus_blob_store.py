@@ -0,0 +1,82 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for corpus_blob_store.py."""
+import os
+
+from common import corpus_blob_store
+
+# pylint: disable=invalid-name,unused-argument
+
+
+def test_stage_blobs(tmp_path):
+    """Tests that units with the same contents are staged once."""
+    corpus_dir = tmp_path / 'corpus'
+    corpus_dir.mkdir()
+    for name, contents in [('a', b'1'), ('b', b'1'), ('c', b'2')]:
+        (corpus_dir / name).write_bytes(contents)
+    blobs_dir = tmp_path / 'blobs'
+    staged_digests = set()
+
+    paths = [str(corpus_dir / name) for name in ['a', 'b', 'c', 'deleted']]
+    digests = corpus_blob_store.stage_blobs(paths, str(blobs_dir),
+                                            staged_digests)
+
+    expected_digests = sorted(
+        corpus_blob_store.get_blob_digest(contents)
+        for contents in [b'1', b'2'])
+    assert digests == expected_digests
+    assert sorted(os.listdir(blobs_dir)) == expected_digests
+    assert staged_digests == set(expected_digests)
+
+    # Blobs that were already staged aren't written again.
+    for blob in blobs_dir.iterdir():
+        blob.unlink()
+    assert corpus_blob_store.stage_blobs(
+        paths[:1], str(blobs_dir),
+        staged_digests) == [corpus_blob_store.get_blob_digest(b'1')]
+    assert not os.listdir(blobs_dir)
+
+
+def test_manifest(tmp_path):
+    """Tests that manifests can be read back."""
+    manifest_path = str(tmp_path / corpus_blob_store.get_manifest_name(3))
+    corpus_blob_store.write_manifest(manifest_path, ['a', 'b'])
+    assert os.path.basename(manifest_path) == 'corpus-manifest-0003.json'
+    assert corpus_blob_store.read_manifest(manifest_path) == ['a', 'b']
+
+
+def test_blob_cache(tmp_path, use_local_filestore):
+    """Tests that blobs are fetched once and linked into corpus
+    directories."""
+    store_dir = tmp_path / 'store'
+    store_dir.mkdir()
+    digests = []
+    for contents in [b'1', b'2']:
+        digest = corpus_blob_store.get_blob_digest(contents)
+        (store_dir / digest).write_bytes(contents)
+        digests.append(digest)
+    missing_digest = corpus_blob_store.get_blob_digest(b'3')
+    blob_cache = corpus_blob_store.BlobCache(str(tmp_path / 'cache'),
+                                             str(store_dir))
+
+    assert blob_cache.fetch(digests + [missing_digest]) == [missing_digest]
+    # Cached blobs are used even if the store loses them.
+    for blob in store_dir.iterdir():
+        blob.unlink()
+    assert not blob_cache.fetch(digests)
+
+    corpus_dir = tmp_path / 'corpus'
+    blob_cache.link(digests + [missing_digest], str(corpus_dir))
+    assert sorted(os.listdir(corpus_dir)) == sorted(digests)
+    assert (corpus_dir / digests[0]).read_bytes() == b'1'
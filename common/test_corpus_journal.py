@@ -0,0 +1,116 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for corpus_journal.py."""
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+from common import corpus_journal
+
+
+def _wait_for_new_files(journal, num_files):
+    """Returns the new files of |journal| once there are |num_files| of them
+    or after a timeout. Files can be returned again if they were collected
+    while being written, so they are only counted once."""
+    new_files = set()
+    for _ in range(50):
+        new_files.update(journal.get_new_files())
+        if len(new_files) >= num_files:
+            break
+        time.sleep(.1)
+    return sorted(new_files)
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='Requires inotify.')
+def test_get_new_files_inotify(tmp_path):
+    """Tests that the journal records files written to the corpus and its new
+    subdirectories."""
+    (tmp_path / 'seed').write_text('seed')
+    journal = corpus_journal.CorpusJournal(str(tmp_path))
+    assert journal.start()
+    try:
+        assert journal.get_new_files() == [str(tmp_path / 'seed')]
+
+        (tmp_path / 'unit-1').write_text('unit')
+        (tmp_path / 'queue').mkdir()
+        (tmp_path / 'queue' / 'unit-2').write_text('unit')
+        assert _wait_for_new_files(journal, 2) == [
+            str(tmp_path / 'queue' / 'unit-2'),
+            str(tmp_path / 'unit-1'),
+        ]
+        assert not journal.get_new_files()
+    finally:
+        journal.stop()
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='Requires inotify.')
+def test_get_new_files_created_only(tmp_path):
+    """Tests that the journal records files that are created without being
+    written, such as hard links."""
+    corpus_dir = tmp_path / 'corpus'
+    corpus_dir.mkdir()
+    (tmp_path / 'unit').write_text('unit')
+    journal = corpus_journal.CorpusJournal(str(corpus_dir))
+    assert journal.start()
+    try:
+        assert not journal.get_new_files()
+        os.link(tmp_path / 'unit', corpus_dir / 'unit')
+        assert _wait_for_new_files(journal, 1) == [str(corpus_dir / 'unit')]
+        assert not journal.get_new_files()
+    finally:
+        journal.stop()
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='Requires inotify.')
+def test_get_new_files_recreated_corpus(tmp_path):
+    """Tests that the journal keeps recording files after the corpus directory
+    is deleted and created again."""
+    corpus_dir = tmp_path / 'corpus'
+    corpus_dir.mkdir()
+    journal = corpus_journal.CorpusJournal(str(corpus_dir))
+    assert journal.start()
+    try:
+        assert not journal.get_new_files()
+        shutil.rmtree(corpus_dir)
+        corpus_dir.mkdir()
+        (corpus_dir / 'unit').write_text('unit')
+        assert _wait_for_new_files(journal, 1) == [str(corpus_dir / 'unit')]
+
+        # The new corpus directory is watched.
+        for _ in range(50):
+            if journal._is_corpus_dir_watched:  # pylint: disable=protected-access
+                break
+            time.sleep(.1)
+        journal.get_new_files()
+        (corpus_dir / 'unit-2').write_text('unit')
+        assert _wait_for_new_files(journal, 1) == [str(corpus_dir / 'unit-2')]
+    finally:
+        journal.stop()
+
+
+def test_get_new_files_scan(tmp_path):
+    """Tests that the journal finds new files by scanning the corpus when it
+    isn't started."""
+    (tmp_path / 'queue').mkdir()
+    (tmp_path / 'queue' / 'seed').write_text('seed')
+    journal = corpus_journal.CorpusJournal(str(tmp_path))
+    assert journal.get_new_files() == [str(tmp_path / 'queue' / 'seed')]
+
+    old_time = time.time() - 60
+    os.utime(tmp_path / 'queue' / 'seed', (old_time, old_time))
+    (tmp_path / 'unit').write_text('unit')
+    assert journal.get_new_files() == [str(tmp_path / 'unit')]
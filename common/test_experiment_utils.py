@@ -32,3 +32,12 @@ def test_get_corpus_archive_name():
     """Tests that get_corpus_archive_name returns the expected result."""
     assert (experiment_utils.get_corpus_archive_name(9) ==
             'corpus-archive-0009.tar.gz')
+
+
+def test_time_to_cycle():
+    """Tests that time_to_cycle returns the cycle of a snapshot time, the
+    inverse of get_cycle_time."""
+    snapshot_seconds = experiment_utils.get_snapshot_seconds()
+    assert experiment_utils.time_to_cycle(
+        experiment_utils.get_cycle_time(3)) == 3
+    assert experiment_utils.time_to_cycle(snapshot_seconds - 1) == 0
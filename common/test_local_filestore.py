@@ -103,12 +103,29 @@ DST = '/dst'
 
 def test_rsync_dir_to_dir(fs):  # pylint: disable=invalid-name
     """Tests that rsync works as intended."""
-    fs.create_dir(SRC)
-    fs.create_dir(DST)
+    fs.create_file(os.path.join(SRC, 'file'), contents='new')
+    fs.create_file(os.path.join(SRC, 'dir', 'file'), contents='nested')
+    fs.create_file(os.path.join(DST, 'file'), contents='old')
+    fs.create_file(os.path.join(DST, 'stale', 'file'))
     with mock.patch('common.new_process.execute') as mocked_execute:
+        result = local_filestore.rsync(SRC, DST)
+    assert not mocked_execute.called
+    assert result.retcode == 0
+    assert sorted(os.listdir(DST)) == ['dir', 'file']
+    with open(os.path.join(DST, 'file'), encoding='utf-8') as file_handle:
+        assert file_handle.read() == 'new'
+    with open(os.path.join(DST, 'dir', 'file'),
+              encoding='utf-8') as file_handle:
+        assert file_handle.read() == 'nested'
+
+
+def test_rsync_skips_up_to_date_files(fs):  # pylint: disable=invalid-name
+    """Tests that rsync doesn't copy files again if they weren't modified."""
+    fs.create_file(os.path.join(SRC, 'file'), contents='data')
+    local_filestore.rsync(SRC, DST)
+    with mock.patch('common.local_filestore._copy_file') as mocked_copy_file:
         local_filestore.rsync(SRC, DST)
-    mocked_execute.assert_called_with(
-        ['rsync', '--delete', '-r', '/src/', '/dst'], expect_zero=True)
+    assert not mocked_copy_file.called
 
 
 def test_rsync_options(fs):  # pylint: disable=invalid-name
@@ -122,15 +139,63 @@ def test_rsync_options(fs):  # pylint: disable=invalid-name
     assert flag in mocked_execute.call_args_list[0][0][0]
 
 
-@pytest.mark.parametrize(('kwarg_for_rsync', 'flag'), [('delete', '--delete'),
-                                                       ('recursive', '-r')])
-def test_rsync_no_flag(kwarg_for_rsync, flag, fs):  # pylint: disable=invalid-name
-    """Tests that rsync works as intended when caller specifies not
-    to use specific flags."""
+def test_rsync_no_delete(fs):  # pylint: disable=invalid-name
+    """Tests that rsync keeps files missing from the source when |delete| is
+    False."""
     fs.create_dir(SRC)
-    fs.create_dir(DST)
-    kwargs_for_rsync = {}
-    kwargs_for_rsync[kwarg_for_rsync] = False
-    with mock.patch('common.new_process.execute') as mocked_execute:
-        local_filestore.rsync(SRC, DST, **kwargs_for_rsync)
-    assert flag not in mocked_execute.call_args_list[0][0][0]
+    fs.create_file(os.path.join(DST, 'file'))
+    local_filestore.rsync(SRC, DST, delete=False)
+    assert os.listdir(DST) == ['file']
+
+
+def test_rsync_no_recursive(fs):  # pylint: disable=invalid-name
+    """Tests that rsync only syncs the files at the top of the source when
+    |recursive| is False."""
+    fs.create_file(os.path.join(SRC, 'file'))
+    fs.create_file(os.path.join(SRC, 'dir', 'file'))
+    local_filestore.rsync(SRC, DST, recursive=False)
+    assert os.listdir(DST) == ['file']
+
+
+def test_cp_files(tmp_path):
+    """Tests that cp_files copies every file it can and fails if some files
+    couldn't be copied."""
+    sources = []
+    for name in ['file1', 'file2']:
+        (tmp_path / name).write_text(name)
+        sources.append(str(tmp_path / name))
+    destination_dir = tmp_path / 'destination'
+    result = local_filestore.cp_files(sources +
+                                      [str(tmp_path / 'non_exist_file')],
+                                      str(destination_dir),
+                                      expect_zero=False)
+    assert result.retcode != 0
+    assert sorted(os.listdir(destination_dir)) == ['file1', 'file2']
+    assert (destination_dir / 'file2').read_text() == 'file2'
+
+
+def test_cp_directory_not_recursive(tmp_path):
+    """Tests that cp fails to copy a directory when |recursive| is False."""
+    with pytest.raises(subprocess.CalledProcessError):
+        local_filestore.cp(str(tmp_path), str(tmp_path / 'destination'))
+
+
+def test_cp_recursive_into_dir(tmp_path):
+    """Tests that cp copies a directory into an existing directory."""
+    source_dir = tmp_path / 'source'
+    (source_dir / 'dir').mkdir(parents=True)
+    (source_dir / 'dir' / 'file').write_text('data')
+    destination_dir = tmp_path / 'destination'
+    destination_dir.mkdir()
+    local_filestore.cp(str(source_dir), str(destination_dir), recursive=True)
+    assert (destination_dir / 'source' / 'dir' / 'file').read_text() == 'data'
+
+
+def test_cat(tmp_path):
+    """Tests that cat returns the contents of a file and fails if it doesn't
+    exist."""
+    file_path = tmp_path / 'file'
+    file_path.write_text('hello')
+    assert local_filestore.cat(str(file_path)).output == 'hello'
+    assert local_filestore.cat(str(tmp_path / 'non_exist_file'),
+                               expect_zero=False).retcode != 0
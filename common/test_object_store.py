@@ -0,0 +1,87 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for object_store.py."""
+import os
+from unittest import mock
+
+import pytest
+
+from common import object_store
+
+# pylint: disable=invalid-name,redefined-outer-name,unused-argument
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Returns a FakeObjectStore in |tmp_path|."""
+    return object_store.FakeObjectStore(str(tmp_path / 'store'))
+
+
+def test_upload_and_read(store, tmp_path):
+    """Tests that uploaded files can be read, listed and deleted."""
+    file_path = tmp_path / 'file'
+    file_path.write_text('data')
+    store.upload(str(file_path), 'gs://bucket/dir/subdir/file')
+    store.upload(str(file_path), 'gs://bucket/dir/file')
+
+    assert store.exists('gs://bucket/dir/file')
+    assert not store.exists('gs://bucket/dir')
+    assert store.read('gs://bucket/dir/file') == b'data'
+    assert store.list_dir('gs://bucket/dir') == [
+        'gs://bucket/dir/file', 'gs://bucket/dir/subdir/'
+    ]
+    assert store.list_tree('gs://bucket/dir/') == [
+        'gs://bucket/dir/file', 'gs://bucket/dir/subdir/file'
+    ]
+
+    store.delete('gs://bucket/dir/subdir/file')
+    assert store.list_dir('gs://bucket/dir') == ['gs://bucket/dir/file']
+    with pytest.raises(FileNotFoundError):
+        store.read('gs://bucket/dir/subdir/file')
+
+
+def test_download_many(store, tmp_path):
+    """Tests that download_many downloads every object it can and returns the
+    errors of the others."""
+    file_path = tmp_path / 'file'
+    file_path.write_text('data')
+    assert store.upload_many([(str(file_path), 'gs://bucket/a'),
+                              (str(file_path), 'gs://bucket/b')
+                             ]) == [None, None]
+
+    errors = store.download_many([('gs://bucket/a', str(tmp_path / 'a')),
+                                  ('gs://bucket/c', str(tmp_path / 'c')),
+                                  ('gs://bucket/b', str(tmp_path / 'b'))])
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], FileNotFoundError)
+    assert (tmp_path / 'b').read_text() == 'data'
+
+
+@mock.patch('common.logs.error')
+def test_get_object_store(_, tmp_path, environ):
+    """Tests that get_object_store returns a client for the store set in the
+    environment, and None if there isn't one or if it can't be created."""
+    object_store.reset_object_store()
+    assert object_store.get_object_store() is None
+
+    os.environ['OBJECT_STORE'] = 'fake'
+    os.environ['FAKE_OBJECT_STORE_DIR'] = str(tmp_path)
+    store = object_store.get_object_store()
+    assert isinstance(store, object_store.FakeObjectStore)
+    assert object_store.get_object_store() is store
+
+    object_store.reset_object_store()
+    os.environ['OBJECT_STORE'] = 'unknown'
+    assert object_store.get_object_store() is None
+    object_store.reset_object_store()
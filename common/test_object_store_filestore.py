@@ -0,0 +1,90 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for object_store_filestore.py."""
+import os
+import subprocess
+from unittest import mock
+
+import pytest
+
+from common import filestore_utils
+from common import object_store
+from common import object_store_filestore
+
+# pylint: disable=invalid-name,redefined-outer-name,unused-argument
+
+
+@pytest.fixture
+def fake_object_store(tmp_path, use_gsutil):
+    """Makes filestore_utils use a FakeObjectStore in |tmp_path|."""
+    os.environ['OBJECT_STORE'] = 'fake'
+    os.environ['FAKE_OBJECT_STORE_DIR'] = str(tmp_path / 'store')
+    object_store.reset_object_store()
+    yield object_store.get_object_store()
+    object_store.reset_object_store()
+
+
+def test_get_impl(fake_object_store):
+    """Tests that filestore_utils uses the object store when it is set up."""
+    assert filestore_utils.get_impl() is object_store_filestore
+
+
+def test_cp_ls_cat(fake_object_store, tmp_path):
+    """Tests that files copied to the object store can be listed, read and
+    copied back without executing gsutil."""
+    file_path = tmp_path / 'file'
+    file_path.write_text('data')
+    with mock.patch('common.new_process.execute') as mocked_execute:
+        filestore_utils.cp(str(file_path), 'gs://bucket/dir/')
+        assert filestore_utils.ls('gs://bucket/dir/file').output == (
+            'gs://bucket/dir/file\n')
+        assert filestore_utils.ls('gs://bucket/dir').output == (
+            'gs://bucket/dir/file\n')
+        assert filestore_utils.cat('gs://bucket/dir/file').output == 'data'
+        filestore_utils.cp('gs://bucket/dir/file',
+                           str(tmp_path / 'new' / 'file'))
+        assert not mocked_execute.called
+    assert (tmp_path / 'new' / 'file').read_text() == 'data'
+
+
+def test_missing_objects(fake_object_store):
+    """Tests that operations on missing objects fail like gsutil's."""
+    assert filestore_utils.ls('gs://bucket/missing',
+                              must_exist=False).retcode != 0
+    with pytest.raises(subprocess.CalledProcessError):
+        filestore_utils.cat('gs://bucket/missing')
+    assert filestore_utils.rm('gs://bucket/missing', force=True).retcode != 0
+
+
+def test_cp_files_and_rm(fake_object_store, tmp_path):
+    """Tests that cp_files copies files in both directions and that rm removes
+    directories."""
+    sources = []
+    for name in ['file1', 'file2']:
+        (tmp_path / name).write_text(name)
+        sources.append(str(tmp_path / name))
+    filestore_utils.cp_files(sources, 'gs://bucket/dir')
+    filestore_utils.cp_files(['gs://bucket/dir/file1', 'gs://bucket/dir/file2'],
+                             str(tmp_path / 'downloads'))
+    assert sorted(os.listdir(tmp_path / 'downloads')) == ['file1', 'file2']
+
+    filestore_utils.rm('gs://bucket/dir')
+    assert not fake_object_store.list_tree('gs://bucket/')
+
+
+def test_rsync_uses_gsutil(fake_object_store):
+    """Tests that rsync falls back to gsutil."""
+    with mock.patch('common.new_process.execute') as mocked_execute:
+        filestore_utils.rsync('/dir', 'gs://bucket/dir')
+    assert mocked_execute.call_args_list[0][0][0][0] == 'gsutil'
@@ -0,0 +1,33 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for parallel_gzip.py."""
+import gzip
+import io
+import os
+
+import pytest
+
+from common import parallel_gzip
+
+
+@pytest.mark.parametrize('size', [0, 10, 3 * parallel_gzip.CHUNK_SIZE + 10])
+def test_parallel_gzip_writer(size):
+    """Tests that what is written to ParallelGzipWriter can be decompressed
+    with gzip."""
+    data = os.urandom(size // 2) + bytes(size - size // 2)
+    fileobj = io.BytesIO()
+    with parallel_gzip.ParallelGzipWriter(fileobj, num_threads=2) as writer:
+        for idx in range(0, size, 1000):
+            writer.write(data[idx:idx + 1000])
+    assert gzip.decompress(fileobj.getvalue()) == data
@@ -0,0 +1,28 @@
+"""add measurement indexes
+
+Revision ID: f6b4c2a1d9e3
+Revises: 8c237d2acbc4
+Create Date: 2024-06-03 10:12:41.503217
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b4c2a1d9e3'
+down_revision = '8c237d2acbc4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('snapshot_trial_id_time_idx', 'snapshot',
+                    ['trial_id', 'time'])
+    op.create_index('trial_experiment_preempted_time_started_idx', 'trial',
+                    ['experiment', 'preempted', 'time_started'])
+
+
+def downgrade():
+    op.drop_index('trial_experiment_preempted_time_started_idx',
+                  table_name='trial')
+    op.drop_index('snapshot_trial_id_time_idx', table_name='snapshot')
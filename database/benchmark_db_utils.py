@@ -0,0 +1,102 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark of saving measured snapshots with bulk_upsert_snapshots against
+saving them with add_all. Uses the database in SQL_DATABASE_URL, or an
+in-memory SQLite database if it is unset:
+
+  PYTHONPATH=. python3 database/benchmark_db_utils.py --num-cycles 200
+"""
+import argparse
+import os
+import sys
+import time
+
+if not os.getenv('SQL_DATABASE_URL'):
+    os.environ['SQL_DATABASE_URL'] = 'sqlite://'
+
+# pylint: disable=wrong-import-position
+from database import models
+from database import utils as db_utils
+
+NUM_TRIALS = 10
+EXPERIMENT = 'benchmark-db-utils'
+
+
+def create_trials():
+    """Creates the experiment and its trials and returns the ids of the
+    trials."""
+    models.Base.metadata.create_all(db_utils.engine)
+    trials = [
+        models.Trial(experiment=EXPERIMENT,
+                     fuzzer='fuzzer',
+                     benchmark='benchmark') for _ in range(NUM_TRIALS)
+    ]
+    db_utils.add_all([models.Experiment(name=EXPERIMENT)])
+    db_utils.add_all(trials)
+    return [trial.id for trial in trials]
+
+
+def get_snapshots(trial_ids, first_cycle, num_cycles):
+    """Returns snapshots with a crash for |num_cycles| cycles starting at
+    |first_cycle| for each trial in |trial_ids|."""
+    return [
+        models.Snapshot(trial_id=trial_id,
+                        time=cycle * 900,
+                        edges_covered=cycle,
+                        fuzzer_stats={'execs_per_sec': 100.0},
+                        crashes=[
+                            models.Crash(crash_key='crash',
+                                         crash_testcase='testcase',
+                                         crash_type='type',
+                                         crash_address='address',
+                                         crash_state='state',
+                                         crash_stacktrace='stack\ntrace')
+                        ])
+        for trial_id in trial_ids
+        for cycle in range(first_cycle, first_cycle + num_cycles)
+    ]
+
+
+def _time(name, function, snapshots):
+    """Saves |snapshots| with |function| and prints how many were saved per
+    second."""
+    start_time = time.time()
+    function(snapshots)
+    seconds = time.time() - start_time
+    print(f'{name}: {seconds:.2f}s, {len(snapshots) / seconds:.0f} '
+          'snapshots/s')
+
+
+def main():
+    """Times saving snapshots with add_all and bulk_upsert_snapshots."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-cycles',
+                        type=int,
+                        default=200,
+                        help='Number of snapshots saved for each trial.')
+    args = parser.parse_args()
+
+    db_utils.initialize()
+    trial_ids = create_trials()
+    print(f'{NUM_TRIALS * args.num_cycles} snapshots.')
+    _time('add_all', db_utils.add_all,
+          get_snapshots(trial_ids, 0, args.num_cycles))
+    _time('bulk_upsert_snapshots', db_utils.bulk_upsert_snapshots,
+          get_snapshots(trial_ids, args.num_cycles, args.num_cycles))
+    db_utils.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,6 +19,7 @@ from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import ForeignKeyConstraint
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import JSON
 from sqlalchemy import String
@@ -62,6 +63,9 @@ class Trial(Base):
     # columns from snapshots given a trial and vice versa.
     snapshots = sqlalchemy.orm.relationship('Snapshot', back_populates='trial')
 
+    __table_args__ = (Index('trial_experiment_preempted_time_started_idx',
+                            experiment, preempted, time_started),)
+
 
 class Snapshot(Base):
     """The value of metrics and any other state that is important for analysis
@@ -79,6 +83,8 @@ class Snapshot(Base):
         primaryjoin=
         'and_(Snapshot.time==Crash.time, Snapshot.trial_id==Crash.trial_id)')
 
+    __table_args__ = (Index('snapshot_trial_id_time_idx', trial_id, time),)
+
 
 class Crash(Base):
     """Represents crashes found in experiments."""
@@ -0,0 +1,135 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for utils.py."""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from database import models
+from database import utils as db_utils
+from experiment.measurer import datatypes as measurer_datatypes
+
+# pylint: disable=invalid-name,unused-argument,redefined-outer-name
+
+EXPERIMENT = 'experiment'
+NUM_TRIALS = 10
+
+
+@pytest.fixture
+def db_trials(db):
+    """Populates the database with an experiment and its trials and returns the
+    ids of the trials."""
+    trials = [
+        models.Trial(experiment=EXPERIMENT,
+                     fuzzer='fuzzer',
+                     benchmark='benchmark') for _ in range(NUM_TRIALS)
+    ]
+    db_utils.add_all([models.Experiment(name=EXPERIMENT)])
+    db_utils.add_all(trials)
+    return [trial.id for trial in trials]
+
+
+def _get_crash(crash_key):
+    return models.Crash(crash_key=crash_key,
+                        crash_testcase='testcase',
+                        crash_type='type',
+                        crash_address='address',
+                        crash_state='state',
+                        crash_stacktrace='stack\ntrace')
+
+
+def _get_snapshot(trial_id, snapshot_time, edges_covered, crashes=None):
+    return models.Snapshot(trial_id=trial_id,
+                           time=snapshot_time,
+                           edges_covered=edges_covered,
+                           fuzzer_stats={'execs_per_sec': 100.0},
+                           crashes=crashes or [])
+
+
+def _query_snapshots():
+    with db_utils.session_scope() as session:
+        return [(snapshot.trial_id, snapshot.time, snapshot.edges_covered,
+                 snapshot.fuzzer_stats)
+                for snapshot in session.query(models.Snapshot).order_by(
+                    models.Snapshot.trial_id, models.Snapshot.time)]
+
+
+def _query_crashes():
+    with db_utils.session_scope() as session:
+        return [(crash.trial_id, crash.time, crash.crash_key,
+                 crash.crash_stacktrace)
+                for crash in session.query(models.Crash).order_by(
+                    models.Crash.trial_id, models.Crash.crash_key)]
+
+
+def test_bulk_upsert_snapshots(db_trials):
+    """Tests that bulk_upsert_snapshots saves snapshots with their crashes."""
+    snapshots = [
+        _get_snapshot(db_trials[0], 0, 10),
+        _get_snapshot(db_trials[1], 900, 20,
+                      [_get_crash('crash-1'),
+                       _get_crash('crash-2')]),
+    ]
+    assert db_utils.bulk_upsert_snapshots(snapshots) == 2
+    assert _query_snapshots() == [
+        (db_trials[0], 0, 10, {
+            'execs_per_sec': 100.0
+        }),
+        (db_trials[1], 900, 20, {
+            'execs_per_sec': 100.0
+        }),
+    ]
+    assert _query_crashes() == [
+        (db_trials[1], 900, 'crash-1', 'stack\ntrace'),
+        (db_trials[1], 900, 'crash-2', 'stack\ntrace'),
+    ]
+
+
+def test_bulk_upsert_snapshots_existing(db_trials):
+    """Tests that bulk_upsert_snapshots overwrites snapshots that were already
+    saved, including duplicates within a batch, instead of failing."""
+    db_utils.bulk_upsert_snapshots(
+        [_get_snapshot(db_trials[0], 0, 10, [_get_crash('crash')])])
+    assert db_utils.bulk_upsert_snapshots([
+        _get_snapshot(db_trials[0], 0, 11, [_get_crash('crash')]),
+        _get_snapshot(db_trials[0], 0, 12, [_get_crash('crash')]),
+    ]) == 1
+    assert _query_snapshots() == [(db_trials[0], 0, 12, {
+        'execs_per_sec': 100.0
+    })]
+    assert _query_crashes() == [(db_trials[0], 0, 'crash', 'stack\ntrace')]
+
+
+def test_bulk_upsert_snapshots_records(db_trials):
+    """Tests that bulk_upsert_snapshots saves the plain records sent by measure
+    workers."""
+    crash = measurer_datatypes.MeasuredCrash('crash', 'testcase', 'type',
+                                             'address', 'state', 'stacktrace')
+    snapshot = measurer_datatypes.MeasuredSnapshot(900, db_trials[0], 10, None,
+                                                   [crash])
+    assert db_utils.bulk_upsert_snapshots([snapshot]) == 1
+    assert _query_snapshots() == [(db_trials[0], 900, 10, None)]
+    assert _query_crashes() == [(db_trials[0], 900, 'crash', 'stacktrace')]
+
+
+def test_get_upsert_statement_postgresql():
+    """Tests that the upsert statement used on PostgreSQL updates the snapshots
+    that already exist."""
+    statement = db_utils._get_upsert_statement(  # pylint: disable=protected-access
+        'postgresql', models.Snapshot.__table__,
+        ['edges_covered', 'fuzzer_stats'])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith('INSERT INTO snapshot ')
+    assert sql.endswith(' ON CONFLICT (time, trial_id) DO UPDATE SET '
+                        'edges_covered = excluded.edges_covered, '
+                        'fuzzer_stats = excluded.fuzzer_stats')
@@ -16,14 +16,25 @@
 import os
 import threading
 from contextlib import contextmanager
+from typing import Dict, List
 
 import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
+
+from database import models
 
 # pylint: disable=invalid-name,no-member
 engine = None
 session = None
 lock = None
 
+# Dialects with an insert supporting ON CONFLICT, by name.
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql,
+    'sqlite': sqlite,
+}
+
 
 def initialize():
     """Initialize the database for use. Sets the database engine and session.
@@ -108,3 +119,75 @@ def get_or_create(model, **kwargs):
         instance = model(**kwargs)
         scoped_session.add(instance)
         return instance
+
+
+def _get_snapshot_and_crash_rows(snapshots):
+    """Returns the rows of the snapshot and crash tables for |snapshots|. Only
+    the last snapshot and crash with the same primary key are kept, so that
+    every row is upserted once."""
+    snapshot_rows = {}
+    crash_rows = {}
+    for snapshot in snapshots:
+        snapshot_rows[(snapshot.trial_id, snapshot.time)] = {
+            'time': snapshot.time,
+            'trial_id': snapshot.trial_id,
+            'edges_covered': snapshot.edges_covered,
+            'fuzzer_stats': snapshot.fuzzer_stats,
+        }
+        for crash in snapshot.crashes:
+            crash_rows[(snapshot.trial_id, snapshot.time, crash.crash_key)] = {
+                'time': snapshot.time,
+                'trial_id': snapshot.trial_id,
+                'crash_key': crash.crash_key,
+                'crash_type': crash.crash_type,
+                'crash_address': crash.crash_address,
+                'crash_state': crash.crash_state,
+                'crash_stacktrace': crash.crash_stacktrace,
+                'crash_testcase': crash.crash_testcase,
+            }
+    return list(snapshot_rows.values()), list(crash_rows.values())
+
+
+def _get_upsert_statement(dialect_name: str, table: sqlalchemy.Table,
+                          update_columns: List[str]):
+    """Returns the statement inserting rows into |table| on the database
+    |dialect_name|, updating the |update_columns| of the rows that already
+    exist. Existing rows are left untouched if |update_columns| is empty."""
+    statement = _UPSERT_DIALECTS[dialect_name].insert(table)
+    primary_key = [column.name for column in table.primary_key]
+    if update_columns:
+        return statement.on_conflict_do_update(
+            index_elements=primary_key,
+            set_={
+                column: statement.excluded[column] for column in update_columns
+            })
+    return statement.on_conflict_do_nothing(index_elements=primary_key)
+
+
+def _upsert(connection, table: sqlalchemy.Table, rows: List[Dict],
+            update_columns: List[str]):
+    """Inserts |rows| into |table|, updating the |update_columns| of the rows
+    that already exist."""
+    if not rows:
+        return
+
+    statement = _get_upsert_statement(connection.dialect.name, table,
+                                      update_columns)
+    # Passing a list of rows makes this an executemany, which psycopg2 batches.
+    connection.execute(statement, rows)
+
+
+def bulk_upsert_snapshots(snapshots) -> int:
+    """Saves |snapshots| and their crashes to the database without going
+    through the ORM. |snapshots| can be models.Snapshot objects or plain records
+    with the same attributes. Snapshots that were already saved (e.g. because
+    their measurement was retried) are overwritten instead of failing the batch.
+    Returns the number of snapshots saved."""
+    snapshot_rows, crash_rows = _get_snapshot_and_crash_rows(snapshots)
+    with session_scope() as scoped_session:
+        connection = scoped_session.connection()
+        _upsert(connection, models.Snapshot.__table__, snapshot_rows,
+                ['edges_covered', 'fuzzer_stats'])
+        _upsert(connection, models.Crash.__table__, crash_rows, [])
+        scoped_session.commit()
+    return len(snapshot_rows)
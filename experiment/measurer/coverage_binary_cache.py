@@ -0,0 +1,218 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for a host-level cache of extracted coverage builds. Coverage build
+archives are identified by the digest of their contents, so a build is only
+extracted once per host no matter how many experiments or measure loop restarts
+use it. Extracted builds are made read-only, hardlinked into the coverage
+binaries directory and evicted least recently used first when the cache outgrows
+its budget."""
+
+import contextlib
+import fcntl
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+from typing import Optional
+
+from common import environment
+from common import filesystem
+from common import logs
+from common import utils
+
+logger = logs.Logger()  # pylint: disable=invalid-name
+
+DEFAULT_MAX_CACHE_SIZE = 20 * 1024**3  # Bytes.
+
+TREE_DIRNAME = 'tree'
+SIZE_FILENAME = 'size'
+EVICTION_LOCK_NAME = 'eviction'
+TEMP_PREFIX = '.tmp-'
+
+
+def get_cache_dir() -> str:
+    """Returns the directory of the coverage binary cache."""
+    return environment.get(
+        'COVERAGE_BINARY_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'fuzzbench',
+                     'coverage-binaries'))
+
+
+def get_max_cache_size() -> int:
+    """Returns the number of bytes the coverage binary cache can use before
+    builds are evicted."""
+    return environment.get('COVERAGE_BINARY_CACHE_SIZE', DEFAULT_MAX_CACHE_SIZE)
+
+
+def _get_tree_size(directory: str) -> int:
+    """Returns the number of bytes used by the files in |directory|."""
+    size = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            size += os.lstat(os.path.join(root, filename)).st_size
+    return size
+
+
+def _make_read_only(directory: str):
+    """Removes the write permissions of the files in |directory|, so that they
+    can't be changed in place through the directories linked to them."""
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if os.path.islink(path):
+                continue
+            mode = os.stat(path).st_mode
+            os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def _link_or_copy(source: str, destination: str):
+    """Hardlinks |source| to |destination|. Copies it if |destination| is on a
+    filesystem that can't link to |source|."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def link_tree(source_dir: str, destination_dir: str):
+    """Recreates the directories of |source_dir| in |destination_dir| and
+    hardlinks its files there. Files created in |destination_dir| later on don't
+    end up in |source_dir|."""
+    shutil.copytree(source_dir,
+                    destination_dir,
+                    symlinks=True,
+                    copy_function=_link_or_copy,
+                    dirs_exist_ok=True)
+
+
+class CoverageBinaryCache:
+    """Cache of extracted coverage build archives keyed by their SHA-1."""
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 max_size: Optional[int] = None):
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.max_size = max_size if max_size is not None else (
+            get_max_cache_size())
+
+    def _get_entry_dir(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    @contextlib.contextmanager
+    def _lock(self, name: str, blocking: bool = True):
+        """Holds an exclusive lock on |name| and yields True. Yields False
+        without waiting if |blocking| is False and the lock is held
+        elsewhere."""
+        with open(os.path.join(self.cache_dir, name + '.lock'),
+                  'w',
+                  encoding='utf-8') as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _add(self, archive_path: str, digest: str):
+        """Extracts |archive_path| into the cache entry for |digest|. The entry
+        only appears once it is complete."""
+        temp_dir = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=self.cache_dir)
+        try:
+            tree_dir = os.path.join(temp_dir, TREE_DIRNAME)
+            with tarfile.open(archive_path, 'r:gz') as tar:
+                tar.extractall(tree_dir)
+            _make_read_only(tree_dir)
+            with open(os.path.join(temp_dir, SIZE_FILENAME),
+                      'w',
+                      encoding='utf-8') as size_file:
+                size_file.write(str(_get_tree_size(tree_dir)))
+            os.rename(temp_dir, self._get_entry_dir(digest))
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+    def set_up(self, archive_path: str, destination_dir: str) -> bool:
+        """Makes the contents of the coverage build archive at |archive_path|
+        available in |destination_dir|, extracting it only if it isn't cached.
+        Returns True if the archive was cached."""
+        filesystem.create_directory(self.cache_dir)
+        digest = utils.file_hash(archive_path)
+        entry_dir = self._get_entry_dir(digest)
+        size_path = os.path.join(entry_dir, SIZE_FILENAME)
+        with self._lock(digest):
+            cached = os.path.exists(size_path)
+            if not cached:
+                self._add(archive_path, digest)
+            # The modification time of the size file records when the entry
+            # was last used.
+            os.utime(size_path)
+            link_tree(os.path.join(entry_dir, TREE_DIRNAME), destination_dir)
+        logger.info('Set up coverage build %s from %s cache entry.', digest,
+                    'existing' if cached else 'new')
+        self.evict(keep=digest)
+        return cached
+
+    def get_entries(self):
+        """Returns a list of (last used time, size, digest) tuples for the
+        complete entries of the cache."""
+        entries = []
+        for digest in os.listdir(self.cache_dir):
+            size_path = os.path.join(self._get_entry_dir(digest), SIZE_FILENAME)
+            if digest.startswith(TEMP_PREFIX) or not os.path.exists(size_path):
+                continue
+            with open(size_path, encoding='utf-8') as size_file:
+                size = int(size_file.read())
+            entries.append((os.path.getmtime(size_path), size, digest))
+        return entries
+
+    def evict(self, keep: Optional[str] = None):
+        """Removes the least recently used entries other than |keep| until the
+        cache fits in its budget. Entries in use are skipped. Directories
+        linked to an evicted entry keep working since they hold their own links
+        to its files."""
+        with self._lock(EVICTION_LOCK_NAME):
+            entries = self.get_entries()
+            cache_size = sum(size for _, size, _ in entries)
+            for _, size, digest in sorted(entries):
+                if cache_size <= self.max_size:
+                    break
+                if digest == keep:
+                    continue
+                with self._lock(digest, blocking=False) as locked:
+                    if not locked:
+                        continue
+                    shutil.rmtree(self._get_entry_dir(digest))
+                cache_size -= size
+                logger.info('Evicted coverage build %s from cache.', digest)
+
+
+def extract(archive_path: str, destination_dir: str):
+    """Makes the contents of the coverage build archive at |archive_path|
+    available in |destination_dir| through the cache. Extracts the archive
+    directly if the cache can't be used."""
+    try:
+        CoverageBinaryCache().set_up(archive_path, destination_dir)
+        return
+    except Exception:  # pylint: disable=broad-except
+        logger.error('Failed to set up %s from coverage binary cache.',
+                     archive_path)
+    # Don't extract over files linked to the cache.
+    filesystem.recreate_directory(destination_dir)
+    with tarfile.open(archive_path, 'r:gz') as tar:
+        tar.extractall(destination_dir)
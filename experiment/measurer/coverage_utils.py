@@ -13,9 +13,15 @@
 # limitations under the License.
 """Utility functions for coverage report generation."""
 
+import array
+import collections
+import glob
+import hashlib
 import os
 import json
 
+import numpy as np
+
 from common import experiment_path as exp_path
 from common import experiment_utils as exp_utils
 from common import new_process
@@ -32,6 +38,16 @@ logger = logs.Logger()  # pylint: disable=invalid-name
 
 COV_DIFF_QUEUE_GET_TIMEOUT = 1
 
+# Size of the chunks llvm-cov export files are streamed in.
+EXPORT_READ_SIZE = 1024 * 1024
+
+# Marks the start of the function records in an llvm-cov export.
+FUNCTIONS_MARKER = '"functions":['
+
+# Number of values in branch and region records of an llvm-cov export.
+BRANCH_RECORD_WIDTH = 9
+REGION_RECORD_WIDTH = 8
+
 
 def get_coverage_info_dir():
     """Returns the directory to store coverage information including
@@ -73,7 +89,7 @@ def generate_coverage_report(experiment, benchmark, fuzzer, region_coverage):
         # Generate the coverage summary json file based on merged profdata file.
         coverage_reporter.generate_coverage_summary_json()
 
-        # Generate the coverage branches json file.
+        # Generate the coverage branches json and npz files.
         coverage_reporter.generate_coverage_branches_json()
 
         # Generates the html reports using llvm-cov.
@@ -125,11 +141,9 @@ class CoverageReporter:  # pylint: disable=too-many-instance-attributes
 
         files_to_merge = []
         for trial_id in self.trial_ids:
-            profdata_file = TrialCoverage(self.fuzzer, self.benchmark,
-                                          trial_id).profdata_file
-            if not os.path.exists(profdata_file):
-                continue
-            files_to_merge.append(profdata_file)
+            trial_coverage = TrialCoverage(self.fuzzer, self.benchmark,
+                                           trial_id)
+            files_to_merge.extend(trial_coverage.get_profile_files())
 
         result = merge_profdata_files(files_to_merge, self.merged_profdata_file)
         if result.retcode != 0:
@@ -173,21 +187,39 @@ class CoverageReporter:  # pylint: disable=too-many-instance-attributes
         filestore_utils.cp(src_dir, dst_dir, recursive=True, parallel=True)
 
     def generate_coverage_branches_json(self):
-        """Stores the coverage data in a json file."""
+        """Stores the coverage data in a json file and in a much smaller npz
+        file, which reports read instead when it exists."""
         if self.region_coverage:
             edges_covered = extract_covered_regions_from_summary_json(
                 self.merged_summary_json_file)
         else:
             edges_covered = extract_covered_branches_from_summary_json(
                 self.merged_summary_json_file)
-        coverage_json_src = os.path.join(self.data_dir, 'covered_branches.json')
-        coverage_json_dst = exp_path.filestore(coverage_json_src)
         filesystem.create_directory(self.data_dir)
+        coverage_json_src = os.path.join(
+            self.data_dir, exp_utils.COVERED_BRANCHES_JSON_FILENAME)
         with open(coverage_json_src, 'w', encoding='utf-8') as file_handle:
-            json.dump(edges_covered, file_handle)
-        filestore_utils.cp(coverage_json_src,
-                           coverage_json_dst,
-                           expect_zero=False)
+            json.dump(edges_covered.tolist(), file_handle)
+        coverage_npz_src = os.path.join(self.data_dir,
+                                        exp_utils.COVERED_BRANCHES_NPZ_FILENAME)
+        write_covered_branches_npz(edges_covered, coverage_npz_src)
+        filestore_utils.cp_files([coverage_json_src, coverage_npz_src],
+                                 exp_path.filestore(self.data_dir),
+                                 expect_zero=False)
+
+
+def write_covered_branches_npz(covered_branches, npz_file):
+    """Writes the rows of |covered_branches| to |npz_file| compactly. Rows are
+    sorted and stored column by column in the smallest integer type that fits
+    them, so that compression shrinks the columns of line and file numbers
+    that barely change from one row to the next."""
+    covered_branches = np.asarray(covered_branches, dtype=np.uint64)
+    covered_branches = covered_branches[np.lexsort(covered_branches.T[::-1])]
+    max_value = int(covered_branches.max()) if covered_branches.size else 0
+    np.savez_compressed(npz_file,
+                        branches=np.asfortranarray(
+                            covered_branches.astype(
+                                np.min_scalar_type(max_value))))
 
 
 def get_coverage_archive_name(benchmark):
@@ -256,6 +288,37 @@ class TrialCoverage:  # pylint: disable=too-many-instance-attributes
         # Store the profdata file for the current trial.
         self.profdata_file = os.path.join(self.report_dir, 'data.profdata')
 
+        # Store the profdata (or profraw) files of each measured cycle of the
+        # trial when measuring incrementally. These are only merged when
+        # generating the final coverage reports.
+        self.profdata_dir = os.path.join(self.report_dir, 'profdata')
+
+        # Store the ids of every branch (or region) covered by the trial so far.
+        self.covered_ids_file = os.path.join(self.report_dir, 'covered_ids.npy')
+
+    def get_profdata_file(self, cycle: int) -> str:
+        """Returns the path of the profdata file saved for |cycle|."""
+        return os.path.join(
+            self.profdata_dir,
+            exp_utils.get_cycle_filename('data', cycle) + '.profdata')
+
+    def get_profraw_file(self, cycle: int, index: int = 0) -> str:
+        """Returns the path of the |index|th profraw file saved for |cycle|."""
+        filename = exp_utils.get_cycle_filename('data', cycle)
+        if index:
+            filename += f'-{index}'
+        return os.path.join(self.profdata_dir, filename + '.profraw')
+
+    def get_profile_files(self):
+        """Returns the profdata and profraw files saved for all measured
+        cycles."""
+        profile_files = sorted(
+            glob.glob(os.path.join(self.profdata_dir, '*.profdata')) +
+            glob.glob(os.path.join(self.profdata_dir, '*.profraw')))
+        if os.path.exists(self.profdata_file):
+            profile_files.append(self.profdata_file)
+        return profile_files
+
 
 def generate_json_summary(coverage_binary,
                           profdata_file,
@@ -286,56 +349,199 @@ def generate_json_summary(coverage_binary,
     return result
 
 
+def iter_exported_functions(coverage_export_file):
+    """Yields the function records of the llvm-cov export in
+    |coverage_export_file| one at a time. Unlike get_coverage_infomation, this
+    never holds more than one function record and a read buffer in memory, which
+    matters for the full exports of large benchmarks."""
+    decoder = json.JSONDecoder()
+    with open(coverage_export_file, encoding='utf-8') as export:
+        # Skip the files section (and any warnings before the json) without
+        # decoding it. The marker can't occur inside a json string because its
+        # quotes would be escaped.
+        buffer = ''
+        while True:
+            chunk = export.read(EXPORT_READ_SIZE)
+            if not chunk:
+                raise ValueError('No functions found in coverage export.')
+            buffer += chunk
+            marker_index = buffer.find(FUNCTIONS_MARKER)
+            if marker_index != -1:
+                buffer = buffer[marker_index + len(FUNCTIONS_MARKER):]
+                break
+            buffer = buffer[-len(FUNCTIONS_MARKER):]
+
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+            try:
+                function_data, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # The record is incomplete. Read at least as much as is
+                # buffered so that large records are only decoded a few times.
+                chunk = export.read(max(EXPORT_READ_SIZE, len(buffer)))
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+            yield function_data
+            buffer = buffer[end:]
+
+
+CoverageExport = collections.namedtuple(
+    'CoverageExport',
+    ['branches', 'branch_files', 'regions', 'region_files', 'filenames'])
+
+
+def _records_to_array(records, width=None):
+    """Returns |records| as an array, with |width| columns if specified."""
+    values = np.frombuffer(records, dtype=np.uint64)
+    if width is None:
+        return values
+    return values.reshape(-1, width)
+
+
+def parse_coverage_export(coverage_export_file) -> CoverageExport:
+    """Parses the branch and region records of |coverage_export_file| into
+    arrays while streaming it. Branch records are [line_start, column_start,
+    line_end, column_end, true_count, false_count, file_id, expanded_file_id,
+    kind] and region records are [line_start, column_start, line_end,
+    column_end, count, file_id, expanded_file_id, kind]. |branch_files| and
+    |region_files| index into |filenames| for each record."""
+    branches = array.array('Q')
+    branch_files = array.array('Q')
+    regions = array.array('Q')
+    region_files = array.array('Q')
+    file_ids = {}
+    for function_data in iter_exported_functions(coverage_export_file):
+        function_file_ids = [
+            file_ids.setdefault(filename, len(file_ids))
+            for filename in function_data['filenames']
+        ]
+        for branch in function_data['branches']:
+            if len(branch) != BRANCH_RECORD_WIDTH:
+                raise ValueError(f'Unexpected branch record: {branch}.')
+            branches.extend(branch)
+            branch_files.append(function_file_ids[branch[6]])
+        for region in function_data['regions']:
+            if len(region) != REGION_RECORD_WIDTH:
+                raise ValueError(f'Unexpected region record: {region}.')
+            regions.extend(region)
+            region_files.append(function_file_ids[region[5]])
+
+    return CoverageExport(_records_to_array(branches, BRANCH_RECORD_WIDTH),
+                          _records_to_array(branch_files),
+                          _records_to_array(regions, REGION_RECORD_WIDTH),
+                          _records_to_array(region_files), list(file_ids))
+
+
+def _get_covered_branches_mask(branches):
+    """Returns a mask of the covered records in |branches|."""
+    # The fourth and the fifth item tell whether the branch is evaluated to
+    # true or false respectively. The last number in the branch-list indicates
+    # what type of the region it is; 'branch_region' is represented by number 4.
+    return (branches[:, 4] != 0) | ((branches[:, 5] != 0) &
+                                    (branches[:, -1] == 4))
+
+
+def _get_covered_regions_mask(regions):
+    """Returns a mask of the covered code regions in |regions|."""
+    # The fourth number in the region-list indicates if the region is hit. The
+    # last number in the region-list indicates what type of the region it is;
+    # 'code_region' is used to obtain various code coverage statistic and is
+    # represented by number 0.
+    return (regions[:, 4] != 0) & (regions[:, -1] == 0)
+
+
 def extract_covered_branches_from_summary_json(summary_json_file):
-    """Returns the covered branches given a coverage summary json file."""
-    covered_branches = []
+    """Returns the covered branches given a coverage summary json file. Each row
+    is a branch record without its counts."""
     try:
-        coverage_info = get_coverage_infomation(summary_json_file)
-        functions_data = coverage_info['data'][0]['functions']
-
-        # The fourth and the fifth item tell whether the branch is evaluated to
-        # true or false respectively.
-        hit_true_index = 4
-        hit_false_index = 5
-        # The last number in the branch-list indicates what type of the
-        # region it is; 'branch_region' is represented by number 4.
-        type_index = -1
-        branch_region_type = 4
-        # The number of index 6 represents the file number.
-        file_index = 6
-        for function_data in functions_data:
-            for branch in function_data['branches']:
-                if branch[hit_true_index] != 0 or branch[
-                        hit_false_index] != 0 and branch[
-                            type_index] == branch_region_type:
-                    covered_branches.append(branch[:hit_true_index] +
-                                            branch[file_index:])
-
+        branches = parse_coverage_export(summary_json_file).branches
+        # Drop the counts; index 6 onwards is the file number, the expanded
+        # file number and the type.
+        covered_branches = branches[_get_covered_branches_mask(branches)]
+        return covered_branches[:, [0, 1, 2, 3, 6, 7, 8]]
     except Exception:  # pylint: disable=broad-except
         logger.error('Coverage summary json file defective or missing.')
-    return covered_branches
+    return np.empty((0, BRANCH_RECORD_WIDTH - 2), dtype=np.uint64)
 
 
 def extract_covered_regions_from_summary_json(summary_json_file):
-    """Returns the covered regions given a coverage summary json file."""
-    covered_regions = []
+    """Returns the covered regions given a coverage summary json file. Each row
+    is a region record without its count."""
     try:
-        coverage_info = get_coverage_infomation(summary_json_file)
-        functions_data = coverage_info['data'][0]['functions']
-        # The fourth number in the region-list indicates if the region
-        # is hit.
-        hit_index = 4
-        # The last number in the region-list indicates what type of the
-        # region it is; 'code_region' is used to obtain various code
-        # coverage statistic and is represented by number 0.
-        type_index = -1
-        # The number of index 5 represents the file number.
-        file_index = 5
-        for function_data in functions_data:
-            for region in function_data['regions']:
-                if region[hit_index] != 0 and region[type_index] == 0:
-                    covered_regions.append(region[:hit_index] +
-                                           region[file_index:])
+        regions = parse_coverage_export(summary_json_file).regions
+        # Drop the count; index 5 onwards is the file number, the expanded file
+        # number and the type.
+        covered_regions = regions[_get_covered_regions_mask(regions)]
+        return covered_regions[:, [0, 1, 2, 3, 5, 6, 7]]
+    except Exception:  # pylint: disable=broad-except
+        logger.error('Coverage summary json file defective or missing.')
+    return np.empty((0, REGION_RECORD_WIDTH - 1), dtype=np.uint64)
+
+
+def get_coverage_id(filename, location, side=0):
+    """Returns a stable 64-bit id for the branch |side| or region at
+    |location| in |filename|. Branches and regions are identified by their
+    source location so that template instantiations sharing a location are only
+    counted once."""
+    key = f'{filename}:{":".join(map(str, location))}:{side}'
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def extract_covered_ids_from_summary_json(summary_json_file,
+                                          region_coverage=False):
+    """Returns a sorted array of the ids of the covered branch sides (or
+    code regions if |region_coverage|) in a coverage summary json file."""
+    covered_ids = set()
+    try:
+        coverage_export = parse_coverage_export(summary_json_file)
+        filenames = coverage_export.filenames
+        if region_coverage:
+            # Only code regions (type 0) are counted.
+            regions = coverage_export.regions
+            covered = _get_covered_regions_mask(regions)
+            for region, file_id in zip(
+                    regions[covered].tolist(),
+                    coverage_export.region_files[covered].tolist()):
+                covered_ids.add(get_coverage_id(filenames[file_id], region[:4]))
+        else:
+            # Each side of a branch region (type 4) is counted separately, like
+            # llvm-cov does.
+            branches = coverage_export.branches
+            branch_regions = branches[:, -1] == 4
+            for branch, file_id in zip(
+                    branches[branch_regions].tolist(),
+                    coverage_export.branch_files[branch_regions].tolist()):
+                for side, hit_index in enumerate((4, 5)):
+                    if branch[hit_index] != 0:
+                        covered_ids.add(
+                            get_coverage_id(filenames[file_id], branch[:4],
+                                            side))
     except Exception:  # pylint: disable=broad-except
         logger.error('Coverage summary json file defective or missing.')
-    return covered_regions
+    return np.array(sorted(covered_ids), dtype=np.uint64)
+
+
+def load_covered_ids(covered_ids_file):
+    """Returns the ids stored in |covered_ids_file| or an empty array if it
+    doesn't exist."""
+    if not os.path.exists(covered_ids_file):
+        return np.array([], dtype=np.uint64)
+    return np.load(covered_ids_file)
+
+
+def update_covered_ids(covered_ids_file, new_covered_ids):
+    """Adds |new_covered_ids| to the ids stored in |covered_ids_file| and
+    returns the number of ids covered in total."""
+    covered_ids = np.union1d(load_covered_ids(covered_ids_file),
+                             new_covered_ids).astype(np.uint64)
+    # Write to a temporary file first so that a crash can't leave a partially
+    # written file behind.
+    temp_file = covered_ids_file + '.tmp.npy'
+    np.save(temp_file, covered_ids)
+    os.replace(temp_file, covered_ids_file)
+    return len(covered_ids)
@@ -19,3 +19,15 @@ SnapshotMeasureRequest = collections.namedtuple(
 
 RetryRequest = collections.namedtuple(
     'RetryRequest', ['fuzzer', 'benchmark', 'trial_id', 'cycle'])
+
+# Plain data counterparts of models.Snapshot and models.Crash. Measure workers
+# send these to the manager since they are much cheaper to pickle than ORM
+# objects.
+MeasuredCrash = collections.namedtuple('MeasuredCrash', [
+    'crash_key', 'crash_testcase', 'crash_type', 'crash_address', 'crash_state',
+    'crash_stacktrace'
+])
+
+MeasuredSnapshot = collections.namedtuple(
+    'MeasuredSnapshot',
+    ['time', 'trial_id', 'edges_covered', 'fuzzer_stats', 'crashes'])
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Module for measuring snapshots from trial runners."""
+# pylint: disable=too-many-lines
 
 import collections
 import gc
@@ -26,7 +27,7 @@ import sys
 import tempfile
 import tarfile
 import time
-from typing import List
+from typing import List, Optional
 import queue
 import psutil
 
@@ -34,6 +35,7 @@ from sqlalchemy import func
 from sqlalchemy import orm
 
 from common import benchmark_utils
+from common import corpus_blob_store
 from common import experiment_utils
 from common import experiment_path as exp_path
 from common import filesystem
@@ -44,10 +46,15 @@ from common import utils
 from database import utils as db_utils
 from database import models
 from experiment.build import build_utils
+from experiment.measurer import coverage_binary_cache
 from experiment.measurer import coverage_utils
 from experiment.measurer import measure_worker
+from experiment.measurer import measurement_cursor
+from experiment.measurer import native_coverage
+from experiment.measurer import request_scheduler
 from experiment.measurer import run_coverage
 from experiment.measurer import run_crashes
+from experiment.measurer import unit_coverage_cache
 from experiment import scheduler
 import experiment.measurer.datatypes as measurer_datatypes
 
@@ -59,6 +66,10 @@ FAIL_WAIT_SECONDS = 30
 SNAPSHOT_QUEUE_GET_TIMEOUT = 1
 SNAPSHOTS_BATCH_SAVE_SIZE = 100
 MEASUREMENT_LOOP_WAIT = 10
+# Number of measurement requests per worker that are kept in the request queue.
+# The other requests are held back by the request scheduler so that they can
+# be reprioritized on every iteration of the measure manager loop.
+REQUEST_QUEUE_DEPTH_PER_WORKER = 4
 
 
 def exists_in_experiment_filestore(path: pathlib.Path) -> bool:
@@ -77,8 +88,13 @@ def measure_main(experiment_config):
     max_total_time = experiment_config['max_total_time']
     measurers_cpus = experiment_config['measurers_cpus']
     region_coverage = experiment_config['region_coverage']
+    # Configs of experiments started before these options existed don't have
+    # them.
+    corpus_format = experiment_config.get('corpus_format',
+                                          corpus_blob_store.TARBALL_FORMAT)
+    incremental_coverage = experiment_config.get('incremental_coverage', False)
     measure_manager_loop(experiment, max_total_time, measurers_cpus,
-                         region_coverage)
+                         region_coverage, corpus_format, incremental_coverage)
 
     # Clean up resources.
     gc.collect()
@@ -147,7 +163,7 @@ def measure_all_trials(experiment: str, max_total_time: int, pool,
     if not exists_in_experiment_filestore(experiment_folders_dir):
         return True
 
-    max_cycle = _time_to_cycle(max_total_time)
+    max_cycle = experiment_utils.time_to_cycle(max_total_time)
     unmeasured_snapshots = get_unmeasured_snapshots(experiment, max_cycle)
 
     if not unmeasured_snapshots:
@@ -173,7 +189,7 @@ def measure_all_trials(experiment: str, max_total_time: int, pool,
         if not snapshots:
             return
 
-        db_utils.add_all(snapshots)
+        db_utils.bulk_upsert_snapshots(snapshots)
         snapshots.clear()
         nonlocal snapshots_measured
         snapshots_measured = True
@@ -208,11 +224,6 @@ def measure_all_trials(experiment: str, max_total_time: int, pool,
     return snapshots_measured
 
 
-def _time_to_cycle(time_in_seconds: float) -> int:
-    """Converts |time_in_seconds| to the corresponding cycle and returns it."""
-    return time_in_seconds // experiment_utils.get_snapshot_seconds()
-
-
 def _query_ids_of_measured_trials(experiment: str):
     """Returns a query of the ids of trials in |experiment| that have measured
     snapshots."""
@@ -291,7 +302,7 @@ def _get_unmeasured_next_snapshots(
     next_snapshots = []
     for snapshot in latest_snapshot_query:
         snapshot_time = snapshot.time
-        cycle = _time_to_cycle(snapshot_time)
+        cycle = experiment_utils.time_to_cycle(snapshot_time)
         next_cycle = cycle + 1
         if next_cycle > max_cycle:
             continue
@@ -352,8 +363,13 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
     trial."""
 
     # pylint: disable=too-many-arguments
-    def __init__(self, fuzzer: str, benchmark: str, trial_num: int,
-                 trial_logger: logs.Logger, region_coverage: bool):
+    def __init__(self,
+                 fuzzer: str,
+                 benchmark: str,
+                 trial_num: int,
+                 trial_logger: logs.Logger,
+                 region_coverage: bool,
+                 incremental_coverage: bool = False):
         super().__init__(fuzzer, benchmark, trial_num)
         self.logger = trial_logger
         self.corpus_dir = os.path.join(self.measurement_dir, 'corpus')
@@ -367,9 +383,6 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
         self.profraw_file_pattern = os.path.join(self.coverage_dir,
                                                  'data-%m.profraw')
 
-        # Store the profdata file for the current trial.
-        self.profdata_file = os.path.join(self.report_dir, 'data.profdata')
-
         # Store the coverage information in json form.
         self.cov_summary_file = os.path.join(self.report_dir,
                                              'cov_summary.json')
@@ -377,6 +390,11 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
         # Use region coverage as coverage metric instead of branch (default)
         self.region_coverage = region_coverage
 
+        # Only measure the new units of each cycle and keep the ids of the
+        # covered branches (or regions) instead of merging the profdata of the
+        # whole trial and exporting it with llvm-cov.
+        self.incremental_coverage = incremental_coverage
+
     def get_profraw_files(self):
         """Return generated profraw files."""
         return [
@@ -390,10 +408,18 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
         for directory in [self.corpus_dir, self.coverage_dir, self.crashes_dir]:
             filesystem.recreate_directory(directory)
         filesystem.create_directory(self.report_dir)
+        # When measuring incrementally, the coverage summary is only generated
+        # when the coverage can't be measured natively, don't leave the one of
+        # a previous cycle around.
+        if self.incremental_coverage and os.path.exists(self.cov_summary_file):
+            os.remove(self.cov_summary_file)
 
     def run_cov_new_units(self):
         """Run the coverage binary on new units."""
         coverage_binary = coverage_utils.get_coverage_binary(self.benchmark)
+        if not coverage_binary:
+            self.logger.error('Coverage binary not found.')
+            return
         run_coverage.do_coverage_run(coverage_binary, self.corpus_dir,
                                      self.profraw_file_pattern,
                                      self.crashes_dir)
@@ -415,7 +441,10 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
                     'Coverage summary json file generation failed in the end.')
 
     def get_current_coverage(self) -> int:
-        """Get the current number of lines covered."""
+        """Get the current number of branches (or regions) covered."""
+        if self.incremental_coverage:
+            return self.get_current_covered_ids_count()
+
         if not os.path.exists(self.cov_summary_file):
             self.logger.warning('No coverage summary json file found.')
             return 0
@@ -435,10 +464,57 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
                 'Coverage summary json file defective or missing.')
             return 0
 
+    def get_current_covered_ids_count(self) -> int:
+        """Get the number of distinct branches (or regions) covered according
+        to |covered_ids_file|."""
+        if not os.path.exists(self.covered_ids_file):
+            self.logger.warning('No covered ids file found.')
+            return 0
+        try:
+            return len(coverage_utils.load_covered_ids(self.covered_ids_file))
+        except Exception:  # pylint: disable=broad-except
+            self.logger.error('Covered ids file defective.')
+            return 0
+
+    def update_covered_ids_natively(self, profraw_files) -> bool:
+        """Adds the branches (or regions) covered according to |profraw_files|
+        to the ones covered by the trial so far without using llvm-profdata and
+        llvm-cov. Returns False if the coverage can't be measured natively."""
+        coverage_binary = coverage_utils.get_coverage_binary(self.benchmark)
+        coverage_mapping = native_coverage.get_coverage_mapping(coverage_binary)
+        if not coverage_mapping:
+            return False
+        try:
+            new_covered_ids = coverage_mapping.get_covered_ids(
+                profraw_files, self.region_coverage)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.error('Failed to read profraw files natively.')
+            return False
+        coverage_utils.update_covered_ids(self.covered_ids_file,
+                                          new_covered_ids)
+        return True
+
+    def save_profraw_files(self, profraw_files, cycle: int):
+        """Keeps the .profraw files of |cycle| around for the final coverage
+        report."""
+        filesystem.create_directory(self.profdata_dir)
+        for index, profraw_file in enumerate(sorted(profraw_files)):
+            os.replace(profraw_file, self.get_profraw_file(cycle, index))
+
+    def update_covered_ids(self):
+        """Adds the branches (or regions) covered by the units of this cycle to
+        the ones covered by the trial so far."""
+        new_covered_ids = coverage_utils.extract_covered_ids_from_summary_json(
+            self.cov_summary_file, self.region_coverage)
+        coverage_utils.update_covered_ids(self.covered_ids_file,
+                                          new_covered_ids)
+
     def generate_profdata(self, cycle: int):
-        """Generate .profdata file from .profraw file."""
+        """Generate .profdata file from .profraw file. When measuring
+        incrementally, only the new units are merged, the coverage of previous
+        cycles is kept in |covered_ids_file| instead."""
         files_to_merge = self.get_profraw_files()
-        if os.path.isfile(self.profdata_file):
+        if not self.incremental_coverage and os.path.isfile(self.profdata_file):
             # If coverage profdata exists, then merge it with
             # existing available data.
             files_to_merge += [self.profdata_file]
@@ -449,13 +525,27 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
             self.logger.error(
                 'Coverage profdata generation failed for cycle: %d.', cycle)
 
+    def save_profdata(self, cycle: int):
+        """Keeps the .profdata file of |cycle| around for the final coverage
+        report."""
+        filesystem.create_directory(self.profdata_dir)
+        os.replace(self.profdata_file, self.get_profdata_file(cycle))
+
     def generate_coverage_information(self, cycle: int):
-        """Generate the .profdata file and then transform it into
-        json summary."""
-        if not self.get_profraw_files():
+        """Generate the .profdata file and then transform it into json summary.
+        When measuring incrementally, the covered branches (or regions) are
+        updated with the .profraw files of |cycle| instead, reading the counters
+        natively when possible."""
+        profraw_files = self.get_profraw_files()
+        if not profraw_files:
             self.logger.error('No valid profraw files found for cycle: %d.',
                               cycle)
             return
+        if self.incremental_coverage and self.update_covered_ids_natively(
+                profraw_files):
+            self.save_profraw_files(profraw_files, cycle)
+            return
+
         self.generate_profdata(cycle)
 
         if not os.path.exists(self.profdata_file):
@@ -465,6 +555,43 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
             self.logger.error('Empty profdata file found for cycle: %d.', cycle)
             return
         self.generate_summary(cycle)
+        if self.incremental_coverage:
+            self.update_covered_ids()
+            self.save_profdata(cycle)
+
+    def measure_new_units(self, cycle: int):
+        """Run the coverage binary on the new units and generate the coverage
+        information for |cycle|. The first cycle of every trial measures the
+        same seed corpus, so its coverage is shared with the other trials of the
+        benchmark through the unit coverage cache."""
+        if cycle != 0:
+            self.run_cov_new_units()
+            self.generate_coverage_information(cycle)
+            return
+
+        cache = unit_coverage_cache.UnitCoverageCache(self.benchmark)
+        units_key = unit_coverage_cache.get_units_key(self.corpus_dir)
+        with cache.lock(units_key):
+            if cache.restore(units_key, self.report_dir):
+                return
+
+            self.run_cov_new_units()
+            self.generate_coverage_information(cycle)
+            if os.listdir(self.crashes_dir):
+                # Crashes need to be processed for each trial, so don't let
+                # other trials skip running these units.
+                return
+            cache.store(units_key, self.report_dir, self.get_cached_files())
+
+    def get_cached_files(self):
+        """Returns the files holding the coverage of the units measured so far,
+        which are shared with the other trials through the unit coverage
+        cache."""
+        if not self.incremental_coverage:
+            return [self.profdata_file, self.cov_summary_file]
+        if not os.path.exists(self.covered_ids_file):
+            return []
+        return [self.covered_ids_file] + self.get_profile_files()
 
     def extract_corpus(self, corpus_archive_path) -> bool:
         """Extract the corpus archive for this cycle if it exists."""
@@ -489,8 +616,9 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
         filestore_utils.cp(archive_path, archive_filestore_path)
         os.remove(archive_path)
 
-    def process_crashes(self, cycle):
-        """Process and store crashes."""
+    def process_crashes(self, cycle, num_crash_workers=1):
+        """Process and store crashes, reproducing |num_crash_workers| at a
+        time."""
         is_bug_benchmark = benchmark_utils.get_type(self.benchmark) == 'bug'
         if not is_bug_benchmark:
             return []
@@ -505,16 +633,19 @@ class SnapshotMeasurer(coverage_utils.TrialCoverage):  # pylint: disable=too-man
         logs.info('Processing crashes for cycle %d.', cycle)
         app_binary = coverage_utils.get_coverage_binary(self.benchmark)
         crash_metadata = run_crashes.do_crashes_run(app_binary,
-                                                    self.crashes_dir)
+                                                    self.crashes_dir,
+                                                    self.benchmark,
+                                                    num_crash_workers)
         crashes = []
         for crash_key, crash in crash_metadata.items():
             crashes.append(
-                models.Crash(crash_key=crash_key,
-                             crash_testcase=crash.crash_testcase,
-                             crash_type=crash.crash_type,
-                             crash_address=crash.crash_address,
-                             crash_state=crash.crash_state,
-                             crash_stacktrace=crash.crash_stacktrace))
+                measurer_datatypes.MeasuredCrash(
+                    crash_key=crash_key,
+                    crash_testcase=crash.crash_testcase,
+                    crash_type=crash.crash_type,
+                    crash_address=crash.crash_address,
+                    crash_state=crash.crash_state,
+                    crash_stacktrace=crash.crash_stacktrace))
         return crashes
 
     def get_fuzzer_stats(self, cycle):
@@ -544,7 +675,7 @@ def get_fuzzer_stats(stats_filestore_path):
 
 def measure_trial_coverage(measure_req, max_cycle: int,
                            multiprocessing_queue: multiprocessing.Queue,
-                           region_coverage) -> models.Snapshot:
+                           region_coverage):
     """Measure the coverage obtained by |trial_num| on |benchmark| using
     |fuzzer|."""
     initialize_logs()
@@ -571,11 +702,49 @@ def measure_trial_coverage(measure_req, max_cycle: int,
     logger.debug('Done measuring trial: %d.', measure_req.trial_id)
 
 
-def measure_snapshot_coverage(  # pylint: disable=too-many-locals
-        fuzzer: str, benchmark: str, trial_num: int, cycle: int,
-        region_coverage: bool) -> models.Snapshot:
+def save_coverage_archive(snapshot_measurer: SnapshotMeasurer,
+                          cycle: int) -> bool:
+    """Compresses the coverage summary of |cycle| and saves it to the
+    filestore."""
+    coverage_archive_zipped = os.path.join(
+        snapshot_measurer.trial_dir, 'coverage',
+        experiment_utils.get_coverage_archive_name(cycle) + '.gz')
+
+    coverage_archive_dir = os.path.dirname(coverage_archive_zipped)
+    if not os.path.exists(coverage_archive_dir):
+        os.makedirs(coverage_archive_dir)
+
+    with gzip.open(str(coverage_archive_zipped), 'wb') as compressed:
+        with open(snapshot_measurer.cov_summary_file, 'rb') as uncompressed:
+            # avoid saving warnings so we can direct import with pandas
+            compressed.write(uncompressed.readlines()[-1])
+
+    coverage_archive_dst = exp_path.filestore(coverage_archive_zipped)
+    if filestore_utils.cp(coverage_archive_zipped,
+                          coverage_archive_dst,
+                          expect_zero=False).retcode:
+        return False
+
+    os.remove(coverage_archive_zipped)  # no reason to keep this around
+    return True
+
+
+def measure_snapshot_coverage(  # pylint: disable=too-many-locals,too-many-arguments
+    fuzzer: str,
+    benchmark: str,
+    trial_num: int,
+    cycle: int,
+    region_coverage: bool,
+    corpus_format: str = corpus_blob_store.TARBALL_FORMAT,
+    incremental_coverage: bool = False,
+    num_crash_workers: int = 1) -> Optional[
+        measurer_datatypes.MeasuredSnapshot]:
     """Measure coverage of the snapshot for |cycle| for |trial_num| of |fuzzer|
-    and |benchmark|."""
+    and |benchmark|. |corpus_format| is the format the runner saved the corpus
+    snapshot in. If |incremental_coverage|, the coverage is the number of
+    distinct branches (or regions) covered by the units measured so far instead
+    of the llvm-cov totals of the trial. |num_crash_workers| crashes are
+    reproduced at a time."""
     snapshot_logger = logs.Logger(
         default_extras={
             'fuzzer': fuzzer,
@@ -584,7 +753,8 @@ def measure_snapshot_coverage(  # pylint: disable=too-many-locals
             'cycle': str(cycle),
         })
     snapshot_measurer = SnapshotMeasurer(fuzzer, benchmark, trial_num,
-                                         snapshot_logger, region_coverage)
+                                         snapshot_logger, region_coverage,
+                                         incremental_coverage)
 
     measuring_start_time = time.time()
     snapshot_logger.info('Measuring cycle: %d.', cycle)
@@ -598,57 +768,53 @@ def measure_snapshot_coverage(  # pylint: disable=too-many-locals
     if not os.path.exists(corpus_archive_dir):
         os.makedirs(corpus_archive_dir)
 
-    if filestore_utils.cp(corpus_archive_src,
-                          corpus_archive_dst,
-                          expect_zero=False).retcode:
+    if corpus_format == corpus_blob_store.BLOBS_FORMAT:
+        snapshot_measurer.initialize_measurement_dirs()
+        if not corpus_blob_store.fetch_units(benchmark, corpus_archive_dir,
+                                             cycle,
+                                             snapshot_measurer.corpus_dir):
+            snapshot_logger.warning('Corpus not found for cycle: %d.', cycle)
+            return None
+    elif filestore_utils.cp(corpus_archive_src,
+                            corpus_archive_dst,
+                            expect_zero=False).retcode:
         snapshot_logger.warning('Corpus not found for cycle: %d.', cycle)
         return None
-
-    snapshot_measurer.initialize_measurement_dirs()
-    snapshot_measurer.extract_corpus(corpus_archive_dst)
-    # Don't keep corpus archives around longer than they need to be.
-    os.remove(corpus_archive_dst)
-
-    # Run coverage on the new corpus units.
-    snapshot_measurer.run_cov_new_units()
-
-    # Generate profdata and transform it into json form.
-    snapshot_measurer.generate_coverage_information(cycle)
-
-    # Compress and save the exported profdata snapshot.
-    coverage_archive_zipped = os.path.join(
-        snapshot_measurer.trial_dir, 'coverage',
-        experiment_utils.get_coverage_archive_name(cycle) + '.gz')
-
-    coverage_archive_dir = os.path.dirname(coverage_archive_zipped)
-    if not os.path.exists(coverage_archive_dir):
-        os.makedirs(coverage_archive_dir)
-
-    with gzip.open(str(coverage_archive_zipped), 'wb') as compressed:
-        with open(snapshot_measurer.cov_summary_file, 'rb') as uncompressed:
-            # avoid saving warnings so we can direct import with pandas
-            compressed.write(uncompressed.readlines()[-1])
-
-    coverage_archive_dst = exp_path.filestore(coverage_archive_zipped)
-    if filestore_utils.cp(coverage_archive_zipped,
-                          coverage_archive_dst,
-                          expect_zero=False).retcode:
-        snapshot_logger.warning('Coverage not found for cycle: %d.', cycle)
-        return None
-
-    os.remove(coverage_archive_zipped)  # no reason to keep this around
+    else:
+        snapshot_measurer.initialize_measurement_dirs()
+        snapshot_measurer.extract_corpus(corpus_archive_dst)
+        # Don't keep corpus archives around longer than they need to be.
+        os.remove(corpus_archive_dst)
+
+    # Run coverage on the new corpus units, generate profdata and transform it
+    # into json form.
+    snapshot_measurer.measure_new_units(cycle)
+
+    # Compress and save the exported profdata snapshot. When measuring
+    # incrementally, it only exists if the coverage could not be measured
+    # natively, so no coverage archive is saved for the other cycles.
+    if (not incremental_coverage or
+            os.path.exists(snapshot_measurer.cov_summary_file)):
+        if not save_coverage_archive(snapshot_measurer, cycle):
+            snapshot_logger.warning('Coverage not found for cycle: %d.', cycle)
+            return None
+    else:
+        snapshot_logger.info(
+            'Coverage measured natively, not saving coverage archive for '
+            'cycle: %d.', cycle)
 
     # Run crashes again, parse stacktraces and generate crash signatures.
-    crashes = snapshot_measurer.process_crashes(cycle)
+    crashes = snapshot_measurer.process_crashes(cycle, num_crash_workers)
 
     # Get the coverage summary of the new corpus units.
     branches_covered = snapshot_measurer.get_current_coverage()
     fuzzer_stats_data = snapshot_measurer.get_fuzzer_stats(cycle)
-    snapshot = models.Snapshot(time=this_time,
-                               trial_id=trial_num,
-                               edges_covered=branches_covered,
-                               fuzzer_stats=fuzzer_stats_data,
-                               crashes=crashes)
+    snapshot = measurer_datatypes.MeasuredSnapshot(
+        time=this_time,
+        trial_id=trial_num,
+        edges_covered=branches_covered,
+        fuzzer_stats=fuzzer_stats_data,
+        crashes=crashes)
 
     measuring_time = round(time.time() - measuring_start_time, 2)
     snapshot_logger.info('Measured cycle: %d in %f seconds.', cycle,
@@ -676,16 +842,15 @@ def set_up_coverage_binary(benchmark):
     initialize_logs()
     coverage_binaries_dir = build_utils.get_coverage_binaries_dir()
     benchmark_coverage_binary_dir = coverage_binaries_dir / benchmark
-    filesystem.create_directory(benchmark_coverage_binary_dir)
+    filesystem.recreate_directory(benchmark_coverage_binary_dir)
     archive_name = f'coverage-build-{benchmark}.tar.gz'
     archive_filestore_path = exp_path.filestore(coverage_binaries_dir /
                                                 archive_name)
-    filestore_utils.cp(archive_filestore_path,
-                       str(benchmark_coverage_binary_dir))
-    archive_path = benchmark_coverage_binary_dir / archive_name
-    with tarfile.open(archive_path, 'r:gz') as tar:
-        tar.extractall(benchmark_coverage_binary_dir)
-        os.remove(archive_path)
+    filestore_utils.cp(archive_filestore_path, str(coverage_binaries_dir))
+    archive_path = coverage_binaries_dir / archive_name
+    coverage_binary_cache.extract(str(archive_path),
+                                  str(benchmark_coverage_binary_dir))
+    os.remove(archive_path)
 
 
 def initialize_logs():
@@ -697,7 +862,8 @@ def initialize_logs():
 
 
 def consume_snapshots_from_response_queue(
-        response_queue, queued_snapshots) -> List[models.Snapshot]:
+        response_queue,
+        queued_snapshots) -> List[measurer_datatypes.MeasuredSnapshot]:
     """Consume response_queue, allows retry objects to retried, and
     return all measured snapshots in a list."""
     measured_snapshots = []
@@ -712,7 +878,8 @@ def consume_snapshots_from_response_queue(
                 queued_snapshots.remove(snapshot_identifier)
                 logger.info('Reescheduling task for trial %s and cycle %s',
                             response_object.trial_id, response_object.cycle)
-            elif isinstance(response_object, models.Snapshot):
+            elif isinstance(response_object,
+                            measurer_datatypes.MeasuredSnapshot):
                 measured_snapshots.append(response_object)
             else:
                 logger.error('Type of response object not mapped! %s',
@@ -722,32 +889,46 @@ def consume_snapshots_from_response_queue(
     return measured_snapshots
 
 
-def measure_manager_inner_loop(experiment: str, max_cycle: int, request_queue,
-                               response_queue, queued_snapshots):
-    """Reads from database to determine which snapshots needs measuring. Write
-    measurements tasks to request queue, get results from response queue, and
+def measure_manager_inner_loop(  # pylint: disable=too-many-arguments
+        experiment: str,
+        max_cycle: int,
+        request_queue,
+        response_queue,
+        queued_snapshots,
+        measure_scheduler: Optional[
+            request_scheduler.MeasureRequestScheduler] = None,
+        cursor: Optional[measurement_cursor.MeasurementCursor] = None):
+    """Determines which snapshots need measuring using |cursor| if provided or
+    the database otherwise. Write measurements tasks to request queue in the
+    order decided by |measure_scheduler|, get results from response queue, and
     write measured snapshots to database. Returns False if there's no more
     snapshots left to be measured"""
     initialize_logs()
-    # Read database to determine which snapshots needs measuring.
-    unmeasured_snapshots = get_unmeasured_snapshots(experiment, max_cycle)
+    if cursor is not None:
+        cursor.refresh()
+        unmeasured_snapshots = cursor.get_unmeasured_snapshots()
+    else:
+        # Read database to determine which snapshots needs measuring.
+        unmeasured_snapshots = get_unmeasured_snapshots(experiment, max_cycle)
     logger.info('Retrieved %d unmeasured snapshots from measure manager',
                 len(unmeasured_snapshots))
     # When there are no more snapshots left to be measured, should break loop.
     if not unmeasured_snapshots:
         return False
 
-    # Write measurements requests to request queue
-    for unmeasured_snapshot in unmeasured_snapshots:
-        # No need to insert fuzzer and benchmark info here as it's redundant
-        # (Can be retrieved through trial_id).
-        unmeasured_snapshot_identifier = (unmeasured_snapshot.trial_id,
-                                          unmeasured_snapshot.cycle)
-        # Checking if snapshot already was queued so workers will not repeat
-        # measurement for same snapshot
-        if unmeasured_snapshot_identifier not in queued_snapshots:
-            request_queue.put(unmeasured_snapshot)
-            queued_snapshots.add(unmeasured_snapshot_identifier)
+    # Write measurements requests to request queue. Snapshots that were already
+    # queued are skipped so workers will not repeat measurement for same
+    # snapshot.
+    if measure_scheduler is None:
+        measure_scheduler = request_scheduler.MeasureRequestScheduler()
+    if cursor is not None:
+        trial_start_times = cursor.get_trial_start_times()
+    else:
+        trial_start_times = measurement_cursor.query_trial_start_times(
+            experiment)
+    measure_scheduler.update(unmeasured_snapshots, queued_snapshots,
+                             trial_start_times)
+    measure_scheduler.dispatch(request_queue, queued_snapshots)
 
     # Read results from response queue.
     measured_snapshots = consume_snapshots_from_response_queue(
@@ -757,7 +938,14 @@ def measure_manager_inner_loop(experiment: str, max_cycle: int, request_queue,
 
     # Save measured snapshots to database.
     if measured_snapshots:
-        db_utils.add_all(measured_snapshots)
+        db_utils.bulk_upsert_snapshots(measured_snapshots)
+        if cursor is not None:
+            cursor.advance(measured_snapshots)
+        # Measured snapshots won't be requested again.
+        for snapshot in measured_snapshots:
+            queued_snapshots.discard(
+                (snapshot.trial_id,
+                 experiment_utils.time_to_cycle(snapshot.time)))
 
     return True
 
@@ -779,10 +967,13 @@ def get_pool_args(measurers_cpus, runners_cpus):
     return (measurers_cpus, _process_init, (cores_queue,))
 
 
-def measure_manager_loop(experiment: str,
-                         max_total_time: int,
-                         measurers_cpus=None,
-                         region_coverage=False):  # pylint: disable=too-many-locals
+def measure_manager_loop(  # pylint: disable=too-many-locals,too-many-arguments
+        experiment: str,
+        max_total_time: int,
+        measurers_cpus=None,
+        region_coverage=False,
+        corpus_format=corpus_blob_store.TARBALL_FORMAT,
+        incremental_coverage=False):
     """Measure manager loop. Creates request and response queues, request
     measurements tasks from workers, retrieve measurement results from response
     queue and writes measured snapshots in database."""
@@ -791,36 +982,50 @@ def measure_manager_loop(experiment: str,
         measurers_cpus = multiprocessing.cpu_count()
         logger.info('Number of measurer CPUs not passed as argument. using %d',
                     measurers_cpus)
-    with multiprocessing.Pool() as pool, multiprocessing.Manager() as manager:
+    with multiprocessing.Pool() as pool:
         logger.info('Setting up coverage binaries')
         set_up_coverage_binaries(pool, experiment)
-        request_queue = manager.Queue()
-        response_queue = manager.Queue()
-
-        config = {
-            'request_queue': request_queue,
-            'response_queue': response_queue,
-            'region_coverage': region_coverage,
-        }
-        local_measure_worker = measure_worker.LocalMeasureWorker(config)
-
-        # Since each worker is going to be in an infinite loop, we dont need
-        # result return. Workers' life scope will end automatically when there
-        # are no more snapshots left to measure.
-        logger.info('Starting measure worker loop for %d workers',
-                    measurers_cpus)
-        for _ in range(measurers_cpus):
-            _result = pool.apply_async(local_measure_worker.measure_worker_loop)
 
-        max_cycle = _time_to_cycle(max_total_time)
+    # Workers get the queues when they are started instead of through a
+    # multiprocessing.Manager, so that requests and results don't go through a
+    # proxy process.
+    request_queue = multiprocessing.Queue()
+    response_queue = multiprocessing.Queue()
+    local_measure_worker = measure_worker.LocalMeasureWorker({
+        'request_queue': request_queue,
+        'response_queue': response_queue,
+        'region_coverage': region_coverage,
+        'corpus_format': corpus_format,
+        'incremental_coverage': incremental_coverage,
+        'num_crash_workers': run_crashes.get_num_crash_workers(measurers_cpus),
+    })
+
+    # Each worker is in an infinite loop, so they are terminated once there
+    # are no more snapshots left to measure.
+    logger.info('Starting measure worker loop for %d workers', measurers_cpus)
+    workers = [
+        multiprocessing.Process(target=local_measure_worker.measure_worker_loop,
+                                daemon=True) for _ in range(measurers_cpus)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        max_cycle = experiment_utils.time_to_cycle(max_total_time)
         queued_snapshots = set()
+        measure_scheduler = request_scheduler.MeasureRequestScheduler(
+            measurers_cpus * REQUEST_QUEUE_DEPTH_PER_WORKER)
+        cursor = measurement_cursor.MeasurementCursor(experiment, max_cycle)
         while not scheduler.all_trials_ended(experiment):
             continue_inner_loop = measure_manager_inner_loop(
                 experiment, max_cycle, request_queue, response_queue,
-                queued_snapshots)
+                queued_snapshots, measure_scheduler, cursor)
             if not continue_inner_loop:
                 break
             time.sleep(MEASUREMENT_LOOP_WAIT)
+    finally:
+        for worker in workers:
+            worker.terminate()
         logger.info('All trials ended. Ending measure manager loop')
 
 
@@ -12,14 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Module for measurer workers logic."""
-import time
 from typing import Dict, Optional
+from common import corpus_blob_store
 from common import logs
-from database.models import Snapshot
 import experiment.measurer.datatypes as measurer_datatypes
 from experiment.measurer import measure_manager
 
-MEASUREMENT_TIMEOUT = 1
 logger = logs.Logger()  # pylint: disable=invalid-name
 
 
@@ -31,6 +29,10 @@ class BaseMeasureWorker:
         self.request_queue = config['request_queue']
         self.response_queue = config['response_queue']
         self.region_coverage = config['region_coverage']
+        self.corpus_format = config.get('corpus_format',
+                                        corpus_blob_store.TARBALL_FORMAT)
+        self.incremental_coverage = config.get('incremental_coverage', False)
+        self.num_crash_workers = config.get('num_crash_workers', 1)
 
     def get_task_from_request_queue(self):
         """"Get task from request queue"""
@@ -42,8 +44,8 @@ class BaseMeasureWorker:
         raise NotImplementedError
 
     def measure_worker_loop(self):
-        """Periodically retrieves request from request queue, measure it, and
-        put result in response queue"""
+        """Waits for requests from the request queue, measures them, and puts
+        the results in the response queue"""
         logs.initialize(default_extras={
             'component': 'measurer',
             'subcomponent': 'worker',
@@ -59,9 +61,9 @@ class BaseMeasureWorker:
                 request.cycle)
             measured_snapshot = measure_manager.measure_snapshot_coverage(
                 request.fuzzer, request.benchmark, request.trial_id,
-                request.cycle, self.region_coverage)
+                request.cycle, self.region_coverage, self.corpus_format,
+                self.incremental_coverage, self.num_crash_workers)
             self.put_result_in_response_queue(measured_snapshot, request)
-            time.sleep(MEASUREMENT_TIMEOUT)
 
 
 class LocalMeasureWorker(BaseMeasureWorker):
@@ -76,7 +78,8 @@ class LocalMeasureWorker(BaseMeasureWorker):
         return request
 
     def put_result_in_response_queue(
-            self, measured_snapshot: Optional[Snapshot],
+            self,
+            measured_snapshot: Optional[measurer_datatypes.MeasuredSnapshot],
             request: measurer_datatypes.SnapshotMeasureRequest):
         if measured_snapshot:
             logger.info('Put measured snapshot in response_queue')
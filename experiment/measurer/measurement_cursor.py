@@ -0,0 +1,145 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for keeping track of the measurement progress of trials in memory."""
+import collections
+import datetime
+from typing import Dict, List
+
+import sqlalchemy
+from sqlalchemy import func
+
+from common import experiment_utils
+from common import logs
+from database import models
+from database import utils as db_utils
+import experiment.measurer.datatypes as measurer_datatypes
+
+logger = logs.Logger()
+
+TrialInfo = collections.namedtuple('TrialInfo',
+                                   ['fuzzer', 'benchmark', 'time_started'])
+
+
+def query_trial_start_times(experiment: str) -> Dict[int, datetime.datetime]:
+    """Returns a dictionary mapping the ids of the started trials in
+    |experiment| to the time they were started."""
+    with db_utils.session_scope() as session:
+        trials_query = session.query(models.Trial.id,
+                                     models.Trial.time_started).filter(
+                                         models.Trial.experiment == experiment,
+                                         ~models.Trial.time_started.is_(None))
+        return {
+            trial_id: time_started.replace(tzinfo=datetime.timezone.utc)
+            for trial_id, time_started in trials_query
+        }
+
+
+class MeasurementCursor:
+    """Keeps track of the next cycle to measure for every trial in an
+    experiment. The cursor is seeded from the database once and then advanced
+    with the snapshots measured by the measure manager, which is the only writer
+    of snapshots. This avoids scanning the snapshot table in every iteration of
+    the measure manager loop."""
+
+    def __init__(self, experiment: str, max_cycle: int):
+        self.experiment = experiment
+        self.max_cycle = max_cycle
+        # Maps trial ids to their TrialInfo.
+        self.trials = {}
+        # Maps trial ids to the next cycle to measure.
+        self.next_cycles = {}
+        self.seeded = False
+
+    def _add_trial(self, trial_id: int, fuzzer: str, benchmark: str,
+                   time_started: datetime.datetime, next_cycle: int):
+        self.trials[trial_id] = TrialInfo(
+            fuzzer, benchmark,
+            time_started.replace(tzinfo=datetime.timezone.utc))
+        self.next_cycles[trial_id] = next_cycle
+
+    def seed(self):
+        """Loads the latest measured cycle of every trial from the database.
+        Preempted trials are only included if they have been measured
+        before."""
+        latest_time_column = func.max(models.Snapshot.time)
+        with db_utils.session_scope() as session:
+            trials_query = session.query(
+                models.Trial.id, models.Trial.fuzzer, models.Trial.benchmark,
+                models.Trial.time_started, latest_time_column).outerjoin(
+                    models.Snapshot,
+                    models.Snapshot.trial_id == models.Trial.id).filter(
+                        models.Trial.experiment == self.experiment,
+                        ~models.Trial.time_started.is_(None)).group_by(
+                            models.Trial.id, models.Trial.fuzzer,
+                            models.Trial.benchmark, models.Trial.time_started,
+                            models.Trial.preempted).having(
+                                sqlalchemy.or_(~models.Trial.preempted,
+                                               latest_time_column.isnot(None)))
+            for (trial_id, fuzzer, benchmark, time_started,
+                 latest_time) in trials_query:
+                next_cycle = 0 if latest_time is None else (
+                    experiment_utils.time_to_cycle(latest_time) + 1)
+                self._add_trial(trial_id, fuzzer, benchmark, time_started,
+                                next_cycle)
+        self.seeded = True
+        logger.info('Seeded measurement cursor with %d trials.',
+                    len(self.trials))
+
+    def refresh(self):
+        """Seeds the cursor if needed and adds trials that were started since
+        the last refresh."""
+        if not self.seeded:
+            self.seed()
+            return
+
+        with db_utils.session_scope() as session:
+            trials_query = session.query(
+                models.Trial.id, models.Trial.fuzzer, models.Trial.benchmark,
+                models.Trial.time_started).filter(
+                    models.Trial.experiment == self.experiment,
+                    ~models.Trial.preempted,
+                    ~models.Trial.time_started.is_(None))
+            for trial_id, fuzzer, benchmark, time_started in trials_query:
+                if trial_id not in self.trials:
+                    # Snapshots of new trials can only have been saved through
+                    # this cursor, so they don't have any yet.
+                    self._add_trial(trial_id, fuzzer, benchmark, time_started,
+                                    0)
+
+    def get_unmeasured_snapshots(
+            self) -> List[measurer_datatypes.SnapshotMeasureRequest]:
+        """Returns a SnapshotMeasureRequest for the next cycle of every trial
+        that has cycles left to measure."""
+        return [
+            measurer_datatypes.SnapshotMeasureRequest(
+                trial.fuzzer, trial.benchmark, trial_id,
+                self.next_cycles[trial_id])
+            for trial_id, trial in self.trials.items()
+            if self.next_cycles[trial_id] <= self.max_cycle
+        ]
+
+    def get_trial_start_times(self) -> Dict[int, datetime.datetime]:
+        """Returns a dictionary mapping the ids of the trials to the time they
+        were started."""
+        return {
+            trial_id: trial.time_started
+            for trial_id, trial in self.trials.items()
+        }
+
+    def advance(self, measured_snapshots):
+        """Moves the cursor past the cycles of |measured_snapshots|."""
+        for snapshot in measured_snapshots:
+            next_cycle = experiment_utils.time_to_cycle(snapshot.time) + 1
+            if next_cycle > self.next_cycles.get(snapshot.trial_id, 0):
+                self.next_cycles[snapshot.trial_id] = next_cycle
@@ -0,0 +1,618 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for measuring coverage without llvm-profdata and llvm-cov. The
+coverage mapping of a coverage binary is read once and the counters of the
+.profraw files written by it are evaluated against the mapping in-process.
+
+Only the parts of the LLVM formats needed to count covered branches and regions
+are supported: ELF binaries with coverage mapping format version 4 or later and
+little-endian raw profiles of format version 8 to 10. Anything else raises a
+ValueError so that callers can fall back to llvm-cov."""
+
+import array
+import collections
+import functools
+import hashlib
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from common import logs
+from experiment.measurer import coverage_utils
+
+logger = logs.Logger()  # pylint: disable=invalid-name
+
+COVMAP_SECTION = '__llvm_covmap'
+COVFUN_SECTION = '__llvm_covfun'
+
+# Coverage mapping format versions are stored zero-based, so these are
+# Version4 and Version6 of the format.
+COVMAP_VERSION_4 = 3
+COVMAP_VERSION_6 = 5
+COVMAP_HEADER = struct.Struct('<IIII')
+COVFUN_RECORD_HEADER = struct.Struct('<QIQQ')
+
+# Kinds of counters and mapping regions, see CoverageMapping.h.
+COUNTER_ZERO = 0
+COUNTER_REFERENCE = 1
+COUNTER_SUBTRACT = 2
+COUNTER_ADD = 3
+CODE_REGION = 0
+EXPANSION_REGION = 1
+SKIPPED_REGION = 2
+GAP_REGION = 3
+BRANCH_REGION = 4
+MCDC_DECISION_REGION = 5
+MCDC_BRANCH_REGION = 6
+GAP_REGION_BIT = 1 << 31
+MAX_COLUMN = 2**32 - 1
+
+PROFRAW_MAGIC = 0xff6c70726f667281
+PROFRAW_VERSION_MASK = 2**32 - 1
+VARIANT_MASK_DBG_CORRELATE = 1 << 59
+VARIANT_MASK_BYTE_COVERAGE = 1 << 60
+
+# Fields of the raw profile header for each supported raw profile format
+# version, see InstrProfData.inc.
+PROFRAW_HEADER_FIELDS = {
+    8: [
+        'magic', 'version', 'binary_ids_size', 'num_data',
+        'padding_bytes_before_counters', 'num_counters',
+        'padding_bytes_after_counters', 'names_size', 'counters_delta',
+        'names_delta', 'value_kind_last'
+    ],
+    9: [
+        'magic', 'version', 'binary_ids_size', 'num_data',
+        'padding_bytes_before_counters', 'num_counters',
+        'padding_bytes_after_counters', 'num_bitmap_bytes',
+        'padding_bytes_after_bitmap_bytes', 'names_size', 'counters_delta',
+        'bitmap_delta', 'names_delta', 'value_kind_last'
+    ],
+    10: [
+        'magic', 'version', 'binary_ids_size', 'num_data',
+        'padding_bytes_before_counters', 'num_counters',
+        'padding_bytes_after_counters', 'num_bitmap_bytes',
+        'padding_bytes_after_bitmap_bytes', 'names_size', 'counters_delta',
+        'bitmap_delta', 'names_delta', 'num_vtables', 'vnames_size',
+        'value_kind_last'
+    ],
+}
+
+# The fields of the per-function data records of raw profiles that are needed
+# to locate their counters.
+PROFRAW_DATA_DTYPES = {
+    8:
+        np.dtype({
+            'names': ['name_ref', 'func_hash', 'counter_ptr', 'num_counters'],
+            'formats': ['<u8', '<u8', '<i8', '<u4'],
+            'offsets': [0, 8, 16, 40],
+            'itemsize': 48
+        }),
+    9:
+        np.dtype({
+            'names': ['name_ref', 'func_hash', 'counter_ptr', 'num_counters'],
+            'formats': ['<u8', '<u8', '<i8', '<u4'],
+            'offsets': [0, 8, 16, 48],
+            'itemsize': 64
+        }),
+}
+PROFRAW_DATA_DTYPES[10] = PROFRAW_DATA_DTYPES[9]
+
+ELF_HEADER = struct.Struct('<16sHHIQQQIHHHHHH')
+ELF_SECTION_HEADER = struct.Struct('<IIQQQQIIQQ')
+ELF_SHF_COMPRESSED = 0x800
+ELF_SHN_XINDEX = 0xffff
+
+# A function is identified by the MD5 of its name and the hash of its control
+# flow graph, both in raw profiles and in the coverage mapping.
+FunctionKey = Tuple[int, int]
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    """Returns |offset| rounded up to a multiple of |alignment|."""
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _md5_hash(data: bytes) -> int:
+    """Returns the lower 64 bits of the MD5 of |data| like
+    llvm::IndexedInstrProf::ComputeHash."""
+    return int.from_bytes(hashlib.md5(data).digest()[:8], 'little')
+
+
+class _Reader:
+    """Reads the LEB128 encoded values used by the coverage mapping format."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def read_uleb128(self) -> int:
+        """Reads an unsigned LEB128 value."""
+        value = 0
+        shift = 0
+        while True:
+            if self.position >= len(self.data):
+                raise ValueError('Truncated coverage mapping.')
+            byte = self.data[self.position]
+            self.position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_bytes(self, size: int) -> bytes:
+        """Reads |size| bytes."""
+        if self.position + size > len(self.data):
+            raise ValueError('Truncated coverage mapping.')
+        data = self.data[self.position:self.position + size]
+        self.position += size
+        return data
+
+    def read_string(self) -> str:
+        """Reads a string prefixed by its length."""
+        return self.read_bytes(self.read_uleb128()).decode('utf-8')
+
+
+def read_elf_sections(binary_path: str, section_names) -> Dict[str, bytes]:  # pylint: disable=too-many-locals
+    """Returns the contents of the sections of the ELF file |binary_path| named
+    in |section_names|."""
+    sections = {}
+    with open(binary_path, 'rb') as binary:
+        header = ELF_HEADER.unpack(binary.read(ELF_HEADER.size))
+        ident, section_headers_offset = header[0], header[6]
+        num_sections, names_index = header[12], header[13]
+        if ident[:4] != b'\x7fELF' or ident[4] != 2 or ident[5] != 1:
+            raise ValueError(f'{binary_path} is not a 64-bit little-endian ELF '
+                             'file.')
+
+        def read_section_header(index):
+            binary.seek(section_headers_offset +
+                        index * ELF_SECTION_HEADER.size)
+            return ELF_SECTION_HEADER.unpack(
+                binary.read(ELF_SECTION_HEADER.size))
+
+        # Files with many sections store their number in the first section.
+        first_section_header = read_section_header(0)
+        if num_sections == 0:
+            num_sections = first_section_header[5]
+        if names_index == ELF_SHN_XINDEX:
+            names_index = first_section_header[6]
+        section_headers = [
+            read_section_header(index) for index in range(num_sections)
+        ]
+
+        names_header = section_headers[names_index]
+        binary.seek(names_header[4])
+        names = binary.read(names_header[5])
+        for section_header in section_headers:
+            name_offset = section_header[0]
+            name = names[name_offset:names.index(b'\0', name_offset)].decode()
+            if name not in section_names:
+                continue
+            if section_header[2] & ELF_SHF_COMPRESSED:
+                raise ValueError(f'Section {name} is compressed.')
+            binary.seek(section_header[4])
+            sections[name] = binary.read(section_header[5])
+    return sections
+
+
+def parse_filenames(data: bytes, version: int) -> List[str]:
+    """Returns the filenames of a translation unit stored in the coverage
+    mapping header |data|."""
+    reader = _Reader(data)
+    num_filenames = reader.read_uleb128()
+    reader.read_uleb128()  # Uncompressed size.
+    compressed_size = reader.read_uleb128()
+    if compressed_size:
+        reader = _Reader(zlib.decompress(reader.read_bytes(compressed_size)))
+    filenames = [reader.read_string() for _ in range(num_filenames)]
+    if version < COVMAP_VERSION_6:
+        return filenames
+
+    # Starting with version 6, the first filename is the compilation directory
+    # that relative filenames are relative to.
+    compilation_dir = filenames[0]
+    return [compilation_dir] + [
+        filename if os.path.isabs(filename) else os.path.normpath(
+            os.path.join(compilation_dir, filename))
+        for filename in filenames[1:]
+    ]
+
+
+def parse_covmap(data: bytes) -> Dict[int, List[str]]:
+    """Returns the filenames of each translation unit in the __llvm_covmap
+    section |data|, keyed by the hash referencing them from function
+    records."""
+    filenames = {}
+    position = 0
+    while position + COVMAP_HEADER.size <= len(data):
+        _, filenames_size, coverage_size, version = COVMAP_HEADER.unpack_from(
+            data, position)
+        position += COVMAP_HEADER.size
+        if version < COVMAP_VERSION_4:
+            raise ValueError(
+                f'Unsupported coverage mapping version: {version + 1}.')
+        filenames_data = data[position:position + filenames_size]
+        filenames[_md5_hash(filenames_data)] = parse_filenames(
+            filenames_data, version)
+        position = _align(position + filenames_size + coverage_size)
+    return filenames
+
+
+def parse_mapping_regions(data: bytes, filenames: List[str]):  # pylint: disable=too-many-locals,too-many-branches
+    """Returns the expressions and mapping regions of a function record, like
+    RawCoverageMappingReader. Each expression is a tuple of its operation and
+    operands, each region a tuple of its kind, counter, false counter, filename
+    and location."""
+    reader = _Reader(data)
+    file_mapping = [
+        filenames[reader.read_uleb128()] for _ in range(reader.read_uleb128())
+    ]
+    expressions = [(reader.read_uleb128(), reader.read_uleb128())
+                   for _ in range(reader.read_uleb128())]
+
+    regions = []
+    for filename in file_mapping:
+        line_start = 0
+        for _ in range(reader.read_uleb128()):
+            encoded_counter_and_region = reader.read_uleb128()
+            counter = encoded_counter_and_region
+            false_counter = COUNTER_ZERO
+            kind = CODE_REGION
+            if encoded_counter_and_region & 3 == COUNTER_ZERO:
+                # Regions without a counter encode their kind instead.
+                counter = COUNTER_ZERO
+                if encoded_counter_and_region & 4:
+                    kind = EXPANSION_REGION
+                else:
+                    kind = encoded_counter_and_region >> 3
+                if kind in (BRANCH_REGION, MCDC_BRANCH_REGION):
+                    counter = reader.read_uleb128()
+                    false_counter = reader.read_uleb128()
+                if kind == MCDC_BRANCH_REGION:
+                    for _ in range(3):  # Condition ids.
+                        reader.read_uleb128()
+                elif kind == MCDC_DECISION_REGION:
+                    for _ in range(2):  # Bitmap index and conditions.
+                        reader.read_uleb128()
+                elif kind > MCDC_BRANCH_REGION:
+                    raise ValueError(f'Unknown mapping region kind: {kind}.')
+
+            line_start += reader.read_uleb128()
+            column_start = reader.read_uleb128()
+            num_lines = reader.read_uleb128()
+            column_end = reader.read_uleb128()
+            if column_end & GAP_REGION_BIT:
+                kind = GAP_REGION
+                column_end &= ~GAP_REGION_BIT
+            if column_start == 0 and column_end == 0:
+                # Regions covering whole lines.
+                column_start = 1
+                column_end = MAX_COLUMN
+            location = (line_start, column_start, line_start + num_lines,
+                        column_end)
+            regions.append((kind, counter, false_counter, filename, location))
+
+    # Like in RawCoverageMappingReader, the operation of an expression is the
+    # one of the last counter referring to it.
+    expression_kinds = [COUNTER_SUBTRACT] * len(expressions)
+    counters = [operand for expression in expressions for operand in expression]
+    counters.extend(counter for region in regions for counter in region[1:3])
+    for counter in counters:
+        if counter & 3 < COUNTER_SUBTRACT:
+            continue
+        if counter >> 2 >= len(expressions):
+            raise ValueError(f'Invalid counter expression: {counter >> 2}.')
+        expression_kinds[counter >> 2] = counter & 3
+    expressions = [(kind, lhs, rhs)
+                   for kind, (lhs, rhs) in zip(expression_kinds, expressions)]
+    return expressions, regions
+
+
+def _expand_counter(counter: int, expressions, expanded_expressions) -> Dict:
+    """Returns |counter| as a linear combination of counter indices. Expanded
+    expressions are memoized in |expanded_expressions|."""
+    if counter & 3 == COUNTER_ZERO:
+        return {}
+    if counter & 3 == COUNTER_REFERENCE:
+        return {counter >> 2: 1}
+
+    # Expressions can be nested deeply, so expand them without recursion.
+    stack = [counter >> 2]
+    while stack:
+        index = stack[-1]
+        if index in expanded_expressions:
+            stack.pop()
+            continue
+        if len(stack) > 2 * len(expressions):
+            raise ValueError('Cyclic counter expressions.')
+
+        kind, lhs, rhs = expressions[index]
+        unexpanded_operands = [
+            operand >> 2 for operand in (lhs, rhs) if operand &
+            3 >= COUNTER_SUBTRACT and operand >> 2 not in expanded_expressions
+        ]
+        if unexpanded_operands:
+            stack.extend(unexpanded_operands)
+            continue
+        stack.pop()
+
+        combination = collections.Counter()
+        signs = (1, -1 if kind == COUNTER_SUBTRACT else 1)
+        for sign, operand in zip(signs, (lhs, rhs)):
+            if operand & 3 == COUNTER_REFERENCE:
+                combination[operand >> 2] += sign
+            elif operand & 3 != COUNTER_ZERO:
+                for counter_index, coefficient in expanded_expressions[
+                        operand >> 2].items():
+                    combination[counter_index] += sign * coefficient
+        expanded_expressions[index] = {
+            counter_index: coefficient
+            for counter_index, coefficient in combination.items()
+            if coefficient
+        }
+    return expanded_expressions[counter >> 2]
+
+
+def _get_num_counters(counters, expressions) -> int:
+    """Returns the number of counters needed to evaluate |counters|."""
+    num_counters = 0
+    visited_expressions = set()
+    counters = list(counters)
+    while counters:
+        counter = counters.pop()
+        if counter & 3 == COUNTER_REFERENCE:
+            num_counters = max(num_counters, (counter >> 2) + 1)
+        elif (counter & 3 != COUNTER_ZERO and
+              counter >> 2 not in visited_expressions):
+            visited_expressions.add(counter >> 2)
+            counters.extend(expressions[counter >> 2][1:])
+    return num_counters
+
+
+def _get_counter_combinations(mapping_data: bytes, filenames: List[str]):
+    """Returns the number of counters of a function and the kind, id and
+    combination of counters giving the execution count of each code region and
+    branch side in its encoded mapping."""
+    expressions, regions = parse_mapping_regions(mapping_data, filenames)
+    # llvm-cov evaluates the counters of all regions, even the ones that are
+    # not counted.
+    num_counters = _get_num_counters(
+        (counter for region in regions for counter in region[1:3]), expressions)
+    expanded_expressions = {}
+    combinations = []
+    for kind, counter, false_counter, filename, location in regions:
+        if kind == CODE_REGION:
+            combinations.append(
+                (kind, coverage_utils.get_coverage_id(filename, location),
+                 _expand_counter(counter, expressions, expanded_expressions)))
+        elif kind == BRANCH_REGION:
+            # Each side of a branch is counted separately.
+            for side, side_counter in enumerate((counter, false_counter)):
+                combinations.append(
+                    (kind,
+                     coverage_utils.get_coverage_id(filename, location, side),
+                     _expand_counter(side_counter, expressions,
+                                     expanded_expressions)))
+    return num_counters, combinations
+
+
+class CoverageMapping:  # pylint: disable=too-few-public-methods
+    """The branches and code regions of a coverage binary. Their execution
+    counts are linear combinations of the counters of the binary's functions,
+    stored as sparse matrices over a vector containing the counters of all
+    functions."""
+
+    def __init__(self, coverage_binary: str):  # pylint: disable=too-many-locals
+        sections = read_elf_sections(coverage_binary,
+                                     {COVMAP_SECTION, COVFUN_SECTION})
+        if COVMAP_SECTION not in sections or COVFUN_SECTION not in sections:
+            raise ValueError(f'No coverage mapping in {coverage_binary}.')
+        translation_unit_filenames = parse_covmap(sections[COVMAP_SECTION])
+
+        functions = []
+        for function_key, filenames_ref, mapping_data in _iter_covfun_records(
+                sections[COVFUN_SECTION]):
+            if filenames_ref not in translation_unit_filenames:
+                raise ValueError(f'Unknown filenames: {filenames_ref}.')
+            functions.append((function_key,
+                              _get_counter_combinations(
+                                  mapping_data,
+                                  translation_unit_filenames[filenames_ref])))
+
+        # The range of each function's counters in the counters vector. Records
+        # of the same function in different translation units share it.
+        slot_sizes = collections.defaultdict(int)
+        for function_key, (num_counters, _) in functions:
+            slot_sizes[function_key] = max(slot_sizes[function_key],
+                                           num_counters)
+        self.counter_slots = {}
+        self.num_counters = 0
+        for function_key, slot_size in slot_sizes.items():
+            self.counter_slots[function_key] = (self.num_counters, slot_size)
+            self.num_counters += slot_size
+
+        builders = {
+            CODE_REGION: _MatrixBuilder(),
+            BRANCH_REGION: _MatrixBuilder()
+        }
+        for function_key, (_, combinations) in functions:
+            offset = self.counter_slots[function_key][0]
+            for kind, coverage_id, combination in combinations:
+                builders[kind].add_row(coverage_id, offset, combination)
+
+        self.branch_ids, self.branch_counts = builders[BRANCH_REGION].build(
+            self.num_counters)
+        self.region_ids, self.region_counts = builders[CODE_REGION].build(
+            self.num_counters)
+
+    def get_covered_ids(self,
+                        profraw_files: List[str],
+                        region_coverage: bool = False) -> np.ndarray:
+        """Returns a sorted array of the ids of the covered branch sides (or
+        code regions if |region_coverage|) according to |profraw_files|. The
+        ids match coverage_utils.extract_covered_ids_from_summary_json."""
+        counters = np.zeros(self.num_counters, dtype=np.int64)
+        for profraw_file in profraw_files:
+            for function_key, function_counters in read_profraw_counters(
+                    profraw_file).items():
+                if function_key not in self.counter_slots:
+                    continue
+                offset, num_counters = self.counter_slots[function_key]
+                if len(function_counters) < num_counters:
+                    # llvm-cov skips functions whose mapping refers to counters
+                    # missing from the profile.
+                    continue
+                counters[offset:offset + num_counters] += (
+                    function_counters[:num_counters].view(np.int64))
+
+        if region_coverage:
+            ids, counts = self.region_ids, self.region_counts
+        else:
+            ids, counts = self.branch_ids, self.branch_counts
+        return np.unique(ids[counts.dot(counters) != 0])
+
+
+class _MatrixBuilder:
+    """Builds the sparse matrix mapping counters to execution counts."""
+
+    def __init__(self):
+        self.ids = array.array('Q')
+        self.rows = array.array('q')
+        self.columns = array.array('q')
+        self.coefficients = array.array('q')
+
+    def add_row(self, coverage_id: int, offset: int, combination: Dict):
+        """Adds a row for |coverage_id| with the |combination| of the counters
+        starting at |offset|."""
+        row = len(self.ids)
+        self.ids.append(coverage_id)
+        for counter_index, coefficient in combination.items():
+            self.rows.append(row)
+            self.columns.append(offset + counter_index)
+            self.coefficients.append(coefficient)
+
+    def build(self, num_counters: int):
+        """Returns the ids and the matrix of the rows."""
+        matrix = sparse.csr_matrix(
+            (np.frombuffer(self.coefficients, dtype=np.int64),
+             (np.frombuffer(self.rows, dtype=np.int64),
+              np.frombuffer(self.columns, dtype=np.int64))),
+            shape=(len(self.ids), num_counters),
+            dtype=np.int64)
+        return np.frombuffer(self.ids, dtype=np.uint64), matrix
+
+
+def _iter_covfun_records(data: bytes):
+    """Yields the function key, filenames hash and encoded mapping of each
+    function record in the __llvm_covfun section |data|."""
+    position = 0
+    while position + COVFUN_RECORD_HEADER.size <= len(data):
+        name_ref, data_size, func_hash, filenames_ref = (
+            COVFUN_RECORD_HEADER.unpack_from(data, position))
+        position += COVFUN_RECORD_HEADER.size
+        if position + data_size > len(data):
+            raise ValueError('Truncated function record.')
+        yield (name_ref,
+               func_hash), filenames_ref, data[position:position + data_size]
+        position = _align(position + data_size)
+
+
+def read_profraw_counters(profraw_file: str) -> Dict[FunctionKey, np.ndarray]:  # pylint: disable=too-many-locals
+    """Returns the counters of each function in the raw profile
+    |profraw_file|. Only the first profile is read if several are appended to
+    the file."""
+    with open(profraw_file, 'rb') as profraw:
+        data = profraw.read()
+    if len(data) < 16:
+        raise ValueError(f'Truncated raw profile: {profraw_file}.')
+
+    magic, version = struct.unpack_from('<QQ', data)
+    format_version = version & PROFRAW_VERSION_MASK
+    if magic != PROFRAW_MAGIC:
+        raise ValueError(f'Not a raw profile: {profraw_file}.')
+    if format_version not in PROFRAW_HEADER_FIELDS:
+        raise ValueError(f'Unsupported raw profile version: {format_version}.')
+    if version & VARIANT_MASK_DBG_CORRELATE:
+        raise ValueError('Raw profiles correlated with debug info are not '
+                         'supported.')
+
+    header_fields = PROFRAW_HEADER_FIELDS[format_version]
+    header = dict(
+        zip(header_fields, struct.unpack_from(f'<{len(header_fields)}Q', data)))
+    data_dtype = PROFRAW_DATA_DTYPES[format_version]
+    data_offset = 8 * len(header_fields) + header['binary_ids_size']
+    counters_offset = (data_offset + header['num_data'] * data_dtype.itemsize +
+                       header['padding_bytes_before_counters'])
+
+    if version & VARIANT_MASK_BYTE_COVERAGE:
+        # Single byte counters are cleared when their block is executed.
+        counter_size = 1
+        counters = (np.frombuffer(data,
+                                  dtype=np.uint8,
+                                  count=header['num_counters'],
+                                  offset=counters_offset) == 0).astype(
+                                      np.uint64)
+    else:
+        counter_size = 8
+        counters = np.frombuffer(data,
+                                 dtype='<u8',
+                                 count=header['num_counters'],
+                                 offset=counters_offset)
+    records = np.frombuffer(data,
+                            dtype=data_dtype,
+                            count=header['num_data'],
+                            offset=data_offset)
+
+    # Counter pointers are relative to their data record, and the counters
+    # delta is relative to the first data record.
+    record_offsets = np.arange(len(records),
+                               dtype=np.int64) * data_dtype.itemsize
+    counter_starts = (records['counter_ptr'] + record_offsets -
+                      np.int64(header['counters_delta'])) // counter_size
+    counter_ends = counter_starts + records['num_counters']
+    if len(records) and (counter_starts.min() < 0 or
+                         counter_ends.max() > len(counters)):
+        raise ValueError(f'Malformed raw profile: {profraw_file}.')
+
+    function_counters = {}
+    for name_ref, func_hash, start, end in zip(records['name_ref'].tolist(),
+                                               records['func_hash'].tolist(),
+                                               counter_starts.tolist(),
+                                               counter_ends.tolist()):
+        function_key = (name_ref, func_hash)
+        if function_key in function_counters:
+            # Functions with the same name and hash are merged like
+            # llvm-profdata does.
+            function_counters[function_key] = (function_counters[function_key] +
+                                               counters[start:end])
+        else:
+            function_counters[function_key] = counters[start:end]
+    return function_counters
+
+
+@functools.lru_cache(maxsize=None)
+def get_coverage_mapping(coverage_binary: str) -> Optional[CoverageMapping]:
+    """Returns the coverage mapping of |coverage_binary|, which is only read
+    once per process. Returns None if the mapping can't be read natively."""
+    try:
+        return CoverageMapping(coverage_binary)
+    except Exception:  # pylint: disable=broad-except
+        logger.error('Failed to read coverage mapping of %s natively.',
+                     coverage_binary)
+        return None
@@ -0,0 +1,146 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for scheduling snapshot measurement requests."""
+import collections
+import datetime
+from typing import Dict, List, Optional
+
+from common import experiment_utils
+from common import logs
+from experiment import scheduler
+import experiment.measurer.datatypes as measurer_datatypes
+
+logger = logs.Logger()
+
+
+class MeasureRequestScheduler:
+    """Decides the order in which SnapshotMeasureRequests are put in the
+    request queue.
+
+    Requests are prioritized by their measurement lag, the time elapsed since
+    the snapshot of their cycle was taken, so that trials that fell behind catch
+    up first. Requests are dispatched in rounds: every fuzzer-benchmark pair
+    with pending requests gets one request in a round before any pair gets
+    another one. Within a round, requests for the same benchmark are dispatched
+    consecutively so that workers keep using the same coverage binary."""
+
+    def __init__(self, max_queue_depth: Optional[int] = None):
+        # If set, requests are only dispatched while the request queue has less
+        # than |max_queue_depth| requests.
+        self.max_queue_depth = max_queue_depth
+        self.pending_requests = []
+        self.trial_start_times = {}
+
+    def update(self, unmeasured_snapshots: List[
+        measurer_datatypes.SnapshotMeasureRequest], queued_snapshots,
+               trial_start_times: Dict[int, datetime.datetime]):
+        """Replaces the pending requests with the |unmeasured_snapshots| that
+        are not in |queued_snapshots|."""
+        self.trial_start_times = trial_start_times
+        self.pending_requests = [
+            request for request in unmeasured_snapshots
+            if (request.trial_id, request.cycle) not in queued_snapshots
+        ]
+
+    def get_lag(self, request: measurer_datatypes.SnapshotMeasureRequest,
+                now: datetime.datetime) -> float:
+        """Returns the number of seconds since the snapshot for |request| was
+        taken. This is negative if the snapshot hasn't been taken yet and 0 if
+        the trial's start time is unknown."""
+        time_started = self.trial_start_times.get(request.trial_id)
+        if time_started is None:
+            return 0
+        snapshot_time = time_started + datetime.timedelta(
+            seconds=experiment_utils.get_cycle_time(request.cycle))
+        return (now - snapshot_time).total_seconds()
+
+    def get_ordered_requests(
+        self, lags: Dict[measurer_datatypes.SnapshotMeasureRequest, float]
+    ) -> List[measurer_datatypes.SnapshotMeasureRequest]:
+        """Returns the requests in |lags| in the order they should be
+        dispatched."""
+        pair_requests = collections.defaultdict(list)
+        for request in lags:
+            pair_requests[(request.fuzzer, request.benchmark)].append(request)
+
+        # Rounds of requests grouped by benchmark.
+        rounds = collections.defaultdict(lambda: collections.defaultdict(list))
+        for requests in pair_requests.values():
+            requests.sort(key=lambda request: -lags[request])
+            for round_num, request in enumerate(requests):
+                rounds[round_num][request.benchmark].append(request)
+
+        ordered_requests = []
+        for round_num in sorted(rounds):
+            benchmark_requests = sorted(
+                rounds[round_num].values(),
+                key=lambda requests: -max(lags[request]
+                                          for request in requests))
+            for requests in benchmark_requests:
+                ordered_requests.extend(
+                    sorted(requests, key=lambda request: -lags[request]))
+        return ordered_requests
+
+    def dispatch(self, request_queue, queued_snapshots) -> int:
+        """Puts pending requests whose snapshot has been taken in
+        |request_queue| in priority order and adds them to |queued_snapshots|.
+        Returns the number of dispatched requests."""
+        now = scheduler.datetime_now()
+        lags = {}
+        for request in self.pending_requests:
+            lag = self.get_lag(request, now)
+            # There is no point in measuring a snapshot that wasn't taken yet.
+            if lag >= 0:
+                lags[request] = lag
+
+        num_dispatched = 0
+        for request in self.get_ordered_requests(lags):
+            if (self.max_queue_depth is not None and
+                    request_queue.qsize() >= self.max_queue_depth):
+                break
+            request_queue.put(request)
+            queued_snapshots.add((request.trial_id, request.cycle))
+            num_dispatched += 1
+
+        self.pending_requests = [
+            request for request in self.pending_requests
+            if (request.trial_id, request.cycle) not in queued_snapshots
+        ]
+        self.log_metrics(request_queue, lags, num_dispatched)
+        return num_dispatched
+
+    def log_metrics(self, request_queue,
+                    lags: Dict[measurer_datatypes.SnapshotMeasureRequest,
+                               float], num_dispatched: int):
+        """Logs the depth of |request_queue| and the measurement lag of the due
+        requests in |lags|."""
+        metrics = {
+            'queue_depth':
+                request_queue.qsize(),
+            'pending_requests':
+                len(self.pending_requests),
+            'dispatched_requests':
+                num_dispatched,
+            'max_lag_seconds':
+                round(max(lags.values(), default=0)),
+            'mean_lag_seconds':
+                round(sum(lags.values()) / len(lags)) if lags else 0,
+        }
+        logger.info(
+            'Measurement queue depth: %d, pending requests: %d, '
+            'max lag: %ds.',
+            metrics['queue_depth'],
+            metrics['pending_requests'],
+            metrics['max_lag_seconds'],
+            extras=metrics)
@@ -14,14 +14,21 @@
 """Module for processing crashes."""
 
 import collections
+from concurrent import futures
+import json
 import os
 import re
+import tempfile
+from typing import Optional
 
 from clusterfuzz import stacktraces
 
+from common import experiment_utils
+from common import filesystem
 from common import logs
 from common import new_process
 from common import sanitizer
+from common import utils
 from experiment.measurer import run_coverage
 
 logger = logs.Logger()
@@ -31,6 +38,10 @@ Crash = collections.namedtuple('Crash', [
     'crash_stacktrace'
 ])
 
+# Maximum number of crashes that are reproduced at the same time by a measure
+# worker.
+MAX_CRASH_WORKERS = 4
+
 SIZE_REGEX = re.compile(r'\s([0-9]+|{\*})$', re.DOTALL)
 CPLUSPLUS_TEMPLATE_REGEX = re.compile(r'(<[^>]+>|<[^\n]+(?=\n))')
 
@@ -45,11 +56,17 @@ def _filter_crash_state(crash_state):
     return CPLUSPLUS_TEMPLATE_REGEX.sub('', crash_state)
 
 
+def _is_uninteresting_testcase(crash_testcase_path):
+    """Returns True if the name of |crash_testcase_path| shows it is an oom or a
+    timeout."""
+    crash_filename = os.path.basename(crash_testcase_path)
+    return (crash_filename.startswith('oom-') or
+            crash_filename.startswith('timeout-'))
+
+
 def process_crash(app_binary, crash_testcase_path, crashes_dir):
     """Returns the crashing unit in coverage_binary_output."""
-    crash_filename = os.path.basename(crash_testcase_path)
-    if (crash_filename.startswith('oom-') or
-            crash_filename.startswith('timeout-')):
+    if _is_uninteresting_testcase(crash_testcase_path):
         # Don't spend time processing ooms and timeouts as these are
         # uninteresting crashes anyway. These are also excluded below, but don't
         # process them in the first place based on filename.
@@ -101,14 +118,125 @@ def _get_crash_key(crash_result):
     return f'{crash_result.crash_type}:{crash_result.crash_state}'
 
 
-def do_crashes_run(app_binary, crashes_dir):
+def get_signature_cache_dir(benchmark: str) -> str:
+    """Returns the directory containing the crash signature cache for
+    |benchmark|."""
+    return os.path.join(experiment_utils.get_work_dir(),
+                        'crash-signature-cache', benchmark)
+
+
+class CrashSignatureCache:
+    """Cache mapping the hash of a testcase to the crash it causes when it is
+    reproduced with the app binary of a benchmark. It is shared by the measure
+    workers of all trials of the benchmark. Testcases that don't cause an
+    interesting crash aren't cached, since they may only fail to reproduce this
+    time."""
+
+    def __init__(self, benchmark: str):
+        self.cache_dir = get_signature_cache_dir(benchmark)
+
+    def _get_path(self, testcase_hash: str) -> str:
+        return os.path.join(self.cache_dir, testcase_hash + '.json')
+
+    def get(self, testcase_hash: str) -> Optional[Crash]:
+        """Returns the crash cached for |testcase_hash|, which doesn't have a
+        testcase, or None if it isn't cached."""
+        try:
+            with open(self._get_path(testcase_hash), encoding='utf-8') as file:
+                crash = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.error('Failed to read cached crash signature %s.',
+                         testcase_hash)
+            return None
+        if crash is None:
+            return None
+        return Crash(crash_testcase=None, **crash)
+
+    def put(self, testcase_hash: str, crash: Crash):
+        """Caches |crash| for |testcase_hash|."""
+        crash = crash._asdict()
+        del crash['crash_testcase']
+        filesystem.create_directory(self.cache_dir)
+        # Write to a temporary file first so that other workers never read a
+        # partially written entry.
+        with tempfile.NamedTemporaryFile('w',
+                                         dir=self.cache_dir,
+                                         delete=False,
+                                         encoding='utf-8') as file:
+            json.dump(crash, file)
+        os.replace(file.name, self._get_path(testcase_hash))
+
+
+def _get_unique_testcases(crashes_dir):
+    """Returns a dictionary mapping the hashes of the testcases in
+    |crashes_dir| to the path of one testcase with that hash."""
+    testcases = {}
+    for root, dirnames, filenames in os.walk(crashes_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            crash_testcase_path = os.path.join(root, filename)
+            if _is_uninteresting_testcase(crash_testcase_path):
+                continue
+            testcases.setdefault(utils.file_hash(crash_testcase_path),
+                                 crash_testcase_path)
+    return testcases
+
+
+def get_num_crash_workers(num_measure_workers: int) -> int:
+    """Returns the number of crashes each of |num_measure_workers| measure
+    workers can reproduce at the same time without them using more CPUs than
+    the machine has."""
+    num_cpus = os.cpu_count() or 1
+    return max(1, min(MAX_CRASH_WORKERS,
+                      num_cpus // max(num_measure_workers, 1)))
+
+
+def do_crashes_run(app_binary, crashes_dir, benchmark=None, num_workers=1):
     """Does a crashes run of |app_binary| on |crashes_dir|. Returns a list of
-    unique crashes."""
+    unique crashes. Testcases with the same contents are only reproduced once,
+    |num_workers| at a time. If |benchmark| is provided, the crashes are cached
+    so that crashing testcases are never reproduced again for |benchmark|."""
+    cache = CrashSignatureCache(benchmark) if benchmark else None
+    testcases = _get_unique_testcases(crashes_dir)
+    results = {}
+    uncached_testcases = {}
+    for testcase_hash, crash_testcase_path in testcases.items():
+        crash = cache.get(testcase_hash) if cache else None
+        if crash is not None:
+            results[testcase_hash] = crash._replace(
+                crash_testcase=os.path.relpath(crash_testcase_path,
+                                               crashes_dir))
+        else:
+            uncached_testcases[testcase_hash] = crash_testcase_path
+
+    if uncached_testcases:
+        logger.info('Reproducing %d of %d unique crashes.',
+                    len(uncached_testcases), len(testcases))
+        with futures.ThreadPoolExecutor(num_workers) as executor:
+            futures_to_hashes = {
+                executor.submit(process_crash, app_binary, crash_testcase_path,
+                                crashes_dir): testcase_hash for testcase_hash,
+                crash_testcase_path in uncached_testcases.items()
+            }
+            for future in futures.as_completed(futures_to_hashes):
+                testcase_hash = futures_to_hashes[future]
+                try:
+                    crash = future.result()
+                except Exception:  # pylint: disable=broad-except
+                    logger.error('Failed to reproduce crash %s.',
+                                 uncached_testcases[testcase_hash])
+                    continue
+                results[testcase_hash] = crash
+                if cache and crash is not None:
+                    cache.put(testcase_hash, crash)
+
     crashes = {}
-    for root, _, filenames in os.walk(crashes_dir):
-        for filename in filenames:
-            crash_testcase_path = os.path.join(root, filename)
-            crash = process_crash(app_binary, crash_testcase_path, crashes_dir)
-            if crash:
-                crashes[_get_crash_key(crash)] = crash
+    # Keep the order of the testcases so that the first testcase is reported
+    # for a crash key every time.
+    for testcase_hash in testcases:
+        crash = results.get(testcase_hash)
+        if crash:
+            crashes.setdefault(_get_crash_key(crash), crash)
     return crashes
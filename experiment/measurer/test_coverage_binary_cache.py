@@ -0,0 +1,76 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for coverage_binary_cache.py."""
+import os
+import stat
+import tarfile
+
+from experiment.measurer import coverage_binary_cache
+
+
+def _make_archive(tmp_path, name, contents):
+    """Makes a coverage build archive containing a fuzz target with
+    |contents| and a source file and returns its path."""
+    build_dir = tmp_path / (name + '-build')
+    (build_dir / 'src').mkdir(parents=True)
+    (build_dir / 'fuzz-target').write_text(contents)
+    (build_dir / 'src' / 'lib.c').write_text('int main() {}')
+    archive_path = tmp_path / (name + '.tar.gz')
+    with tarfile.open(archive_path, 'w:gz') as tar:
+        tar.add(build_dir, arcname='.')
+    return str(archive_path)
+
+
+def test_set_up(tmp_path):
+    """Tests that archives are extracted once and linked into every
+    destination."""
+    cache = coverage_binary_cache.CoverageBinaryCache(str(tmp_path / 'cache'))
+    archive_path = _make_archive(tmp_path, 'archive', 'binary')
+    destination_1 = tmp_path / 'experiment-1'
+    destination_2 = tmp_path / 'experiment-2'
+
+    assert not cache.set_up(archive_path, str(destination_1))
+    assert cache.set_up(archive_path, str(destination_2))
+
+    for destination in [destination_1, destination_2]:
+        assert (destination / 'fuzz-target').read_text() == 'binary'
+        assert (destination / 'src' / 'lib.c').exists()
+        # Linked files can't be changed in place, which would change the cache
+        # entry, but new files can be added.
+        assert not os.stat(destination / 'fuzz-target').st_mode & (
+            stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+        (destination / 'src' / 'new-file').write_text('new')
+    assert os.path.samefile(destination_1 / 'fuzz-target',
+                            destination_2 / 'fuzz-target')
+    assert len(cache.get_entries()) == 1
+
+
+def test_evict(tmp_path):
+    """Tests that the least recently used entries are evicted when the cache
+    outgrows its budget and that linked directories keep their files."""
+    cache = coverage_binary_cache.CoverageBinaryCache(str(tmp_path / 'cache'),
+                                                      max_size=50)
+    archive_paths = [
+        _make_archive(tmp_path, f'archive-{idx}',
+                      str(idx) * 20) for idx in range(3)
+    ]
+    for idx, archive_path in enumerate(archive_paths):
+        cache.set_up(archive_path, str(tmp_path / f'experiment-{idx}'))
+
+    # Entries use 33 bytes, so only the last one used fits in the budget.
+    assert len(cache.get_entries()) == 1
+    assert (tmp_path / 'experiment-0' / 'fuzz-target').read_text() == '0' * 20
+
+    # Using an evicted archive again extracts it again.
+    assert not cache.set_up(archive_paths[0], str(tmp_path / 'experiment-3'))
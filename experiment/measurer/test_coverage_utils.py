@@ -13,7 +13,12 @@
 # limitations under the License.
 """Tests for coverage_utils.py"""
 import os
+from unittest import mock
 
+import numpy as np
+import pytest
+
+from common import experiment_utils
 from experiment.measurer import coverage_utils
 
 TEST_DATA_PATH = os.path.join(os.path.dirname(__file__), 'test_data')
@@ -33,3 +38,98 @@ def test_extract_covered_branches_from_summary_json(fs):
     extract_covered_branches_from_summary_json(
         summary_json_file)
     assert len(covered_branches) == 9
+
+
+def test_extract_covered_ids_from_summary_json(fs):
+    """Tests that extract_covered_ids_from_summary_json returns one id for each
+    covered side of a branch."""
+    summary_json_file = get_test_data_path('cov_summary.json')
+    fs.add_real_file(summary_json_file, read_only=False)
+    covered_ids = coverage_utils.extract_covered_ids_from_summary_json(
+        summary_json_file)
+    assert len(covered_ids) == 9
+    assert list(covered_ids) == sorted(covered_ids)
+
+
+def test_extract_covered_ids_from_summary_json_regions(fs):
+    """Tests that extract_covered_ids_from_summary_json counts code regions
+    covered by template instantiations only once."""
+    summary_json_file = get_test_data_path('cov_summary.json')
+    fs.add_real_file(summary_json_file, read_only=False)
+    covered_ids = coverage_utils.extract_covered_ids_from_summary_json(
+        summary_json_file, region_coverage=True)
+    assert len(covered_ids) == 8
+
+
+def test_update_covered_ids(tmp_path):
+    """Tests that update_covered_ids stores the union of the covered ids."""
+    covered_ids_file = str(tmp_path / 'covered_ids.npy')
+    assert coverage_utils.update_covered_ids(covered_ids_file,
+                                             np.array([3, 1],
+                                                      dtype=np.uint64)) == 2
+    assert coverage_utils.update_covered_ids(covered_ids_file,
+                                             np.array([2, 3],
+                                                      dtype=np.uint64)) == 3
+    assert list(coverage_utils.load_covered_ids(covered_ids_file)) == [1, 2, 3]
+
+
+def test_iter_exported_functions_small_reads(tmp_path):
+    """Tests that iter_exported_functions handles functions and the functions
+    marker being split across reads."""
+    export_file = tmp_path / 'export.json'
+    export_file.write_text(
+        'warning: 1 functions have mismatched data\n'
+        '{"data":[{"files":[{"filename":"a.c"}],"functions":['
+        '{"name":"f","branches":[]},{"name":"g","branches":[[1]]}],'
+        '"totals":{}}]}')
+    with mock.patch('experiment.measurer.coverage_utils.EXPORT_READ_SIZE', 4):
+        functions = list(
+            coverage_utils.iter_exported_functions(str(export_file)))
+    assert functions == [{
+        'name': 'f',
+        'branches': []
+    }, {
+        'name': 'g',
+        'branches': [[1]]
+    }]
+
+
+def test_iter_exported_functions_no_functions(tmp_path):
+    """Tests that iter_exported_functions raises an error on files that are not
+    coverage exports."""
+    export_file = tmp_path / 'export.json'
+    export_file.write_text('{"data":[]}')
+    with pytest.raises(ValueError):
+        list(coverage_utils.iter_exported_functions(str(export_file)))
+
+
+def test_parse_coverage_export(fs):
+    """Tests that parse_coverage_export returns the branch and region records
+    of every function along with their files."""
+    summary_json_file = get_test_data_path('cov_summary.json')
+    fs.add_real_file(summary_json_file, read_only=False)
+    export = coverage_utils.parse_coverage_export(summary_json_file)
+    assert export.branches.shape[1] == coverage_utils.BRANCH_RECORD_WIDTH
+    assert export.regions.shape[1] == coverage_utils.REGION_RECORD_WIDTH
+    assert len(export.branch_files) == len(export.branches)
+    assert len(export.region_files) == len(export.regions)
+    assert max(export.branch_files) < len(export.filenames)
+
+
+def test_write_covered_branches_npz(tmp_path):
+    """Tests that write_covered_branches_npz stores the covered branches sorted
+    and in a small integer type."""
+    summary_json_file = get_test_data_path('cov_summary.json')
+    covered_branches = (
+        coverage_utils.extract_covered_branches_from_summary_json(
+            summary_json_file))
+    npz_file = str(tmp_path / experiment_utils.COVERED_BRANCHES_NPZ_FILENAME)
+    coverage_utils.write_covered_branches_npz(covered_branches[::-1], npz_file)
+    with np.load(npz_file) as npz:
+        branches = npz['branches']
+    assert branches.dtype.itemsize < covered_branches.dtype.itemsize
+    assert branches.tolist() == sorted(covered_branches.tolist())
+
+    coverage_utils.write_covered_branches_npz(covered_branches[:0], npz_file)
+    with np.load(npz_file) as npz:
+        assert npz['branches'].shape == (0, covered_branches.shape[1])
@@ -17,6 +17,7 @@ import shutil
 from unittest import mock
 import queue
 
+import numpy as np
 import pytest
 
 from common import experiment_utils
@@ -25,6 +26,7 @@ from database import models
 from database import utils as db_utils
 from experiment.build import build_utils
 from experiment.measurer import measure_manager
+from experiment.measurer import measurement_cursor
 from test_libs import utils as test_utils
 import experiment.measurer.datatypes as measurer_datatypes
 
@@ -68,6 +70,46 @@ def test_get_current_coverage(fs, experiment):
     assert covered_branches == 7
 
 
+def test_get_current_coverage_incremental(fs, experiment):
+    """Tests that get_current_coverage returns the number of covered ids after
+    they were updated from the json file when measuring incrementally."""
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        SNAPSHOT_LOGGER,
+        REGION_COVERAGE,
+        incremental_coverage=True)
+    json_cov_summary_file = get_test_data_path('cov_summary.json')
+    fs.add_real_file(json_cov_summary_file, read_only=False)
+    fs.create_dir(snapshot_measurer.report_dir)
+    snapshot_measurer.cov_summary_file = json_cov_summary_file
+    snapshot_measurer.update_covered_ids()
+    covered_branches = snapshot_measurer.get_current_coverage()
+    assert covered_branches == 9
+
+
+def test_get_current_coverage_incremental_accumulates(fs, experiment):
+    """Tests that get_current_coverage doesn't count the same branches twice
+    when they are covered again in a later cycle when measuring
+    incrementally."""
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        SNAPSHOT_LOGGER,
+        REGION_COVERAGE,
+        incremental_coverage=True)
+    json_cov_summary_file = get_test_data_path('cov_summary.json')
+    fs.add_real_file(json_cov_summary_file, read_only=False)
+    fs.create_dir(snapshot_measurer.report_dir)
+    snapshot_measurer.cov_summary_file = json_cov_summary_file
+    snapshot_measurer.update_covered_ids()
+    snapshot_measurer.update_covered_ids()
+    covered_branches = snapshot_measurer.get_current_coverage()
+    assert covered_branches == 9
+
+
 def test_get_current_coverage_error(fs, experiment):
     """Tests that get_current_coverage returns None from a
     defective json file."""
@@ -135,6 +177,36 @@ def test_generate_profdata_merge(mocked_execute, experiment, fs):
     assert args[0][0] == expected
 
 
+@mock.patch('common.new_process.execute')
+def test_generate_profdata_incremental(mocked_execute, experiment, fs):
+    """Tests that generate_profdata only merges the profraw files of the cycle
+    and not the profdata file of a previous cycle when measuring
+    incrementally."""
+    mocked_execute.return_value = new_process.ProcessResult(0, '', False)
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        SNAPSHOT_LOGGER,
+        REGION_COVERAGE,
+        incremental_coverage=True)
+    snapshot_measurer.profdata_file = '/work/reports/data.profdata'
+    snapshot_measurer.profraw_file_pattern = '/work/reports/data-%m.profraw'
+    profraw_file = '/work/reports/data-123.profraw'
+    fs.create_file(profraw_file, contents='fake_contents')
+    fs.create_file(snapshot_measurer.profdata_file, contents='fake_contents')
+    snapshot_measurer.generate_profdata(CYCLE)
+
+    expected = [
+        'llvm-profdata', 'merge', '-sparse', '/work/reports/data-123.profraw',
+        '-o', '/work/reports/data.profdata'
+    ]
+
+    assert (len(mocked_execute.call_args_list)) == 1
+    args = mocked_execute.call_args_list[0]
+    assert args[0][0] == expected
+
+
 @mock.patch('common.new_process.execute')
 @mock.patch('experiment.measurer.coverage_utils.get_coverage_binary')
 def test_generate_summary(mocked_get_coverage_binary, mocked_execute,
@@ -185,6 +257,22 @@ def test_measure_trial_coverage(mocked_measure_snapshot_coverage, mocked_queue,
     assert mocked_measure_snapshot_coverage.call_args_list == expected_calls
 
 
+@mock.patch('experiment.measurer.coverage_utils.generate_coverage_reports')
+@mock.patch('experiment.measurer.measure_manager.measure_manager_loop')
+@mock.patch('experiment.measurer.measure_manager.initialize_logs')
+def test_measure_main_old_config(_, mocked_measure_manager_loop, __,
+                                 experiment_config):
+    """Tests that measure_main uses the defaults of the options missing from
+    configs of experiments started before they existed."""
+    experiment_config['region_coverage'] = False
+    del experiment_config['corpus_format']
+    del experiment_config['incremental_coverage']
+    measure_manager.measure_main(experiment_config)
+    mocked_measure_manager_loop.assert_called_once_with(
+        experiment_config['experiment'], experiment_config['max_total_time'],
+        experiment_config['measurers_cpus'], False, 'tarball', False)
+
+
 @mock.patch('common.filestore_utils.ls')
 @mock.patch('common.filestore_utils.rsync')
 def test_measure_all_trials_not_ready(mocked_rsync, mocked_ls, experiment):
@@ -272,6 +360,194 @@ def test_run_cov_new_units(_, mocked_execute, fs, environ):
         assert args[arg] == value
 
 
+@mock.patch('common.new_process.execute')
+@mock.patch('experiment.measurer.coverage_utils.get_coverage_binary',
+            return_value=None)
+def test_run_cov_new_units_no_coverage_binary(_, mocked_execute, experiment):
+    """Tests that run_cov_new_units doesn't run anything when the coverage
+    binary of the benchmark is missing."""
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER, BENCHMARK, TRIAL_NUM, SNAPSHOT_LOGGER, REGION_COVERAGE)
+    snapshot_measurer.run_cov_new_units()
+    assert not mocked_execute.called
+
+
+def _write_unit(snapshot_measurer):
+    """Writes a unit to the corpus directory of |snapshot_measurer|."""
+    with open(os.path.join(snapshot_measurer.corpus_dir, 'unit'),
+              'w',
+              encoding='utf-8') as file_handle:
+        file_handle.write('unit')
+
+
+@mock.patch.object(measure_manager.SnapshotMeasurer,
+                   'generate_coverage_information',
+                   autospec=True)
+@mock.patch.object(measure_manager.SnapshotMeasurer, 'run_cov_new_units')
+def test_measure_new_units_reuses_cached_coverage(mocked_run_cov_new_units,
+                                                  mocked_generate_coverage,
+                                                  tmp_path, experiment):
+    """Tests that the seed corpus of a benchmark is only measured once."""
+    os.environ['WORK'] = str(tmp_path)
+
+    def generate_coverage_information(snapshot_measurer, cycle):
+        del cycle
+        shutil.copy(get_test_data_path('cov_summary.json'),
+                    snapshot_measurer.cov_summary_file)
+        with open(snapshot_measurer.profdata_file, 'w',
+                  encoding='utf-8') as file_handle:
+            file_handle.write('profdata')
+
+    mocked_generate_coverage.side_effect = generate_coverage_information
+    for trial_num in [1, 2]:
+        snapshot_measurer = measure_manager.SnapshotMeasurer(
+            FUZZER, BENCHMARK, trial_num, SNAPSHOT_LOGGER, REGION_COVERAGE)
+        snapshot_measurer.initialize_measurement_dirs()
+        _write_unit(snapshot_measurer)
+        snapshot_measurer.measure_new_units(0)
+        assert snapshot_measurer.get_current_coverage() == 7
+        assert snapshot_measurer.get_profile_files() == [
+            snapshot_measurer.profdata_file
+        ]
+
+    assert mocked_run_cov_new_units.call_count == 1
+    assert mocked_generate_coverage.call_count == 1
+
+
+@mock.patch.object(measure_manager.SnapshotMeasurer,
+                   'generate_coverage_information',
+                   autospec=True)
+@mock.patch.object(measure_manager.SnapshotMeasurer, 'run_cov_new_units')
+def test_measure_new_units_reuses_cached_coverage_incremental(
+        mocked_run_cov_new_units, mocked_generate_coverage, tmp_path,
+        experiment):
+    """Tests that the seed corpus of a benchmark is only measured once when
+    measuring incrementally."""
+    os.environ['WORK'] = str(tmp_path)
+
+    def generate_coverage_information(snapshot_measurer, cycle):
+        shutil.copy(get_test_data_path('cov_summary.json'),
+                    snapshot_measurer.cov_summary_file)
+        snapshot_measurer.update_covered_ids()
+        os.makedirs(snapshot_measurer.profdata_dir)
+        with open(snapshot_measurer.get_profdata_file(cycle),
+                  'w',
+                  encoding='utf-8') as file_handle:
+            file_handle.write('profdata')
+
+    mocked_generate_coverage.side_effect = generate_coverage_information
+    for trial_num in [1, 2]:
+        snapshot_measurer = measure_manager.SnapshotMeasurer(
+            FUZZER,
+            BENCHMARK,
+            trial_num,
+            SNAPSHOT_LOGGER,
+            REGION_COVERAGE,
+            incremental_coverage=True)
+        snapshot_measurer.initialize_measurement_dirs()
+        _write_unit(snapshot_measurer)
+        snapshot_measurer.measure_new_units(0)
+        assert snapshot_measurer.get_current_coverage() == 9
+        assert snapshot_measurer.get_profile_files() == [
+            snapshot_measurer.get_profdata_file(0)
+        ]
+
+    assert mocked_run_cov_new_units.call_count == 1
+    assert mocked_generate_coverage.call_count == 1
+
+
+@mock.patch('experiment.measurer.coverage_utils.get_coverage_binary')
+@mock.patch('experiment.measurer.native_coverage.get_coverage_mapping')
+def test_generate_coverage_information_native(mocked_get_coverage_mapping, _,
+                                              fs, experiment):
+    """Tests that generate_coverage_information reads the profraw files
+    natively and keeps them for the final coverage report."""
+    mocked_get_coverage_mapping.return_value.get_covered_ids.return_value = (
+        np.array([1, 2], dtype=np.uint64))
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        SNAPSHOT_LOGGER,
+        REGION_COVERAGE,
+        incremental_coverage=True)
+    snapshot_measurer.initialize_measurement_dirs()
+    profraw_file = os.path.join(snapshot_measurer.coverage_dir,
+                                'data-123.profraw')
+    fs.create_file(profraw_file, contents='fake_contents')
+    with mock.patch.object(snapshot_measurer,
+                           'generate_profdata') as mocked_generate_profdata:
+        snapshot_measurer.generate_coverage_information(CYCLE)
+
+    assert not mocked_generate_profdata.called
+    assert snapshot_measurer.get_current_coverage() == 2
+    assert snapshot_measurer.get_profile_files() == [
+        snapshot_measurer.get_profraw_file(CYCLE)
+    ]
+    assert not os.path.exists(profraw_file)
+
+
+@mock.patch('experiment.measurer.coverage_utils.get_coverage_binary')
+@mock.patch('experiment.measurer.native_coverage.get_coverage_mapping',
+            return_value=None)
+def test_generate_coverage_information_fallback(_, __, fs, experiment):
+    """Tests that generate_coverage_information falls back to llvm-profdata
+    when the coverage mapping can't be read natively."""
+    snapshot_measurer = measure_manager.SnapshotMeasurer(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        SNAPSHOT_LOGGER,
+        REGION_COVERAGE,
+        incremental_coverage=True)
+    snapshot_measurer.initialize_measurement_dirs()
+    fs.create_file(os.path.join(snapshot_measurer.coverage_dir,
+                                'data-123.profraw'),
+                   contents='fake_contents')
+    with mock.patch.object(snapshot_measurer,
+                           'generate_profdata') as mocked_generate_profdata:
+        snapshot_measurer.generate_coverage_information(CYCLE)
+
+    mocked_generate_profdata.assert_called_once_with(CYCLE)
+
+
+@pytest.mark.parametrize('incremental_coverage, archive_saved', [(False, True),
+                                                                 (True, False)])
+@mock.patch('experiment.measurer.measure_manager.save_coverage_archive',
+            return_value=True)
+@mock.patch.object(measure_manager.SnapshotMeasurer, 'get_fuzzer_stats')
+@mock.patch.object(measure_manager.SnapshotMeasurer,
+                   'process_crashes',
+                   return_value=[])
+@mock.patch.object(measure_manager.SnapshotMeasurer, 'measure_new_units')
+@mock.patch.object(measure_manager.SnapshotMeasurer, 'extract_corpus')
+@mock.patch('common.filestore_utils.cp')
+def test_measure_snapshot_coverage_saves_archive(  # pylint: disable=too-many-arguments
+        mocked_cp, _, __, ___, ____, mocked_save_coverage_archive,
+        incremental_coverage, archive_saved, tmp_path, experiment):
+    """Tests that measure_snapshot_coverage saves the coverage archive of every
+    cycle unless the coverage was measured natively."""
+    os.environ['WORK'] = str(tmp_path)
+
+    def copy_corpus_archive(_, dst, **kwargs):
+        del kwargs
+        with open(dst, 'w', encoding='utf-8') as file_handle:
+            file_handle.write('corpus')
+        return new_process.ProcessResult(0, '', False)
+
+    mocked_cp.side_effect = copy_corpus_archive
+    snapshot = measure_manager.measure_snapshot_coverage(
+        FUZZER,
+        BENCHMARK,
+        TRIAL_NUM,
+        CYCLE,
+        REGION_COVERAGE,
+        incremental_coverage=incremental_coverage)
+
+    assert snapshot
+    assert mocked_save_coverage_archive.called == archive_saved
+
+
 def get_test_data_path(*subpaths):
     """Returns the path of |subpaths| relative to TEST_DATA_PATH."""
     return os.path.join(TEST_DATA_PATH, *subpaths)
@@ -449,7 +725,9 @@ def test_consume_snapshot_type_from_response_queue():
     response_queue = queue.Queue()
     snapshot_identifier = (TRIAL_NUM, CYCLE)
     queued_snapshots_set = set([snapshot_identifier])
-    measured_snapshot = models.Snapshot(trial_id=TRIAL_NUM)
+    measured_snapshot = measurer_datatypes.MeasuredSnapshot(
+        CYCLE * experiment_utils.get_snapshot_seconds(), TRIAL_NUM, 10, None,
+        [])
     response_queue.put(measured_snapshot)
     assert response_queue.qsize() == 1
     snapshots = measure_manager.consume_snapshots_from_response_queue(
@@ -471,6 +749,8 @@ def test_measure_manager_inner_loop_break_condition(
     assert not continue_inner_loop
 
 
+@mock.patch('experiment.measurer.measurement_cursor.query_trial_start_times',
+            mock.Mock(return_value={}))
 @mock.patch('experiment.measurer.measure_manager.get_unmeasured_snapshots')
 @mock.patch(
     'experiment.measurer.measure_manager.consume_snapshots_from_response_queue')
@@ -490,15 +770,19 @@ def test_measure_manager_inner_loop_writes_to_request_queue(
     assert request_queue.qsize() == 1
 
 
+@mock.patch('experiment.measurer.measurement_cursor.query_trial_start_times',
+            mock.Mock(return_value={}))
 @mock.patch('experiment.measurer.measure_manager.get_unmeasured_snapshots')
 @mock.patch(
     'experiment.measurer.measure_manager.consume_snapshots_from_response_queue')
-@mock.patch('database.utils.add_all')
+@mock.patch('database.utils.bulk_upsert_snapshots')
 def test_measure_manager_inner_loop_dont_write_to_db(
-        mocked_add_all, mocked_consume_snapshots_from_response_queue,
+        mocked_bulk_upsert_snapshots,
+        mocked_consume_snapshots_from_response_queue,
         mocked_get_unmeasured_snapshots):
-    """Tests that the measure manager inner loop does not call add_all to write
-    to the database, when there are no measured snapshots to be written."""
+    """Tests that the measure manager inner loop does not call
+    bulk_upsert_snapshots to write to the database, when there are no measured
+    snapshots to be written."""
     mocked_get_unmeasured_snapshots.return_value = [
         measurer_datatypes.SnapshotMeasureRequest('fuzzer', 'benchmark', 0, 0)
     ]
@@ -507,25 +791,64 @@ def test_measure_manager_inner_loop_dont_write_to_db(
     mocked_consume_snapshots_from_response_queue.return_value = []
     measure_manager.measure_manager_inner_loop('experiment', 1, request_queue,
                                                response_queue, set())
-    mocked_add_all.not_called()
+    mocked_bulk_upsert_snapshots.not_called()
 
 
+@mock.patch('experiment.measurer.measurement_cursor.query_trial_start_times',
+            mock.Mock(return_value={}))
 @mock.patch('experiment.measurer.measure_manager.get_unmeasured_snapshots')
 @mock.patch(
     'experiment.measurer.measure_manager.consume_snapshots_from_response_queue')
-@mock.patch('database.utils.add_all')
+@mock.patch('database.utils.bulk_upsert_snapshots')
 def test_measure_manager_inner_loop_writes_to_db(
-        mocked_add_all, mocked_consume_snapshots_from_response_queue,
+        mocked_bulk_upsert_snapshots,
+        mocked_consume_snapshots_from_response_queue,
         mocked_get_unmeasured_snapshots):
-    """Tests that the measure manager inner loop calls add_all to write
-    to the database, when there are measured snapshots to be written."""
+    """Tests that the measure manager inner loop calls bulk_upsert_snapshots to
+    write to the database, when there are measured snapshots to be written."""
     mocked_get_unmeasured_snapshots.return_value = [
         measurer_datatypes.SnapshotMeasureRequest('fuzzer', 'benchmark', 0, 0)
     ]
     request_queue = queue.Queue()
     response_queue = queue.Queue()
-    snapshot_model = models.Snapshot(trial_id=1)
-    mocked_consume_snapshots_from_response_queue.return_value = [snapshot_model]
+    measured_snapshot = measurer_datatypes.MeasuredSnapshot(0, 1, 10, None, [])
+    mocked_consume_snapshots_from_response_queue.return_value = [
+        measured_snapshot
+    ]
     measure_manager.measure_manager_inner_loop('experiment', 1, request_queue,
                                                response_queue, set())
-    mocked_add_all.assert_called_with([snapshot_model])
+    mocked_bulk_upsert_snapshots.assert_called_with([measured_snapshot])
+
+
+@mock.patch('experiment.measurer.measure_manager.get_unmeasured_snapshots')
+@mock.patch(
+    'experiment.measurer.measure_manager.consume_snapshots_from_response_queue')
+@mock.patch('database.utils.bulk_upsert_snapshots')
+def test_measure_manager_inner_loop_cursor(
+        mocked_bulk_upsert_snapshots,
+        mocked_consume_snapshots_from_response_queue,
+        mocked_get_unmeasured_snapshots, experiment):
+    """Tests that the measure manager inner loop gets the snapshots to measure
+    from the cursor instead of the database and advances it with the measured
+    snapshots."""
+    request = measurer_datatypes.SnapshotMeasureRequest('fuzzer', 'benchmark',
+                                                        1, 0)
+    measured_snapshot = measurer_datatypes.MeasuredSnapshot(0, 1, 10, None, [])
+    mocked_consume_snapshots_from_response_queue.return_value = [
+        measured_snapshot
+    ]
+    cursor = mock.Mock(spec=measurement_cursor.MeasurementCursor)
+    cursor.get_unmeasured_snapshots.return_value = [request]
+    cursor.get_trial_start_times.return_value = {}
+    request_queue = queue.Queue()
+    queued_snapshots = set()
+    assert measure_manager.measure_manager_inner_loop('experiment',
+                                                      1,
+                                                      request_queue,
+                                                      queue.Queue(),
+                                                      queued_snapshots,
+                                                      cursor=cursor)
+    assert request_queue.get_nowait() == request
+    assert not mocked_get_unmeasured_snapshots.called
+    cursor.advance.assert_called_with([measured_snapshot])
+    assert not queued_snapshots
@@ -15,7 +15,6 @@
 import multiprocessing
 import pytest
 
-from database.models import Snapshot
 from experiment.measurer import measure_worker
 import experiment.measurer.datatypes as measurer_datatypes
 
@@ -39,11 +38,11 @@ def test_put_snapshot_in_response_queue(local_measure_worker):  # pylint: disabl
     in response_queue"""
     request = measurer_datatypes.SnapshotMeasureRequest('fuzzer', 'benchmark',
                                                         1, 0)
-    snapshot = Snapshot(trial_id=1)
+    snapshot = measurer_datatypes.MeasuredSnapshot(0, 1, 10, None, [])
     local_measure_worker.put_result_in_response_queue(snapshot, request)
     response_queue = local_measure_worker.response_queue
     assert response_queue.qsize() == 1
-    assert isinstance(response_queue.get(), Snapshot)
+    assert response_queue.get() == snapshot
 
 
 def test_put_retry_in_response_queue(local_measure_worker):  # pylint: disable=redefined-outer-name
@@ -0,0 +1,119 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for measurement_cursor.py."""
+import datetime
+
+import pytest
+
+from database import models
+from database import utils as db_utils
+from experiment.measurer import measurement_cursor
+import experiment.measurer.datatypes as measurer_datatypes
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+EXPERIMENT = 'experiment'
+TIME_STARTED = datetime.datetime(2024, 1, 1)
+SNAPSHOT_SECONDS = 15 * 60
+MAX_CYCLE = 4
+
+
+def _get_trial(time_started=TIME_STARTED, preempted=False):
+    return models.Trial(experiment=EXPERIMENT,
+                        fuzzer='fuzzer',
+                        benchmark='benchmark',
+                        time_started=time_started,
+                        preempted=preempted)
+
+
+def _get_snapshot(trial, cycle):
+    return models.Snapshot(trial=trial,
+                           time=cycle * SNAPSHOT_SECONDS,
+                           edges_covered=cycle)
+
+
+@pytest.fixture
+def db_trials(db):
+    """Populates the database with trials in different states and returns
+    them."""
+    trials = {
+        'measured': _get_trial(),
+        'unmeasured': _get_trial(),
+        'not_started': _get_trial(time_started=None),
+        'preempted': _get_trial(preempted=True),
+        'measured_preempted': _get_trial(preempted=True),
+    }
+    db_utils.add_all([models.Experiment(name=EXPERIMENT)])
+    db_utils.add_all(list(trials.values()))
+    db_utils.add_all([
+        _get_snapshot(trials['measured'], 0),
+        _get_snapshot(trials['measured'], 2),
+        _get_snapshot(trials['measured_preempted'], 0),
+    ])
+    return trials
+
+
+def _get_request(trial, cycle):
+    return measurer_datatypes.SnapshotMeasureRequest('fuzzer', 'benchmark',
+                                                     trial.id, cycle)
+
+
+def test_seed(db_trials):
+    """Tests that the cursor is seeded with the next cycle of the trials that
+    need measuring."""
+    cursor = measurement_cursor.MeasurementCursor(EXPERIMENT, MAX_CYCLE)
+    cursor.refresh()
+    assert sorted(cursor.get_unmeasured_snapshots()) == sorted([
+        _get_request(db_trials['measured'], 3),
+        _get_request(db_trials['unmeasured'], 0),
+        _get_request(db_trials['measured_preempted'], 1),
+    ])
+    assert cursor.get_trial_start_times()[db_trials['measured'].id] == (
+        TIME_STARTED.replace(tzinfo=datetime.timezone.utc))
+
+
+def test_refresh_and_advance(db_trials):
+    """Tests that the cursor picks up new trials and advances with measured
+    snapshots until the last cycle."""
+    cursor = measurement_cursor.MeasurementCursor(EXPERIMENT, MAX_CYCLE)
+    cursor.refresh()
+    new_trial = _get_trial()
+    db_utils.add_all([new_trial])
+    cursor.refresh()
+    cursor.advance([
+        measurer_datatypes.MeasuredSnapshot(3 * SNAPSHOT_SECONDS,
+                                            db_trials['measured'].id, 10, None,
+                                            []),
+        measurer_datatypes.MeasuredSnapshot(4 * SNAPSHOT_SECONDS,
+                                            db_trials['measured'].id, 10, None,
+                                            []),
+        measurer_datatypes.MeasuredSnapshot(0, db_trials['unmeasured'].id, 10,
+                                            None, []),
+    ])
+    assert sorted(cursor.get_unmeasured_snapshots()) == sorted([
+        _get_request(db_trials['unmeasured'], 1),
+        _get_request(db_trials['measured_preempted'], 1),
+        _get_request(new_trial, 0),
+    ])
+
+
+def test_query_trial_start_times(db):
+    """Tests that query_trial_start_times returns the start times of the
+    started trials of the experiment."""
+    trials = [_get_trial(), _get_trial(time_started=None)]
+    db_utils.add_all([models.Experiment(name=EXPERIMENT)])
+    db_utils.add_all(trials)
+    assert measurement_cursor.query_trial_start_times(EXPERIMENT) == {
+        trials[0].id: TIME_STARTED.replace(tzinfo=datetime.timezone.utc)
+    }
@@ -0,0 +1,282 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for native_coverage.py"""
+import hashlib
+import struct
+
+import pytest
+
+from experiment.measurer import coverage_utils
+from experiment.measurer import native_coverage
+
+# pylint: disable=redefined-outer-name
+
+FUNCTION_NAME = b'check'
+FUNCTION_HASH = 0x1234
+FILENAMES = ['/src', 'check.c']
+PROFRAW_VERSION = 8
+
+
+def _uleb128(value):
+    """Returns |value| encoded as unsigned LEB128."""
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _pad(data):
+    """Returns |data| padded to a multiple of 8 bytes."""
+    return data + b'\0' * (-len(data) % 8)
+
+
+def _md5_hash(data):
+    return int.from_bytes(hashlib.md5(data).digest()[:8], 'little')
+
+
+def _counter(index):
+    return index << 2 | native_coverage.COUNTER_REFERENCE
+
+
+def _subtract(expression_index):
+    return expression_index << 2 | native_coverage.COUNTER_SUBTRACT
+
+
+def _encode_names(names):
+    names = b'\x01'.join(names)
+    return _uleb128(len(names)) + _uleb128(0) + names
+
+
+def _encode_filenames(filenames):
+    encoded_filenames = b''.join(
+        _uleb128(len(filename)) + filename.encode() for filename in filenames)
+    return (_uleb128(len(filenames)) + _uleb128(len(encoded_filenames)) +
+            _uleb128(0) + encoded_filenames)
+
+
+def _encode_region(counter, location, previous_line_start, false_counter=None):
+    """Encodes a code region, or a branch region if |false_counter| is set."""
+    line_start, column_start, line_end, column_end = location
+    if false_counter is None:
+        encoded = _uleb128(counter)
+    else:
+        encoded = (_uleb128(native_coverage.BRANCH_REGION << 3) +
+                   _uleb128(counter) + _uleb128(false_counter))
+    return encoded + b''.join(
+        _uleb128(value)
+        for value in (line_start - previous_line_start, column_start,
+                      line_end - line_start, column_end))
+
+
+def _encode_mapping():
+    """Encodes the mapping of a function like:
+
+    int check(int x) {
+      if (x)
+        return 1;
+      return 0;
+    }
+    """
+    regions = [
+        _encode_region(_counter(0), (1, 18, 5, 2), 0),
+        _encode_region(_counter(1), (2, 7, 2, 8), 1, _subtract(0)),
+        _encode_region(_counter(1), (3, 5, 3, 13), 2),
+        _encode_region(_subtract(0), (4, 3, 4, 11), 3),
+    ]
+    return (_uleb128(1) + _uleb128(1) + _uleb128(1) + _uleb128(_counter(0)) +
+            _uleb128(_counter(1)) + _uleb128(len(regions)) + b''.join(regions))
+
+
+def _encode_coverage_sections():
+    """Returns the contents of the coverage mapping sections of a binary
+    containing the function |FUNCTION_NAME|."""
+    filenames = _encode_filenames(FILENAMES)
+    covmap = _pad(
+        native_coverage.COVMAP_HEADER.pack(0, len(
+            filenames), 0, native_coverage.COVMAP_VERSION_6) + filenames)
+    mapping = _encode_mapping()
+    covfun = _pad(
+        native_coverage.COVFUN_RECORD_HEADER.pack(_md5_hash(
+            FUNCTION_NAME), len(mapping), FUNCTION_HASH, _md5_hash(filenames)) +
+        mapping)
+    return {
+        '__llvm_covmap': covmap,
+        '__llvm_covfun': covfun,
+        '__llvm_prf_names': _pad(_encode_names([FUNCTION_NAME])),
+    }
+
+
+def write_elf_file(path, sections):
+    """Writes an x86-64 ELF file containing |sections| to |path|."""
+    names = b'\0' + b''.join(name.encode() + b'\0' for name in sections)
+    names += b'.shstrtab\0'
+    contents = b''
+    section_headers = [native_coverage.ELF_SECTION_HEADER.pack(*[0] * 10)]
+    offset = native_coverage.ELF_HEADER.size
+    name_offset = 1
+    for name, data in list(sections.items()) + [('.shstrtab', names)]:
+        is_names = name == '.shstrtab'
+        section_headers.append(
+            native_coverage.ELF_SECTION_HEADER.pack(
+                name_offset, 3 if is_names else 1, 0 if is_names else 2,
+                0 if is_names else 0x10000 + offset, offset, len(data), 0, 0,
+                1 if is_names else 8, 0))
+        contents += _pad(data)
+        offset += len(_pad(data))
+        name_offset += len(name) + 1
+
+    header = native_coverage.ELF_HEADER.pack(
+        b'\x7fELF\x02\x01\x01' + b'\0' * 9, 2, 62, 1, 0, 0, offset, 0,
+        native_coverage.ELF_HEADER.size, 0, 0,
+        native_coverage.ELF_SECTION_HEADER.size, len(section_headers),
+        len(section_headers) - 1)
+    with open(path, 'wb') as elf_file:
+        elf_file.write(header + contents + b''.join(section_headers))
+
+
+def write_profraw_file(path, counters, version=PROFRAW_VERSION):
+    """Writes a raw profile with |counters| for |FUNCTION_NAME| to |path|."""
+    data_dtype = native_coverage.PROFRAW_DATA_DTYPES[version]
+    # Counter pointers are relative to the data record.
+    data_record = bytearray(data_dtype.itemsize)
+    struct.pack_into('<QQq', data_record, 0, _md5_hash(FUNCTION_NAME),
+                     FUNCTION_HASH, data_dtype.itemsize)
+    struct.pack_into('<I', data_record, data_dtype.fields['num_counters'][1],
+                     len(counters))
+    names = _encode_names([FUNCTION_NAME])
+    header = {
+        'magic': native_coverage.PROFRAW_MAGIC,
+        'version': version,
+        'num_data': 1,
+        'num_counters': len(counters),
+        'names_size': len(names),
+        'counters_delta': data_dtype.itemsize,
+        'value_kind_last': 1,
+    }
+    header_fields = native_coverage.PROFRAW_HEADER_FIELDS[version]
+    with open(path, 'wb') as profraw_file:
+        profraw_file.write(
+            struct.pack(f'<{len(header_fields)}Q', *
+                        [header.get(field, 0) for field in header_fields]) +
+            data_record + struct.pack(f'<{len(counters)}Q', *counters) +
+            _pad(names))
+
+
+@pytest.fixture
+def coverage_binary(tmp_path):
+    """Returns the path of a binary with coverage mapping sections."""
+    binary_path = str(tmp_path / 'fuzz-target')
+    write_elf_file(binary_path, _encode_coverage_sections())
+    return binary_path
+
+
+def test_read_elf_sections(coverage_binary):
+    """Tests that read_elf_sections returns the requested sections."""
+    sections = native_coverage.read_elf_sections(coverage_binary,
+                                                 {'__llvm_prf_names'})
+    assert sections == {
+        '__llvm_prf_names': _encode_coverage_sections()['__llvm_prf_names']
+    }
+
+
+def test_parse_mapping_regions():
+    """Tests that parse_mapping_regions decodes the regions of a function and
+    resolves their filenames."""
+    expressions, regions = native_coverage.parse_mapping_regions(
+        _encode_mapping(), ['/src', '/src/check.c'])
+    assert expressions == [(native_coverage.COUNTER_SUBTRACT, _counter(0),
+                            _counter(1))]
+    assert regions == [
+        (native_coverage.CODE_REGION, _counter(0), 0, '/src/check.c', (1, 18, 5,
+                                                                       2)),
+        (native_coverage.BRANCH_REGION, _counter(1), _subtract(0),
+         '/src/check.c', (2, 7, 2, 8)),
+        (native_coverage.CODE_REGION, _counter(1), 0, '/src/check.c', (3, 5, 3,
+                                                                       13)),
+        (native_coverage.CODE_REGION, _subtract(0), 0, '/src/check.c', (4, 3, 4,
+                                                                        11)),
+    ]
+
+
+@pytest.mark.parametrize('version', [8, 9, 10])
+def test_read_profraw_counters(tmp_path, version):
+    """Tests that read_profraw_counters returns the counters of each
+    function."""
+    profraw_file = str(tmp_path / 'data.profraw')
+    write_profraw_file(profraw_file, [5, 2], version)
+    function_counters = native_coverage.read_profraw_counters(profraw_file)
+    assert list(function_counters) == [(_md5_hash(FUNCTION_NAME), FUNCTION_HASH)
+                                      ]
+    assert list(function_counters[(_md5_hash(FUNCTION_NAME),
+                                   FUNCTION_HASH)]) == [5, 2]
+
+
+def test_read_profraw_counters_unsupported_version(tmp_path):
+    """Tests that read_profraw_counters raises an error on raw profile versions
+    that it doesn't support."""
+    profraw_file = str(tmp_path / 'data.profraw')
+    write_profraw_file(profraw_file, [5, 2])
+    with open(profraw_file, 'r+b') as profraw:
+        profraw.seek(8)
+        profraw.write(struct.pack('<Q', 4))
+    with pytest.raises(ValueError):
+        native_coverage.read_profraw_counters(profraw_file)
+
+
+@pytest.mark.parametrize(('counters', 'expected_sides'), [([5, 2], [0, 1]),
+                                                          ([5, 5], [0]),
+                                                          ([5, 0], [1]),
+                                                          ([0, 0], [])])
+def test_get_covered_branch_ids(coverage_binary, tmp_path, counters,
+                                expected_sides):
+    """Tests that get_covered_ids returns the covered sides of branches,
+    evaluating counter expressions."""
+    profraw_file = str(tmp_path / 'data.profraw')
+    write_profraw_file(profraw_file, counters)
+    coverage_mapping = native_coverage.CoverageMapping(coverage_binary)
+    covered_ids = coverage_mapping.get_covered_ids([profraw_file])
+    assert sorted(covered_ids) == sorted(
+        coverage_utils.get_coverage_id('/src/check.c', [2, 7, 2, 8], side)
+        for side in expected_sides)
+
+
+def test_get_covered_region_ids(coverage_binary, tmp_path):
+    """Tests that get_covered_ids returns the covered code regions, summing the
+    counters of several profiles."""
+    profraw_files = [
+        str(tmp_path / 'data-1.profraw'),
+        str(tmp_path / 'data-2.profraw')
+    ]
+    write_profraw_file(profraw_files[0], [1, 0])
+    write_profraw_file(profraw_files[1], [1, 1])
+    coverage_mapping = native_coverage.CoverageMapping(coverage_binary)
+    covered_ids = coverage_mapping.get_covered_ids(profraw_files,
+                                                   region_coverage=True)
+    assert sorted(covered_ids) == sorted(
+        coverage_utils.get_coverage_id('/src/check.c', location)
+        for location in [(1, 18, 5, 2), (3, 5, 3, 13), (4, 3, 4, 11)])
+
+
+def test_get_covered_ids_missing_counters(coverage_binary, tmp_path):
+    """Tests that get_covered_ids ignores functions whose profile doesn't have
+    all the counters referenced by the mapping, like llvm-cov."""
+    profraw_file = str(tmp_path / 'data.profraw')
+    write_profraw_file(profraw_file, [5])
+    coverage_mapping = native_coverage.CoverageMapping(coverage_binary)
+    assert not len(coverage_mapping.get_covered_ids([profraw_file]))  # pylint: disable=len-as-condition
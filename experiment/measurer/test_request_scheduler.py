@@ -0,0 +1,88 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for request_scheduler.py."""
+import datetime
+import os
+from unittest import mock
+import queue
+
+from experiment.measurer import request_scheduler
+import experiment.measurer.datatypes as measurer_datatypes
+
+# pylint: disable=unused-argument
+
+TIME_STARTED = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _get_measure_request(fuzzer, benchmark, trial_id, cycle=1):
+    return measurer_datatypes.SnapshotMeasureRequest(fuzzer, benchmark,
+                                                     trial_id, cycle)
+
+
+@mock.patch('experiment.scheduler.datetime_now')
+def test_measure_request_scheduler_order(mocked_datetime_now, experiment):
+    """Tests that MeasureRequestScheduler dispatches the most lagging requests
+    first, one per fuzzer-benchmark pair per round, grouping the requests of a
+    round by benchmark."""
+    os.environ['SNAPSHOT_PERIOD'] = '10'
+    mocked_datetime_now.return_value = TIME_STARTED + datetime.timedelta(
+        seconds=100)
+    requests = [
+        _get_measure_request('fuzzer-a', 'benchmark-1', 1, 9),
+        _get_measure_request('fuzzer-a', 'benchmark-1', 2, 1),
+        _get_measure_request('fuzzer-a', 'benchmark-2', 3, 2),
+        _get_measure_request('fuzzer-b', 'benchmark-1', 4, 8),
+        _get_measure_request('fuzzer-b', 'benchmark-2', 5, 3),
+        _get_measure_request('fuzzer-b', 'benchmark-2', 6, 4),
+    ]
+    measure_scheduler = request_scheduler.MeasureRequestScheduler()
+    measure_scheduler.update(
+        requests, set(),
+        {request.trial_id: TIME_STARTED for request in requests})
+    request_queue = queue.Queue()
+    queued_snapshots = set()
+    assert measure_scheduler.dispatch(request_queue, queued_snapshots) == 6
+    dispatched_trial_ids = [
+        request_queue.get_nowait().trial_id for _ in range(6)
+    ]
+    assert dispatched_trial_ids == [2, 4, 3, 5, 6, 1]
+    assert len(queued_snapshots) == 6
+    assert not measure_scheduler.pending_requests
+
+
+@mock.patch('experiment.scheduler.datetime_now')
+def test_measure_request_scheduler_holds_requests(mocked_datetime_now,
+                                                  experiment):
+    """Tests that MeasureRequestScheduler doesn't dispatch requests for
+    snapshots that weren't taken yet, that were already queued, or that don't
+    fit in the request queue."""
+    os.environ['SNAPSHOT_PERIOD'] = '10'
+    mocked_datetime_now.return_value = TIME_STARTED + datetime.timedelta(
+        seconds=25)
+    requests = [
+        _get_measure_request('fuzzer', 'benchmark', 1, 3),
+        _get_measure_request('fuzzer', 'benchmark', 2, 2),
+        _get_measure_request('fuzzer', 'benchmark', 3, 1),
+        _get_measure_request('fuzzer', 'benchmark', 4, 0),
+    ]
+    measure_scheduler = request_scheduler.MeasureRequestScheduler(
+        max_queue_depth=1)
+    queued_snapshots = {(4, 0)}
+    measure_scheduler.update(
+        requests, queued_snapshots,
+        {request.trial_id: TIME_STARTED for request in requests})
+    request_queue = queue.Queue()
+    assert measure_scheduler.dispatch(request_queue, queued_snapshots) == 1
+    assert request_queue.get_nowait() == requests[2]
+    assert measure_scheduler.pending_requests == requests[:2]
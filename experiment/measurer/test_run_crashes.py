@@ -14,11 +14,14 @@
 """Tests for run_coverage.py."""
 
 import os
+from unittest import mock
 
 import pytest
 
 from experiment.measurer import run_crashes
 
+# pylint: disable=redefined-outer-name,unused-argument
+
 TEST_DATA_PATH = os.path.join(os.path.dirname(__file__), 'test_data',
                               'test_run_crashes')
 
@@ -71,3 +74,97 @@ def test_filter_crash_state():
             'Segv on unknown address:int* std::__1::fill_n\n'
             'int arrow::util::RleDecoder::GetBatchWithDict\n'
             'parquet::DictDecoderImpl\n')
+
+
+def _get_crash(crash_testcase, crash_state='state'):
+    return run_crashes.Crash(crash_testcase=crash_testcase,
+                             crash_type='type',
+                             crash_address='address',
+                             crash_state=crash_state,
+                             crash_stacktrace='stacktrace')
+
+
+def _process_crash(app_binary, crash_testcase_path, crashes_dir):
+    """Fake process_crash where testcases crash with their contents as the
+    crash state, unless they are empty."""
+    with open(crash_testcase_path, encoding='utf-8') as testcase:
+        crash_state = testcase.read()
+    if not crash_state:
+        return None
+    return _get_crash(os.path.relpath(crash_testcase_path, crashes_dir),
+                      crash_state)
+
+
+@pytest.fixture
+def crashes_dir(tmp_path):
+    """Returns a crashes directory with duplicate testcases."""
+    crashes_dir = tmp_path / 'crashes'
+    crashes_dir.mkdir()
+    for filename, contents in [('crash-a', 'a'), ('crash-b', 'a'),
+                               ('crash-c', 'c'), ('crash-d', ''),
+                               ('oom-e', 'e')]:
+        (crashes_dir / filename).write_text(contents)
+    return str(crashes_dir)
+
+
+@mock.patch('experiment.measurer.run_crashes.process_crash',
+            side_effect=_process_crash)
+def test_do_crashes_run_deduplicates(mocked_process_crash, crashes_dir):
+    """Tests that do_crashes_run reproduces testcases with the same contents
+    only once and skips ooms."""
+    crashes = run_crashes.do_crashes_run('fuzz-target', crashes_dir)
+    assert sorted(
+        os.path.basename(call.args[1])
+        for call in mocked_process_crash.call_args_list) == [
+            'crash-a', 'crash-c', 'crash-d'
+        ]
+    assert crashes == {
+        'type:a': _get_crash('crash-a', 'a'),
+        'type:c': _get_crash('crash-c', 'c'),
+    }
+
+
+@mock.patch('experiment.measurer.run_crashes.process_crash',
+            side_effect=_process_crash)
+def test_do_crashes_run_cache(mocked_process_crash, crashes_dir, tmp_path,
+                              environ):
+    """Tests that do_crashes_run doesn't reproduce crashing testcases again
+    once their crashes are cached for the benchmark, but reproduces the
+    testcases that didn't crash."""
+    os.environ['WORK'] = str(tmp_path)
+    crashes = run_crashes.do_crashes_run('fuzz-target', crashes_dir,
+                                         'benchmark')
+    mocked_process_crash.reset_mock()
+    os.remove(os.path.join(crashes_dir, 'crash-a'))
+    crashes['type:a'] = _get_crash('crash-b', 'a')
+    assert run_crashes.do_crashes_run('fuzz-target', crashes_dir,
+                                      'benchmark') == crashes
+    assert [
+        os.path.basename(call.args[1])
+        for call in mocked_process_crash.call_args_list
+    ] == ['crash-d']
+
+
+@mock.patch('experiment.measurer.run_crashes.process_crash')
+def test_do_crashes_run_keeps_first_testcase(mocked_process_crash, crashes_dir):
+    """Tests that do_crashes_run reports the first testcase of the crashes with
+    the same crash key."""
+    mocked_process_crash.side_effect = (
+        lambda app_binary, crash_testcase_path, crashes_dir: _get_crash(
+            os.path.relpath(crash_testcase_path, crashes_dir)))
+    assert run_crashes.do_crashes_run(
+        'fuzz-target', crashes_dir,
+        num_workers=run_crashes.MAX_CRASH_WORKERS) == {
+            'type:state': _get_crash('crash-a')
+        }
+
+
+@pytest.mark.parametrize(('num_measure_workers', 'expected_num_workers'),
+                         [(1, run_crashes.MAX_CRASH_WORKERS), (4, 2), (8, 1),
+                          (16, 1)])
+@mock.patch('os.cpu_count', return_value=8)
+def test_get_num_crash_workers(_, num_measure_workers, expected_num_workers):
+    """Tests that get_num_crash_workers shares the CPUs between the measure
+    workers."""
+    assert run_crashes.get_num_crash_workers(
+        num_measure_workers) == expected_num_workers
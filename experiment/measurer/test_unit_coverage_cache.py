@@ -0,0 +1,89 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for unit_coverage_cache.py."""
+import os
+
+from experiment.measurer import unit_coverage_cache
+
+BENCHMARK = 'benchmark-a'
+
+# pylint: disable=unused-argument
+
+
+def _write_file(path, contents):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file_handle:
+        file_handle.write(contents)
+
+
+def test_get_units_key(tmp_path):
+    """Tests that get_units_key only depends on the names of the units."""
+    corpus_dir_1 = tmp_path / 'corpus-1'
+    corpus_dir_2 = tmp_path / 'corpus-2'
+    for unit in ['b', 'a']:
+        _write_file(str(corpus_dir_1 / unit), '')
+    for unit in ['a', 'b']:
+        _write_file(str(corpus_dir_2 / unit), '')
+    assert (unit_coverage_cache.get_units_key(
+        str(corpus_dir_1)) == unit_coverage_cache.get_units_key(
+            str(corpus_dir_2)))
+
+    _write_file(str(corpus_dir_2 / 'c'), '')
+    assert (unit_coverage_cache.get_units_key(str(corpus_dir_1)) !=
+            unit_coverage_cache.get_units_key(str(corpus_dir_2)))
+
+
+def test_restore_not_cached(tmp_path, experiment):
+    """Tests that restore returns False when the units are not cached."""
+    os.environ['WORK'] = str(tmp_path)
+    cache = unit_coverage_cache.UnitCoverageCache(BENCHMARK)
+    assert not cache.restore('key', str(tmp_path / 'reports'))
+
+
+def test_store_and_restore(tmp_path, experiment):
+    """Tests that restore copies the files that were stored for a key to the
+    same paths relative to the restored directory."""
+    os.environ['WORK'] = str(tmp_path)
+    report_dir = tmp_path / 'trial-1' / 'reports'
+    summary_file = str(report_dir / 'cov_summary.json')
+    profdata_file = str(report_dir / 'profdata' / 'data.profdata')
+    _write_file(summary_file, 'summary')
+    _write_file(profdata_file, 'profdata')
+
+    cache = unit_coverage_cache.UnitCoverageCache(BENCHMARK)
+    with cache.lock('key'):
+        cache.store('key', str(report_dir), [summary_file, profdata_file])
+
+    restored_report_dir = tmp_path / 'trial-2' / 'reports'
+    with cache.lock('key'):
+        assert cache.restore('key', str(restored_report_dir))
+    for path, contents in [('cov_summary.json', 'summary'),
+                           ('profdata/data.profdata', 'profdata')]:
+        with open(restored_report_dir / path, encoding='utf-8') as file_handle:
+            assert file_handle.read() == contents
+
+
+def test_store_missing_file(tmp_path, experiment):
+    """Tests that nothing is cached when one of the files doesn't exist."""
+    os.environ['WORK'] = str(tmp_path)
+    report_dir = tmp_path / 'reports'
+    profdata_file = str(report_dir / 'data.profdata')
+    _write_file(profdata_file, 'profdata')
+
+    cache = unit_coverage_cache.UnitCoverageCache(BENCHMARK)
+    with cache.lock('key'):
+        cache.store(
+            'key', str(report_dir),
+            [profdata_file, str(report_dir / 'cov_summary.json')])
+        assert not cache.restore('key', str(tmp_path / 'restored'))
@@ -0,0 +1,96 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Module for caching the coverage of units across the trials of a benchmark.
+Every trial of a fuzzer/benchmark pair starts from the same seed corpus, so the
+coverage of the first snapshot only needs to be measured once per benchmark."""
+
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+
+from common import experiment_utils
+from common import filesystem
+from common import logs
+from common import utils
+
+logger = logs.Logger()  # pylint: disable=invalid-name
+
+
+def get_cache_dir(benchmark: str) -> str:
+    """Returns the directory containing the unit coverage cache for
+    |benchmark|."""
+    return os.path.join(experiment_utils.get_work_dir(), 'unit-coverage-cache',
+                        benchmark)
+
+
+def get_units_key(corpus_dir: str) -> str:
+    """Returns the key identifying the units in |corpus_dir|. Units are named
+    after the SHA-1 of their contents by extract_corpus, so the key only depends
+    on the contents of the units."""
+    return utils.string_hash(sorted(os.listdir(corpus_dir)))
+
+
+class UnitCoverageCache:
+    """Cache mapping a set of units to the files holding the coverage of
+    measuring them."""
+
+    def __init__(self, benchmark: str):
+        self.cache_dir = get_cache_dir(benchmark)
+
+    def _get_path(self, key: str, extension: str = '') -> str:
+        return os.path.join(self.cache_dir, key + extension)
+
+    @contextlib.contextmanager
+    def lock(self, key: str):
+        """Holds an exclusive lock on |key| so that only one measure worker
+        measures a set of units while the others wait to reuse the result."""
+        filesystem.create_directory(self.cache_dir)
+        with open(self._get_path(key, '.lock'), 'w',
+                  encoding='utf-8') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def restore(self, key: str, directory: str) -> bool:
+        """Copies the files cached for |key| to |directory|, at the same paths
+        relative to it they were stored from. Returns False if |key| is not
+        cached."""
+        entry_dir = self._get_path(key)
+        if not os.path.isdir(entry_dir):
+            return False
+
+        shutil.copytree(entry_dir, directory, dirs_exist_ok=True)
+        logger.info('Reused cached coverage for units: %s.', key)
+        return True
+
+    def store(self, key: str, directory: str, files):
+        """Caches |files|, which are in |directory|, as the coverage of the
+        units identified by |key|. Nothing is cached unless all of |files|
+        exist."""
+        if not files or not all(os.path.exists(path) for path in files):
+            return
+
+        # Write to a temporary directory first so that a cache entry is never
+        # partially written.
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        for path in files:
+            cached_path = os.path.join(temp_dir,
+                                       os.path.relpath(path, directory))
+            filesystem.create_directory(os.path.dirname(cached_path))
+            shutil.copyfile(path, cached_path)
+        os.rename(temp_dir, self._get_path(key))
@@ -29,6 +29,10 @@ from analysis import data_utils
 
 CORE_FUZZERS_YAML = os.path.join(utils.ROOT_DIR, 'service', 'core-fuzzers.yaml')
 
+# Number of processes computing the plots and tables of reports. Reports are
+# generated on the dispatcher while it measures, so only use a few CPUs.
+NUM_REPORT_PROCESSES = 2
+
 logger = logs.Logger()  # pylint: disable=invalid-name
 
 
@@ -37,6 +41,18 @@ def get_reports_dir():
     return exp_path.path('reports')
 
 
+def get_data_cache_dir():
+    """Return the directory caching experiment data between reports. It isn't
+    in the reports directory, which is recreated for every report."""
+    return exp_path.path('report-data-cache')
+
+
+def get_artifact_cache_dir():
+    """Return the directory caching the tables and plots of reports between
+    reports."""
+    return exp_path.path('report-artifact-cache')
+
+
 def get_core_fuzzers():
     """Return list of core fuzzers to be used for merging experiment data."""
     return yaml_utils.read(CORE_FUZZERS_YAML)['fuzzers']
@@ -81,7 +97,10 @@ def output_report(experiment_config: dict,
             in_progress=in_progress,
             merge_with_clobber_nonprivate=merge_with_nonprivate,
             coverage_report=coverage_report,
-            experiment_benchmarks=experiment_benchmarks)
+            experiment_benchmarks=experiment_benchmarks,
+            data_cache_dir=str(get_data_cache_dir()),
+            artifact_cache_dir=str(get_artifact_cache_dir()),
+            num_processes=NUM_REPORT_PROCESSES)
         filestore_utils.rsync(
             str(reports_dir),
             web_filestore_path,
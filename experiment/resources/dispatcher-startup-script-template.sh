@@ -30,6 +30,9 @@ docker run --rm \
   -e CONCURRENT_BUILDS={{concurrent_builds}} \
   -e WORKER_POOL_NAME={{worker_pool_name}} \
   -e PRIVATE={{private}} \
+  -e OBJECT_STORE={{object_store}} \
+  -e COVERAGE_BINARY_CACHE_DIR=/coverage-binary-cache \
+  -v /var/lib/fuzzbench/coverage-binary-cache:/coverage-binary-cache \
   --cap-add=SYS_PTRACE --cap-add=SYS_NICE \
   -v /var/run/docker.sock:/var/run/docker.sock --name=dispatcher-container \
   {{docker_registry}}/dispatcher-image /work/startup-dispatcher.sh &> /tmp/dispatcher.log
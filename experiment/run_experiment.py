@@ -29,6 +29,7 @@ import jinja2
 import yaml
 
 from common import benchmark_utils
+from common import corpus_blob_store
 from common import experiment_utils
 from common import filestore_utils
 from common import filesystem
@@ -37,8 +38,10 @@ from common import gcloud
 from common import gsutil
 from common import logs
 from common import new_process
+from common import object_store
 from common import utils
 from common import yaml_utils
+from experiment.measurer import coverage_binary_cache
 
 BENCHMARKS_DIR = os.path.join(utils.ROOT_DIR, 'benchmarks')
 FUZZERS_DIR = os.path.join(utils.ROOT_DIR, 'fuzzers')
@@ -75,6 +78,10 @@ def _set_default_config_values(config: Dict[str, Union[int, str, bool]],
         'snapshot_period', experiment_utils.DEFAULT_SNAPSHOT_SECONDS)
     config['private'] = config.get('private', False)
     config['micro_experiment'] = config.get('micro_experiment', False)
+    config['corpus_format'] = config.get('corpus_format',
+                                         corpus_blob_store.TARBALL_FORMAT)
+    config['incremental_coverage'] = config.get('incremental_coverage', False)
+    config['object_store'] = config.get('object_store', '')
 
 
 def _validate_config_parameters(
@@ -190,10 +197,29 @@ def read_and_validate_experiment_config(config_filename: str) -> Dict:
             Requirement(False, str, False, ''),
         'micro_experiment':
             Requirement(False, bool, False, ''),
+        'corpus_format':
+            Requirement(False, str, True, ''),
+        'incremental_coverage':
+            Requirement(False, bool, False, ''),
+        'object_store':
+            Requirement(False, str, True, ''),
     }
 
     all_params_valid = _validate_config_parameters(config, config_requirements)
     all_values_valid = _validate_config_values(config, config_requirements)
+    corpus_format = config.get('corpus_format',
+                               corpus_blob_store.TARBALL_FORMAT)
+    if corpus_format not in corpus_blob_store.CORPUS_FORMATS:
+        all_values_valid = False
+        logs.error(
+            'Config parameter "corpus_format" is "%s". It must be one of '
+            '%s.', corpus_format, corpus_blob_store.CORPUS_FORMATS)
+    object_store_backend = config.get('object_store', '')
+    if object_store_backend not in ('', object_store.GCS_BACKEND):
+        all_values_valid = False
+        logs.error(
+            'Config parameter "object_store" is "%s". It must be empty or '
+            '"%s".', object_store_backend, object_store.GCS_BACKEND)
     if not all_params_valid or not all_values_valid:
         raise ValidationError(f'Config: {config_filename} is invalid.')
 
@@ -501,6 +527,13 @@ class LocalDispatcher(BaseDispatcher):
 
         filestore = self.config['report_filestore']
         shared_report_filestore_arg = f'{filestore}:{filestore}'
+        # Share coverage builds extracted by the measurer across experiments.
+        coverage_binary_cache_dir = coverage_binary_cache.get_cache_dir()
+        filesystem.create_directory(coverage_binary_cache_dir)
+        shared_coverage_binary_cache_arg = (
+            f'{coverage_binary_cache_dir}:{coverage_binary_cache_dir}')
+        set_coverage_binary_cache_dir_arg = (
+            f'COVERAGE_BINARY_CACHE_DIR={coverage_binary_cache_dir}')
         set_report_filestore_arg = f'REPORT_FILESTORE={filestore}'
         set_snapshot_period_arg = (
             f'SNAPSHOT_PERIOD={self.config["snapshot_period"]}')
@@ -530,6 +563,8 @@ class LocalDispatcher(BaseDispatcher):
             set_concurrent_builds_arg,
             '-e',
             set_worker_pool_name_arg,
+            '-e',
+            set_coverage_binary_cache_dir_arg,
         ]
         command = [
             'docker',
@@ -542,6 +577,8 @@ class LocalDispatcher(BaseDispatcher):
             shared_experiment_filestore_arg,
             '-v',
             shared_report_filestore_arg,
+            '-v',
+            shared_coverage_binary_cache_arg,
         ] + environment_args + [
             '--shm-size=2g',
             '--cap-add=SYS_PTRACE',
@@ -602,6 +639,7 @@ class GoogleCloudDispatcher(BaseDispatcher):
             'concurrent_builds': self.config['concurrent_builds'],
             'worker_pool_name': self.config['worker_pool_name'],
             'private': self.config['private'],
+            'object_store': self.config['object_store'],
         }
         if 'worker_pool_name' in self.config:
             kwargs['worker_pool_name'] = self.config['worker_pool_name']
@@ -15,9 +15,11 @@
 """Runs fuzzer for trial."""
 
 import importlib
+import collections
 import json
 import os
 import posixpath
+import queue
 import shlex
 import shutil
 import subprocess
@@ -28,6 +30,8 @@ import time
 import zipfile
 
 from common import benchmark_config
+from common import corpus_blob_store
+from common import corpus_journal
 from common import environment
 from common import experiment_utils
 from common import filesystem
@@ -36,6 +40,7 @@ from common import fuzzer_utils
 from common import fuzzer_stats
 from common import logs
 from common import new_process
+from common import parallel_gzip
 from common import retry
 from common import sanitizer
 from common import utils
@@ -53,6 +58,11 @@ fuzzer_errored_out = False  # pylint:disable=invalid-name
 CORPUS_DIRNAME = 'corpus'
 RESULTS_DIRNAME = 'results'
 CORPUS_ARCHIVE_DIRNAME = 'corpus-archives'
+UPLOAD_BACKLOG_FILENAME = 'upload-backlog.json'
+
+# Uploads that can be pending before syncs wait for them, so that corpus
+# archives don't fill up the disk when the filestore is unreachable.
+MAX_PENDING_UPLOADS = 8
 
 
 def _clean_seed_corpus(seed_corpus_dir):
@@ -229,6 +239,63 @@ def run_fuzzer(max_total_time, log_filename):
         logs.error('Fuzz process returned nonzero.')
 
 
+class UploadQueue:
+    """Bounded queue of uploads done in order by a background thread, so that
+    slow uploads to the filestore don't delay the next sync."""
+
+    def __init__(self, max_pending_uploads=MAX_PENDING_UPLOADS):
+        self._queue = queue.Queue(maxsize=max_pending_uploads)
+        self._lock = threading.Lock()
+        # Times at which the pending uploads were queued, oldest first.
+        self._queue_times = collections.deque()
+        self.failed_uploads = 0
+        self._thread = None
+
+    def put(self, upload, *args):
+        """Queues calling |upload| with |args|. Waits for an upload to finish
+        if too many are pending."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._do_uploads,
+                                            daemon=True)
+            self._thread.start()
+        if self._queue.full():
+            logs.warning('Upload queue is full, waiting for uploads.')
+        with self._lock:
+            self._queue_times.append(time.time())
+        self._queue.put((upload, args))
+
+    def _do_uploads(self):
+        while True:
+            upload, args = self._queue.get()
+            try:
+                upload(*args)
+            except Exception:  # pylint: disable=broad-except
+                logs.error('Failed to upload with %s.', upload.__name__)
+                with self._lock:
+                    self.failed_uploads += 1
+            finally:
+                with self._lock:
+                    self._queue_times.popleft()
+                self._queue.task_done()
+
+    def join(self):
+        """Waits for the pending uploads to finish."""
+        self._queue.join()
+
+    def get_backlog(self):
+        """Returns a dictionary describing the pending uploads."""
+        with self._lock:
+            oldest_queue_time = (self._queue_times[0]
+                                 if self._queue_times else None)
+            return {
+                'pending_uploads': len(self._queue_times),
+                'oldest_pending_upload_seconds':
+                    (time.time() -
+                     oldest_queue_time if oldest_queue_time is not None else 0),
+                'failed_uploads': self.failed_uploads,
+            }
+
+
 class TrialRunner:  # pylint: disable=too-many-instance-attributes
     """Class for running a trial."""
 
@@ -249,7 +316,12 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
         self.results_dir = os.path.abspath(RESULTS_DIRNAME)
         self.log_file = os.path.join(self.results_dir, 'fuzzer-log.txt')
         self.last_sync_time = None
-        self.last_archive_time = -float('inf')
+        self.corpus_journal = None
+        self.upload_queue = UploadQueue()
+        self.corpus_format = corpus_blob_store.get_corpus_format()
+        # Digests of the blobs already staged for upload.
+        self.staged_blobs = set()
+        self.results_upload_queued = False
 
     def initialize_directories(self):
         """Initialize directories needed for the trial."""
@@ -313,6 +385,9 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
         logs.info('Doing final sync.')
         self.do_sync()
         fuzz_thread.join()
+        self.upload_queue.join()
+        if self.corpus_journal is not None:
+            self.corpus_journal.stop()
 
     def sleep_until_next_sync(self):
         """Sleep until it is time to do the next sync."""
@@ -336,15 +411,45 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
         self.last_sync_time = time.time()
 
     def do_sync(self):
-        """Save corpus archives and results to GCS."""
+        """Archive the corpus and queue uploading it and the results to the
+        filestore."""
         try:
-            self.archive_and_save_corpus()
+            if self.corpus_format == corpus_blob_store.BLOBS_FORMAT:
+                blobs_dir, manifest_path = self.stage_corpus_blobs()
+                self.upload_queue.put(self.save_corpus_blobs, blobs_dir,
+                                      manifest_path)
+            else:
+                archive = self.archive_corpus()
+                self.upload_queue.put(self.save_corpus_archive, archive)
             # TODO(metzman): Enable stats.
-            self.save_results()
+            self.save_upload_backlog()
+            self.queue_results_upload()
             logs.debug('Finished sync.')
         except Exception:  # pylint: disable=broad-except
             logs.error('Failed to sync cycle: %d.', self.cycle)
 
+    def save_upload_backlog(self):
+        """Saves the upload backlog to a file in the results directory so that
+        syncs falling behind can be noticed."""
+        backlog = self.upload_queue.get_backlog()
+        backlog['cycle'] = self.cycle
+        backlog_path = os.path.join(self.results_dir, UPLOAD_BACKLOG_FILENAME)
+        with open(backlog_path, 'w', encoding='utf-8') as backlog_file:
+            json.dump(backlog, backlog_file)
+
+    def queue_results_upload(self):
+        """Queues uploading the results directory unless an upload of it is
+        already pending, since that one will upload the latest results."""
+        if self.results_upload_queued:
+            return
+        self.results_upload_queued = True
+        self.upload_queue.put(self.upload_results)
+
+    def upload_results(self):
+        """Uploads the results directory."""
+        self.results_upload_queued = False
+        self.save_results()
+
     def record_stats(self):
         """Use fuzzer.get_stats if it is offered, validate the stats and then
         save them to a file so that they will be synced to the filestore."""
@@ -378,21 +483,41 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
         with open(stats_path, 'w', encoding='utf-8') as stats_file_handle:
             stats_file_handle.write(stats_json_str)
 
+    def get_new_corpus_files(self):
+        """Returns the files added to the corpus since the last cycle."""
+        if self.corpus_journal is None:
+            self.corpus_journal = corpus_journal.CorpusJournal(
+                self.output_corpus)
+            self.corpus_journal.start()
+        return self.corpus_journal.get_new_files()
+
+    def stage_corpus_blobs(self):
+        """Writes the blobs of the units added to the corpus since the last
+        cycle that weren't uploaded before and a manifest of the units. Returns
+        the directory containing the blobs and the path to the manifest."""
+        blobs_dir = os.path.join(
+            self.corpus_archives_dir,
+            experiment_utils.get_cycle_filename('corpus-blobs', self.cycle))
+        digests = corpus_blob_store.stage_blobs(self.get_new_corpus_files(),
+                                                blobs_dir, self.staged_blobs)
+        manifest_path = os.path.join(
+            self.corpus_archives_dir,
+            corpus_blob_store.get_manifest_name(self.cycle))
+        corpus_blob_store.write_manifest(manifest_path, digests)
+        return blobs_dir, manifest_path
+
     def archive_corpus(self):
-        """Archive this cycle's corpus."""
+        """Archive the files added to the corpus since the last cycle."""
         archive = os.path.join(
             self.corpus_archives_dir,
             experiment_utils.get_corpus_archive_name(self.cycle))
 
-        with tarfile.open(archive, 'w:gz') as tar:
-            new_archive_time = self.last_archive_time
-            for file_path in get_corpus_elements(self.output_corpus):
+        new_files = self.get_new_corpus_files()
+        with open(archive, 'wb') as archive_file, \
+                parallel_gzip.ParallelGzipWriter(archive_file) as gzip_file, \
+                tarfile.open(fileobj=gzip_file, mode='w|') as tar:
+            for file_path in new_files:
                 try:
-                    stat_info = os.stat(file_path)
-                    last_modified_time = stat_info.st_mtime
-                    if last_modified_time <= self.last_archive_time:
-                        continue  # We've saved this file already.
-                    new_archive_time = max(new_archive_time, last_modified_time)
                     arcname = os.path.relpath(file_path, self.output_corpus)
                     tar.add(file_path, arcname=arcname)
                 except (FileNotFoundError, OSError):
@@ -403,9 +528,10 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
                     pass
                 except Exception:  # pylint: disable=broad-except
                     logs.error('Unexpected exception occurred when archiving.')
-        self.last_archive_time = new_archive_time
         return archive
 
+    @retry.wrap(NUM_RETRIES, RETRY_DELAY,
+                'experiment.runner.TrialRunner.save_corpus_archive')
     def save_corpus_archive(self, archive):
         """Save corpus |archive| to GCS and delete when done."""
         if not self.gcs_sync_dir:
@@ -421,11 +547,30 @@ class TrialRunner:  # pylint: disable=too-many-instance-attributes
         os.remove(archive)
 
     @retry.wrap(NUM_RETRIES, RETRY_DELAY,
-                'experiment.runner.TrialRunner.archive_and_save_corpus')
-    def archive_and_save_corpus(self):
-        """Archive and save the current corpus to GCS."""
-        archive = self.archive_corpus()
-        self.save_corpus_archive(archive)
+                'experiment.runner.TrialRunner.save_corpus_blobs')
+    def save_corpus_blobs(self, blobs_dir, manifest_path):
+        """Save the blobs in |blobs_dir| to the blob store and then the manifest
+        at |manifest_path| to GCS, so that manifests only refer to saved
+        blobs."""
+        if not self.gcs_sync_dir:
+            return
+
+        blob_paths = [
+            os.path.join(blobs_dir, digest) for digest in os.listdir(blobs_dir)
+        ]
+        if blob_paths:
+            filestore_utils.cp_files(blob_paths,
+                                     corpus_blob_store.get_blob_store_dir(
+                                         environment.get('BENCHMARK')),
+                                     parallel=True)
+        basename = os.path.basename(manifest_path)
+        filestore_utils.cp(
+            manifest_path,
+            posixpath.join(self.gcs_sync_dir, CORPUS_DIRNAME, basename))
+
+        # Delete blobs so disk doesn't fill up.
+        shutil.rmtree(blobs_dir)
+        os.remove(manifest_path)
 
     @retry.wrap(NUM_RETRIES, RETRY_DELAY,
                 'experiment.runner.TrialRunner.save_results')
@@ -451,17 +596,6 @@ def get_fuzzer_module(fuzzer):
     return fuzzer_module
 
 
-def get_corpus_elements(corpus_dir):
-    """Returns a list of absolute paths to corpus elements in |corpus_dir|."""
-    corpus_dir = os.path.abspath(corpus_dir)
-    corpus_elements = []
-    for root, _, files in os.walk(corpus_dir):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            corpus_elements.append(file_path)
-    return corpus_elements
-
-
 def experiment_main():
     """Do a trial as part of an experiment."""
     logs.info('Doing trial as part of experiment.')
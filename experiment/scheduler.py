@@ -24,6 +24,7 @@ from typing import List, Dict
 import jinja2
 
 from common import benchmark_utils
+from common import corpus_blob_store
 from common import experiment_utils
 from common import gcloud
 from common import gce
@@ -754,6 +755,12 @@ def render_startup_script_template(  # pylint: disable=too-many-arguments
         experiment, benchmark, fuzzer, experiment_config['docker_registry'])
     fuzz_target = benchmark_utils.get_fuzz_target(benchmark)
 
+    # Configs of experiments started before these options existed don't have
+    # them.
+    corpus_format = experiment_config.get('corpus_format',
+                                          corpus_blob_store.TARBALL_FORMAT)
+    object_store = experiment_config.get('object_store', '')
+
     local_experiment = experiment_utils.is_local_experiment()
     template = JINJA_ENV.get_template('runner-startup-script-template.sh')
     kwargs = {
@@ -779,6 +786,8 @@ def render_startup_script_template(  # pylint: disable=too-many-arguments
         'private': experiment_config['private'],
         'cpuset': cpuset,
         'custom_seed_corpus_dir': experiment_config['custom_seed_corpus_dir'],
+        'corpus_format': corpus_format,
+        'object_store': object_store,
     }
 
     if not local_experiment:
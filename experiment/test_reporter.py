@@ -82,4 +82,9 @@ def test_output_report_filestore(experiment_fuzzers, expected_merged_fuzzers,
                 in_progress=False,
                 merge_with_clobber_nonprivate=False,
                 coverage_report=False,
-                experiment_benchmarks=experiment_benchmarks)
+                experiment_benchmarks=experiment_benchmarks,
+                data_cache_dir=os.path.join(os.environ['WORK'],
+                                            'report-data-cache'),
+                artifact_cache_dir=os.path.join(os.environ['WORK'],
+                                                'report-artifact-cache'),
+                num_processes=reporter.NUM_REPORT_PROCESSES)
@@ -133,6 +133,20 @@ class TestReadAndValdiateExperimentConfig(unittest.TestCase):
             'experiment_filestore', 'invalid', 'Config parameter "%s" is "%s". '
             'Google Cloud experiments must start with "gs://".')
 
+    @mock.patch('common.logs.error')
+    def test_invalid_object_store(self, mocked_error):
+        """Tests that an error is logged when the config file has an object
+        store that can't be used in experiments."""
+        self.config['object_store'] = 'fake'
+        with mock.patch('common.yaml_utils.read') as mocked_read_yaml:
+            mocked_read_yaml.return_value = self.config
+            with pytest.raises(run_experiment.ValidationError):
+                run_experiment.read_and_validate_experiment_config(
+                    'config_file')
+        mocked_error.assert_called_with(
+            'Config parameter "object_store" is "%s". It must be empty or '
+            '"%s".', 'fake', 'gcs')
+
     @mock.patch('common.logs.error')
     def test_multiple_invalid(self, mocked_error):
         """Test that multiple errors are logged when multiple parameters are
@@ -13,14 +13,17 @@
 # limitations under the License.
 """Tests for runner.py."""
 
+import json
 import os
 import pathlib
 import posixpath
+import threading
 from unittest import mock
 
 import pytest
 
 from common import benchmark_config
+from common import corpus_blob_store
 from common import filestore_utils
 from common import new_process
 from experiment import runner
@@ -224,6 +227,7 @@ def test_do_sync_unchanged(mocked_debug, trial_runner, fuzzer_module):
     trial_runner.cycle = 1337
     with test_utils.mock_popen_ctx_mgr() as mocked_popen:
         trial_runner.do_sync()
+        trial_runner.upload_queue.join()
         assert mocked_popen.commands == [
             [
                 'gsutil', 'cp', '/corpus-archives/corpus-archive-1337.tar.gz',
@@ -249,6 +253,7 @@ def test_do_sync_changed(mocked_execute, fs, trial_runner, fuzzer_module):
     fs.create_file(os.path.join(trial_runner.output_corpus, corpus_file_name))
     trial_runner.cycle = 1337
     trial_runner.do_sync()
+    trial_runner.upload_queue.join()
     assert mocked_execute.call_args_list == [
         mock.call([
             'gsutil', 'cp', '/corpus-archives/corpus-archive-1337.tar.gz',
@@ -269,6 +274,91 @@ def test_do_sync_changed(mocked_execute, fs, trial_runner, fuzzer_module):
     assert len(archives) == 0
 
 
+@mock.patch('common.new_process.execute')
+def test_do_sync_blobs(mocked_execute, fs, trial_runner, fuzzer_module):
+    """Test that do_sync saves the blobs of new units and then a manifest of
+    the cycle when using the blobs corpus format."""
+    mocked_execute.return_value = new_process.ProcessResult(0, '', False)
+    trial_runner.corpus_format = corpus_blob_store.BLOBS_FORMAT
+    fs.create_file(os.path.join(trial_runner.output_corpus, 'corpus-file'),
+                   contents='unit')
+    digest = corpus_blob_store.get_blob_digest(b'unit')
+    trial_runner.cycle = 1337
+    trial_runner.do_sync()
+    trial_runner.upload_queue.join()
+    assert mocked_execute.call_args_list[:2] == [
+        mock.call([
+            'gsutil', '-m', 'cp', '/corpus-archives/corpus-blobs-1337/' +
+            digest, 'gs://bucket/experiment-name/corpus-blobs/benchmark-1/'
+        ],
+                  expect_zero=True),
+        mock.call([
+            'gsutil', 'cp', '/corpus-archives/corpus-manifest-1337.json',
+            ('gs://bucket/experiment-name/experiment-folders/'
+             'benchmark-1-fuzzer_a/trial-1/corpus/'
+             'corpus-manifest-1337.json')
+        ],
+                  expect_zero=True),
+    ]
+    assert trial_runner.staged_blobs == {digest}
+    assert not os.listdir(trial_runner.corpus_archives_dir)
+
+
+@mock.patch('common.logs.error')
+def test_upload_queue(_):
+    """Tests that UploadQueue does uploads in order in the background and
+    reports uploads that are pending or failed."""
+    upload_queue = runner.UploadQueue()
+    uploaded = []
+    release_upload = threading.Event()
+
+    def upload(name):
+        release_upload.wait()
+        if name == 'bad':
+            raise Exception('Upload failed.')
+        uploaded.append(name)
+
+    for name in ['a', 'bad', 'b']:
+        upload_queue.put(upload, name)
+    backlog = upload_queue.get_backlog()
+    assert backlog['pending_uploads'] == 3
+    assert backlog['oldest_pending_upload_seconds'] >= 0
+
+    release_upload.set()
+    upload_queue.join()
+    assert uploaded == ['a', 'b']
+    assert upload_queue.get_backlog() == {
+        'pending_uploads': 0,
+        'oldest_pending_upload_seconds': 0,
+        'failed_uploads': 1,
+    }
+
+
+def test_queue_results_upload(trial_runner):
+    """Tests that results uploads aren't queued while one is pending and that
+    the upload backlog is saved in the results directory."""
+    with mock.patch('experiment.runner.UploadQueue.put') as mocked_put:
+        trial_runner.queue_results_upload()
+        trial_runner.queue_results_upload()
+        assert mocked_put.call_count == 1
+        with mock.patch('experiment.runner.TrialRunner.save_results'):
+            trial_runner.upload_results()
+        trial_runner.queue_results_upload()
+        assert mocked_put.call_count == 2
+
+    trial_runner.cycle = 2
+    trial_runner.save_upload_backlog()
+    with open(os.path.join(trial_runner.results_dir,
+                           runner.UPLOAD_BACKLOG_FILENAME),
+              encoding='utf-8') as backlog_file:
+        assert json.load(backlog_file) == {
+            'pending_uploads': 0,
+            'oldest_pending_upload_seconds': 0,
+            'failed_uploads': 0,
+            'cycle': 2,
+        }
+
+
 class TestIntegrationRunner:
     """Integration tests for the runner."""
 
@@ -122,6 +122,8 @@ docker run \\
 -e NO_DICTIONARIES=False \\
 -e OSS_FUZZ_CORPUS=False \\
 -e CUSTOM_SEED_CORPUS_DIR=None \\
+-e CORPUS_FORMAT=tarball \\
+-e OBJECT_STORE= \\
 -e DOCKER_REGISTRY=gcr.io/fuzzbench -e CLOUD_PROJECT=fuzzbench -e CLOUD_COMPUTE_ZONE=us-central1-a \\
 -e EXPERIMENT_FILESTORE=gs://experiment-data \\
 -e REPORT_FILESTORE=gs://web-reports \\